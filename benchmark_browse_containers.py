@@ -0,0 +1,712 @@
+import io
+import os
+import gc
+import sys
+import json
+import random
+import shutil
+import struct
+import asyncio
+import resource
+import subprocess
+import tempfile
+import datetime as dt
+from argparse import ArgumentParser, ArgumentTypeError
+from pathlib import Path
+from time import perf_counter, process_time, sleep, time
+
+from browse_containers import (SEVERITY, STREAM, Browser, Container, LogArchive, LogStreamParser, LogWriter,
+                               MergedLog, SeverityClassifier)
+
+
+SAMPLE_LINES = [
+    '192.168.52.10 - - [01/Jan/2025:02:00:00 +0100] "GET /index.html HTTP/1.1" 200 5123 "-" "Mozilla/5.0"',
+    '192.168.52.10 - - [01/Jan/2025:02:00:01 +0100] "GET /missing.png HTTP/1.1" 404 153 "-" "Mozilla/5.0"',
+    '2025/01/01 02:00:02 [error] 7#7: *1 connect() failed (111: Connection refused) while connecting to upstream',
+    'INFO:     Started server process [1]',
+    'WARNING: Retrying (Retry(total=4)) after connection broken',
+    'Traceback (most recent call last):',
+    'sending incremental file list',
+    'Bot is ready and connected to Telegram',
+    'DEBUG: SELECT * FROM notes WHERE id = 42',
+    'Nothing special happens in this line at all, it is just a bit longer than the others to have some variety',
+]
+
+# - Stand-in for the docker CLI: answers 'inspect' and 'ps' like docker would, after a configurable startup latency,
+#   and keeps 'logs' streams open without output
+STUB_DOCKER = '''#!{python}
+import json, os, sys, time
+time.sleep(float(os.environ.get('DOCKER_STUB_LATENCY', '0.05')))
+args = sys.argv[1:]
+if args[0] == 'inspect':
+    names = [a for a in args[1:] if not a.startswith('--')]
+    if any(a.startswith('--format') for a in args[1:]):
+        print('\\n'.join('0' * 52 + str(i).zfill(12) for i, _ in enumerate(names)))
+    else:
+        print(json.dumps([dict(Id='0' * 52 + str(i).zfill(12), Name='/' + n, State=dict(Running=True))
+                          for i, n in enumerate(names)]))
+elif args[0] == 'ps':
+    pass
+elif 'logs' in args:
+    time.sleep(3600)
+'''
+
+
+# - Messages of the synthetic load by severity, padded to the line length with FILLER_WORDS (which match no keyword)
+SYNTHETIC_MESSAGES = {
+    SEVERITY.ERROR: ('ERROR connection to database failed', 'Traceback (most recent call last):',
+                     'fatal: permission denied'),
+    SEVERITY.WARN: ('WARNING retrying in 5 seconds', 'slow upstream, took 2.3 s'),
+    SEVERITY.INFO: ('INFO listening on port 8080', 'notice: starting worker 3'),
+    SEVERITY.SUCCESS: ('backup completed', 'ready to accept connections'),
+    SEVERITY.DEBUG: ('DEBUG select * from notes where id = 42', 'sql took 3 ms'),
+    SEVERITY.NONE: ('GET /static/app.js 200 5123', 'worker 3 idle'),
+}
+FILLER_WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'tempor', 'magna')
+DEFAULT_SEVERITY_MIX = 'error=1,warning=4,info=20,success=5,debug=20,none=50'
+ANSI_COLORS = ('\033[31m', '\033[32m', '\033[33m', '\033[34m', '\033[1m')
+
+
+def _parse_severity_mix(text: str):
+    """Weights by severity from e.g. 'error=1,warning=4,none=95'."""
+    try:
+        mix = {SEVERITY.NAMES.index(name.strip()): float(weight)
+               for name, weight in (part.split('=') for part in text.split(','))}
+    except ValueError:
+        raise ArgumentTypeError(f"invalid severity mix '{text}', expected e.g. {DEFAULT_SEVERITY_MIX}")
+    if not set(mix) <= set(SYNTHETIC_MESSAGES) or sum(mix.values()) <= 0:
+        raise ArgumentTypeError(f"invalid severity mix '{text}', expected e.g. {DEFAULT_SEVERITY_MIX}")
+    return mix
+
+
+def synthetic_lines(num_lines: int, line_length: int, severity_mix: dict[int, float], ansi_fraction: float,
+                    seed: int = 0):
+    """
+    Encoded log lines of the given severity mix, half to one and a half times the given length.
+
+    :param ansi_fraction: Fraction of the lines colored with ANSI escape codes, like many loggers do on a terminal
+    """
+    rng = random.Random(seed)
+    severities = rng.choices(list(severity_mix), list(severity_mix.values()), k=num_lines)
+    lines = []
+    for severity in severities:
+        words, length = [rng.choice(SYNTHETIC_MESSAGES[severity])], rng.randint(line_length // 2, line_length * 3 // 2)
+        while sum(map(len, words)) + len(words) - 1 < length:
+            words.append(rng.choice(FILLER_WORDS))
+        line = ' '.join(words)[:max(length, len(words[0]))]
+        if rng.random() < ansi_fraction:
+            line = f'{rng.choice(ANSI_COLORS)}{line}\033[0m'
+        lines.append(line.encode('utf-8'))
+    return lines
+
+
+def legacy_severity(line: str):
+    """The per-line classification LogLine.color used before the batch classifier (incl. its priority order)."""
+    line_lower = line.lower()
+    if any(kw in line_lower for kw in ("info", "notice", "starting", "started", "listening", "listened")):
+        return SEVERITY.INFO
+    elif any(kw in line_lower for kw in ("warn", "retrying", "retry", "slow", "slowly")):
+        return SEVERITY.WARN
+    elif any(kw in line_lower for kw in ("error", "fail", "fatal", "panic", "exception", "traceback", "can't",
+                                         "denied", "unavailable", "unreachable", "not found", "no such")):
+        return SEVERITY.ERROR
+    elif any(kw in line_lower for kw in ("success", "ready", "connected", "completed", "done")):
+        return SEVERITY.SUCCESS
+    elif any(kw in line_lower for kw in ("debug", "verbos", "trace", "http", "https", "delete", "request",
+                                         "response", "sql", "select", "insert", "inject", "update", "query")):
+        return SEVERITY.DEBUG
+    else:
+        return SEVERITY.NONE
+
+
+def _best_of(repeats: int, function, *args):
+    best = float('inf')
+    for _ in range(repeats):
+        start = perf_counter()
+        function(*args)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def benchmark_classification(num_lines: int, batch_size: int, repeats: int):
+    lines = [random.choice(SAMPLE_LINES) for _ in range(num_lines)]
+    encoded = [line.encode('utf-8') for line in lines]  # The classifier works on the log bytes as they come in
+    batches = [encoded[i:i + batch_size] for i in range(0, num_lines, batch_size)]
+    classifier = SeverityClassifier()
+    nginx_classifier = SeverityClassifier.for_service('reverse-proxy')
+    results = {
+        'legacy per line': _best_of(repeats, lambda: [legacy_severity(line) for line in lines]),
+        f'classifier in batches of {batch_size}': _best_of(repeats, lambda: [classifier.classify_batch(batch)
+                                                                             for batch in batches]),
+        f'nginx classifier in batches of {batch_size}': _best_of(repeats, lambda: [nginx_classifier.classify_batch(b)
+                                                                                   for b in batches]),
+    }
+    print(f"Classifying {num_lines} lines (best of {repeats}):")
+    for name, seconds in results.items():
+        print(f"  {name.ljust(40)} {seconds * 1e3:8.1f} ms  {num_lines / seconds / 1e3:8.0f}k lines/s")
+
+
+def benchmark_ingestion(num_lines: int, repeats: int):
+    # - Log stream as the Engine API sends it: one multiplexed frame per timestamped line, cut into 64 KiB chunks.
+    #   Output switches between stdout and stderr every 50 lines on average.
+    frames, cli_output, stream = bytearray(), bytearray(), STREAM.STDOUT
+    for i in range(num_lines):
+        line = random.choice(SAMPLE_LINES).encode('utf-8')
+        payload = f'2025-01-01T02:{i // 60000 % 60:02d}:{i // 1000 % 60:02d}.{i % 1000:03d}456789Z '.encode() + line
+        if random.random() < 0.02:
+            stream = STREAM.STDERR if stream == STREAM.STDOUT else STREAM.STDOUT
+        frames += bytes([stream, 0, 0, 0]) + (len(payload) + 1).to_bytes(4, 'big') + payload + b'\n'
+        cli_output += line + b'\n'
+    chunks = [bytes(frames[i:i + 64 * 1024]) for i in range(0, len(frames), 64 * 1024)]
+    # - What the CLI based ingestion got for the same lines (complete lines of about the same chunk size)
+    num_lines_per_chunk = num_lines // len(chunks) + 1
+    cli_lines = bytes(cli_output).split(b'\n')[:-1]
+    cli_chunks = [cli_lines[i:i + num_lines_per_chunk] for i in range(0, num_lines, num_lines_per_chunk)]
+
+    def parse():
+        parser = LogStreamParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+
+    def ingest():
+        parser, container = LogStreamParser(), Container('', 'benchmark', max_log_bytes=1024 ** 3)
+        for chunk in chunks:
+            container.add_log_lines(*parser.feed(chunk))
+
+    def ingest_cli_output():
+        container = Container('', 'benchmark', max_log_bytes=1024 ** 3)
+        for lines in cli_chunks:
+            container.add_log_lines([0.] * len(lines), lines, [STREAM.UNKNOWN] * len(lines))
+
+    results = {
+        'parse frames': _best_of(repeats, parse),
+        'parse frames and store lines': _best_of(repeats, ingest),
+        'store lines of CLI output (no frames)': _best_of(repeats, ingest_cli_output),
+    }
+    print(f"Ingesting {num_lines} lines from {len(frames) / 1024 ** 2:.1f} MiB of log frames (best of {repeats}):")
+    for name, seconds in results.items():
+        print(f"  {name.ljust(40)} {seconds * 1e3:8.1f} ms  {num_lines / seconds / 1e3:8.0f}k lines/s")
+
+
+def benchmark_search(num_lines: int, repeats: int):
+    random.seed(0)
+    lines = [f'{random.choice(SAMPLE_LINES)} request_id={random.getrandbits(32):08x}'.encode('utf-8')
+             for _ in range(num_lines)]
+    for index in range(0, num_lines, 100_000):  # A handful of lines worth searching for
+        lines[index] += b' disk quota exceeded'
+    batches = [lines[i:i + 500] for i in range(0, num_lines, 500)]
+    container = Container('', 'benchmark', max_log_bytes=1024 ** 3)
+    start = perf_counter()
+    for batch in batches:
+        container.add_log_lines([0.] * len(batch), batch, [STREAM.STDOUT] * len(batch))
+    ingested = perf_counter() - start
+    store, rare, common = container.log_store, 'quota exceeded', 'connection refused'
+
+    def scan(query: str):
+        # - Checking every stored line, like a search without index would
+        needle = query.encode('utf-8').lower()
+        return [index for index in range(store.first_index, store.end_index) if needle in store.text_range(
+            index, index + 1).lower()]
+
+    results = {
+        'scan every line for a rare term': _best_of(repeats, scan, rare),
+        'scan all text at once for a rare term': _best_of(repeats, store.find, rare.encode('utf-8'),
+                                                          store.first_index, store.end_index),
+        'index search for a rare term': _best_of(repeats, container.search, rare),
+        'index search for a common term': _best_of(repeats, container.search, common),
+        'index search, newest 50 of a common term': _best_of(repeats, container.search, common, 50),
+        'severity filter (warning and above)': _best_of(repeats, store.find_severities, SEVERITY.WARN,
+                                                        store.first_index, store.end_index),
+    }
+    print(f"Searching {num_lines} lines, stored and indexed in {ingested * 1e3:.0f} ms (best of {repeats}):")
+    for name, seconds in results.items():
+        print(f"  {name.ljust(40)} {seconds * 1e3:8.1f} ms")
+
+
+def benchmark_archive(num_lines: int, repeats: int):
+    random.seed(0)
+    classifier, start_time = SeverityClassifier(), 1_735_693_200.  # One line every 10 ms from 2025-01-01 02:00 on
+    lines = [f'{random.choice(SAMPLE_LINES)} request_id={random.getrandbits(32):08x}'.encode('utf-8')
+             for _ in range(num_lines)]
+    batches = [([start_time + index * .01 for index in range(i, min(i + 500, num_lines))], lines[i:i + 500])
+               for i in range(0, num_lines, 500)]
+    batches = [(timestamps, classifier.classify_batch(batch), batch, [STREAM.STDOUT] * len(batch))
+               for timestamps, batch in batches]
+    end_time = start_time + num_lines * .01
+    with tempfile.TemporaryDirectory() as archive_dir:
+        directory = Path(archive_dir) / 'benchmark'
+
+        def write():
+            shutil.rmtree(directory, ignore_errors=True)
+            archive = LogArchive(directory)
+            for batch in batches:
+                archive.append(*batch)
+            archive.close()
+
+        def read(since: float, until: float):
+            return sum(len(timestamps) for timestamps, *_ in LogArchive(directory).read(since, until))
+
+        results = {
+            'append and compress all lines': _best_of(repeats, write),
+            'reopen and read everything': _best_of(repeats, read, start_time, end_time),
+            'reopen and read the middle 1%': _best_of(repeats, read, (start_time + end_time) / 2,
+                                                      (start_time + end_time) / 2 + (end_time - start_time) / 100),
+        }
+        num_bytes = sum(path.stat().st_size for path in directory.iterdir())
+        num_segments = len(list(directory.glob('*.seg')))
+    print(f"Archiving {num_lines} lines ({sum(map(len, lines)) / 1024 ** 2:.1f} MiB of text) into {num_segments} "
+          f"segments of {num_bytes / 1024 ** 2:.1f} MiB (best of {repeats}):")
+    for name, seconds in results.items():
+        print(f"  {name.ljust(40)} {seconds * 1e3:8.1f} ms")
+
+
+def benchmark_writing(num_lines: int, repeats: int):
+    # - Two containers with interleaved timestamps, like the headless mode merges them
+    random.seed(0)
+    batches = [([1_735_693_200. + (i + j) * .01 + offset for j in range(500)],
+                [random.choice(SAMPLE_LINES).encode('utf-8') for _ in range(500)])
+               for i in range(0, num_lines // 2, 500) for offset in (0., .005)]
+
+    def write(output_format: str):
+        containers = [Container('', name, max_log_bytes=1024 ** 3, is_searchable=False) for name in ('web', 'db')]
+        for i, (timestamps, lines) in enumerate(batches):
+            containers[i % 2].add_log_lines(timestamps, lines, [STREAM.STDOUT] * len(lines))
+        with open(os.devnull, 'wb') as output:
+            writer = LogWriter(containers, output_format, output=output)
+            start = perf_counter()
+            while writer._write_unseen_lines() > 0:
+                pass
+            return perf_counter() - start
+
+    results = {f'write {output_format}': min(write(output_format) for _ in range(repeats))
+               for output_format in LogWriter.FORMATS}
+    print(f"Writing {num_lines} stored lines of two containers, merged (best of {repeats}):")
+    for name, seconds in results.items():
+        print(f"  {name.ljust(40)} {seconds * 1e3:8.1f} ms  {num_lines / seconds / 1e3:8.0f}k lines/s")
+
+
+def benchmark_merging(num_containers: int, frame_lines: int, repeats: int):
+    # - Containers logging concurrently, a few lines each per frame, the merged tab keeping up while they pile up
+    random.seed(0)
+    containers = [Container('', f'service-{i}', max_log_bytes=1024 ** 3, is_searchable=False)
+                  for i in range(num_containers)]
+    merged_log, clock = MergedLog(containers, 15), 1_735_693_200.
+    lines = [line.encode('utf-8') for line in SAMPLE_LINES]
+
+    def add_frame_lines():
+        nonlocal clock
+        for container in containers:
+            timestamps = sorted(clock + random.random() * .1 for _ in range(frame_lines // num_containers))
+            container.add_log_lines(timestamps, random.choices(lines, k=len(timestamps)),
+                                    [STREAM.STDOUT] * len(timestamps))
+        clock += .1
+
+    def resort_all():
+        # - What merging by sorting the whole combined history every frame would take
+        merged = [(timestamp, source, index) for source, container in enumerate(containers)
+                  for index, timestamp in enumerate(container.log_store.timestamps_and_severities(
+                      container.log_store.first_index, container.log_store.end_index)[1])]
+        merged.sort()
+        return merged[-40:]
+
+    print(f"Merging {num_containers} containers logging {frame_lines} lines per frame (best of {repeats}):")
+    print(f"  {'stored lines'.ljust(14)} {'update+frame'.rjust(14)} {'frame only'.rjust(14)} "
+          f"{'re-sort all'.rjust(14)}")
+    for num_stored in (10_000, 100_000, 1_000_000):
+        while len(merged_log) < num_stored:
+            add_frame_lines()
+            merged_log.get_log_window(40)
+        updated = frame = float('inf')
+        for _ in range(repeats):
+            add_frame_lines()
+            start = perf_counter()
+            merged_log.get_log_window(40)
+            updated = min(updated, perf_counter() - start)
+            frame = min(frame, _best_of(1, merged_log.get_log_window, 40))
+        resorted = _best_of(repeats, resort_all)
+        print(f"  {str(len(merged_log)).ljust(14)} {updated * 1e3:11.2f} ms {frame * 1e3:11.2f} ms "
+              f"{resorted * 1e3:11.2f} ms")
+
+
+def benchmark_startup(latency: float, repeats: int):
+    with tempfile.TemporaryDirectory() as stub_dir:
+        stub = Path(stub_dir) / 'docker'
+        stub.write_text(STUB_DOCKER.format(python=sys.executable))
+        stub.chmod(0o755)
+        os.environ['PATH'] = f'{stub_dir}{os.pathsep}{os.environ["PATH"]}'
+        os.environ['DOCKER_STUB_LATENCY'] = str(latency)
+        os.environ['DOCKER_HOST'] = 'tcp://stub'  # Make the browser use the (stubbed) CLI instead of the socket
+        names = [container.name for container in Browser.from_yml_listed_containers().containers]
+
+        def legacy_discovery():
+            # - What Container.from_name did for every container, one after another
+            for name in names:
+                subprocess.run(["docker", "inspect", "--format={{.Id}}", name], capture_output=True, text=True)
+
+        first_paint, discovered = float('inf'), float('inf')
+        real_stdout = sys.stdout
+        for _ in range(repeats):
+            sys.stdout = io.TextIOWrapper(io.BytesIO())  # Swallow the rendered frames
+            try:
+                start = perf_counter()
+                browser = Browser.from_yml_listed_containers()
+                browser._start_background_work()
+                first_paint = min(first_paint, perf_counter() - start)
+                browser.discovery.result()
+                discovered = min(discovered, perf_counter() - start)
+                browser._stop_background_work()
+            finally:
+                sys.stdout = real_stdout
+        legacy = _best_of(repeats, legacy_discovery)
+    print(f"Starting up with {len(names)} containers and {latency * 1e3:.0f} ms per docker call (best of {repeats}):")
+    print(f"  {'legacy discovery (one inspect each)'.ljust(40)} {legacy * 1e3:8.1f} ms")
+    print(f"  {'first screen painted'.ljust(40)} {first_paint * 1e3:8.1f} ms")
+    print(f"  {'all containers discovered'.ljust(40)} {discovered * 1e3:8.1f} ms")
+
+
+def serve_fake_engine(socket_path: str, num_containers: int, rate: float, line_length: int,
+                      severity_mix: dict[int, float], ansi_fraction: float, duration: float):
+    """
+    Stand-in for the Docker Engine API on a unix socket, streaming synthetic logs of some containers.
+
+    Containers are listed and inspected like Docker would, and their log streams send multiplexed, timestamped frames
+    at the given rate per container (as fast as the reader takes them if 0) for the given seconds, then end. Their stats
+    streams send a synthetic sample per second (busier containers with higher numbers) until the reader hangs up. The
+    events stream stays open without any events.
+    """
+    ids = [f'{i:064x}' for i in range(num_containers)]
+    pools = {cid: synthetic_lines(10_000, line_length, severity_mix, ansi_fraction, seed=i)
+             for i, cid in enumerate(ids)}
+
+    async def send_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        await writer.drain()
+
+    async def stream_logs(writer: asyncio.StreamWriter, pool: list[bytes]):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/vnd.docker.multiplexed-stream\r\n'
+                     b'Transfer-Encoding: chunked\r\n\r\n')
+        start, num_sent = time(), 0
+        while (elapsed := time() - start) < duration:
+            num_lines = 1000 if rate <= 0 else int(elapsed * rate) - num_sent
+            if num_lines > 0:
+                prefix = dt.datetime.now(dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f000Z ').encode('ascii')
+                lines = (pool[(num_sent + i) % len(pool)] for i in range(num_lines))
+                await send_chunk(writer, b''.join(b'\x01\x00\x00\x00' + struct.pack('>I', len(prefix) + len(line) + 1)
+                                                  + prefix + line + b'\n' for line in lines))
+                num_sent += num_lines
+            await asyncio.sleep(0 if rate <= 0 else .01)
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def stream_stats(writer: asyncio.StreamWriter, i: int):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n')
+        rng, previous_cpu = random.Random(i), {}
+        cpu_usage = system_usage = network_bytes = block_io_bytes = 0
+        while True:
+            cpu_usage += int(rng.uniform(.1, .5) * (i + 1) * 1e8)
+            system_usage += 4 * 10 ** 9  # A second of 4 CPUs
+            network_bytes += rng.randrange(10_000 * (i + 1))
+            block_io_bytes += rng.randrange(4096) * 512 if rng.random() < .3 else 0
+            cpu_stats = {'cpu_usage': {'total_usage': cpu_usage}, 'system_cpu_usage': system_usage, 'online_cpus': 4}
+            stats = {'cpu_stats': cpu_stats, 'precpu_stats': previous_cpu,
+                     'memory_stats': {'usage': (50 + 20 * i) * 1024 ** 2 + rng.randrange(1024 ** 2),
+                                      'stats': {'inactive_file': 1024 ** 2}},
+                     'networks': {'eth0': {'rx_bytes': network_bytes // 3,
+                                           'tx_bytes': network_bytes - network_bytes // 3}},
+                     'blkio_stats': {'io_service_bytes_recursive': [{'op': 'read', 'value': block_io_bytes},
+                                                                    {'op': 'write', 'value': 0}]}}
+            previous_cpu = cpu_stats
+            await send_chunk(writer, json.dumps(stats).encode('utf-8') + b'\n')
+            await asyncio.sleep(1.)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            path = (await reader.readuntil(b'\r\n\r\n')).split()[1].decode('ascii').split('?')[0]
+            parts = path.strip('/').split('/')
+            if path == '/events':
+                writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n')
+                await writer.drain()
+                await reader.read()  # Until the client hangs up
+                return
+            if path == '/containers/json':
+                body = [{'Id': cid, 'Names': [f'/service-{i}'], 'State': 'running', 'Labels': {}}
+                        for i, cid in enumerate(ids)]
+            elif len(parts) == 3 and parts[1] in pools and parts[2] == 'logs':
+                await stream_logs(writer, pools[parts[1]])
+                return
+            elif len(parts) == 3 and parts[1] in pools and parts[2] == 'stats':
+                await stream_stats(writer, ids.index(parts[1]))
+                return
+            elif len(parts) == 3 and parts[1] in pools and parts[2] == 'json':
+                body = {'Id': parts[1], 'Config': {'Tty': False}, 'State': {'Running': True}}
+            else:
+                body = {'message': f'no such path: {path}'}
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: %d\r\n\r\n' % len(json.dumps(body))
+                             + json.dumps(body).encode('utf-8'))
+                await writer.drain()
+                return
+            data = json.dumps(body).encode('utf-8')
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                         % len(data) + data)
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_unix_server(handle, socket_path)
+        print('ready', flush=True)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _resident_bytes():
+    # - Current resident set size, where /proc is available, the peak one otherwise
+    try:
+        return int(Path('/proc/self/statm').read_text().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentile(values: list[float], percent: float):
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)] if len(values) > 0 else float('nan')
+
+
+def benchmark_load(num_containers: int, rate: float, line_length: int, severity_mix: dict[int, float],
+                   ansi_fraction: float, duration: float, num_lines: int, json_path: Path = None,
+                   baseline_path: Path = None, tolerance: float = .2):
+    """
+    Synthetic load on the classifier, the containers' storage (also during a log storm), frame rendering and the whole
+    browser, fed by a fake Engine API. Metrics ending in '_per_s' are better when higher, all others when lower.
+
+    :return: Whether no metric regressed by more than the tolerance against the baseline (if any)
+    """
+    config = dict(num_containers=num_containers, rate=rate, line_length=line_length,
+                  severity_mix={SEVERITY.NAMES[severity]: weight for severity, weight in severity_mix.items()},
+                  ansi_fraction=ansi_fraction, duration=duration, num_lines=num_lines, terminal_size=[160, 50])
+    os.get_terminal_size = lambda *_: os.terminal_size(config['terminal_size'])  # The same frames on any terminal
+    metrics = {}
+    lines = synthetic_lines(num_lines, line_length, severity_mix, ansi_fraction)
+    batches = [lines[i:i + 500] for i in range(0, num_lines, 500)]
+
+    # - Classification of all lines, batch-wise like the ingestor passes them on
+    classifier = SeverityClassifier()
+    start, cpu_start = perf_counter(), process_time()
+    for batch in batches:
+        classifier.classify_batch(batch)
+    metrics['classify.lines_per_s'] = num_lines / (perf_counter() - start)
+    metrics['classify.cpu_ms_per_10k_lines'] = (process_time() - cpu_start) / num_lines * 1e7
+
+    # - Storing all lines in containers (classified, indexed for search), and what they occupy
+    gc.collect()
+    resident_start = _resident_bytes()
+    containers = [Container(f'{i:064x}', f'service-{i}', max_log_bytes=1024 ** 4) for i in range(num_containers)]
+    start, cpu_start, timestamp = perf_counter(), process_time(), time() - num_lines * .001
+    for i, batch in enumerate(batches):
+        timestamps = [timestamp + j * .001 for j in range(1, len(batch) + 1)]
+        timestamp = timestamps[-1]
+        containers[i % num_containers].add_log_lines(timestamps, batch, [STREAM.STDOUT] * len(batch))
+    metrics['container.lines_per_s'] = num_lines / (perf_counter() - start)
+    metrics['container.cpu_ms_per_10k_lines'] = (process_time() - cpu_start) / num_lines * 1e7
+    metrics['container.rss_mib_per_million_lines'] = (_resident_bytes() - resident_start) / num_lines * 1e6 / 1024 ** 2
+
+    # - A log storm of 10k lines per second (of log time), mostly a retry loop, into a rate limited container
+    storm_lines = [lines[i] if i % 10 == 0 else b'connection to db:5432 refused, retrying in 100 ms (attempt %d)' % i
+                   for i in range(num_lines)]
+    storm_container = Container('', 'storm', max_log_bytes=1024 ** 4, max_line_rate=1000)
+    cpu_start = process_time()
+    for i in range(0, num_lines, 500):
+        batch = storm_lines[i:i + 500]
+        storm_container.add_log_lines([timestamp + (i + j) * 1e-4 for j in range(len(batch))], batch,
+                                      [STREAM.STDOUT] * len(batch))
+    metrics['storm.cpu_ms_per_10k_lines'] = (process_time() - cpu_start) / num_lines * 1e7
+    metrics['storm.stored_lines_per_million_lines'] = len(storm_container.log_store) / num_lines * 1e6
+    del storm_container
+
+    # - Frames of a container tab and of the merged tab while lines keep coming in, rendered into the void
+    real_stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        browser = Browser(containers)
+        for tab in ('container_tab', 'merged_tab'):
+            frame_seconds = []
+            for i in range(200):
+                timestamp += .001
+                containers[i % num_containers].add_log_lines([timestamp], [lines[i]], [STREAM.STDOUT])
+                start = perf_counter()
+                browser._print()
+                frame_seconds.append(perf_counter() - start)
+            metrics[f'render.{tab}.p50_ms'] = _percentile(frame_seconds, 50) * 1e3
+            metrics[f'render.{tab}.p99_ms'] = _percentile(frame_seconds, 99) * 1e3
+            browser.switch_tab(backwards=True)  # From the first tab to the merged one
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+    del browser, containers
+    gc.collect()
+
+    # - The whole browser following the containers of the fake Engine API, with the printer thread drawing frames
+    with tempfile.TemporaryDirectory() as socket_dir:
+        socket_path = os.path.join(socket_dir, 'docker.sock')
+        server = subprocess.Popen([sys.executable, __file__, 'fake-engine', socket_path, json.dumps(config)],
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()  # Ready
+            os.environ['DOCKER_HOST'] = f'unix://{socket_path}'
+            containers = [Container(f'{i:064x}', f'service-{i}', max_log_bytes=1024 ** 4)
+                          for i in range(num_containers)]
+            real_stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                browser, frame_seconds = Browser(containers), []
+                print_frame = browser._print
+
+                def timed_print():
+                    frame_start = perf_counter()
+                    print_frame()
+                    frame_seconds.append(perf_counter() - frame_start)
+
+                browser._print = timed_print
+                gc.collect()
+                resident_start, cpu_start, start = _resident_bytes(), process_time(), perf_counter()
+                browser._start_background_work()
+                num_ingested, last_growth = 0, perf_counter()
+                while perf_counter() - last_growth < .5 or perf_counter() - start < duration:
+                    sleep(.05)
+                    if (num_lines_now := sum(c.log_store.end_index for c in containers)) > num_ingested:
+                        num_ingested, last_growth = num_lines_now, perf_counter()
+                cpu_seconds, resident_bytes = process_time() - cpu_start, _resident_bytes() - resident_start
+                browser._stop_background_work()
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+        finally:
+            server.terminate()
+            server.wait()
+    metrics['end_to_end.lines_per_s'] = num_ingested / (last_growth - start)
+    metrics['end_to_end.frame_p50_ms'] = _percentile(frame_seconds, 50) * 1e3
+    metrics['end_to_end.frame_p99_ms'] = _percentile(frame_seconds, 99) * 1e3
+    metrics['end_to_end.cpu_ms_per_10k_lines'] = cpu_seconds / max(num_ingested, 1) * 1e7
+    metrics['end_to_end.rss_mib_per_million_lines'] = resident_bytes / max(num_ingested, 1) * 1e6 / 1024 ** 2
+
+    offered = f'{num_containers * rate / 1e3:.0f}k lines/s' if rate > 0 else 'as fast as possible'
+    print(f"Synthetic load of {num_containers} containers, {offered} for {duration:.0f} s, {num_ingested} lines "
+          f"ingested, {len(frame_seconds)} frames drawn; components on {num_lines} lines:")
+    for name, value in metrics.items():
+        print(f"  {name.ljust(40)} {value:12.2f}")
+    if json_path is not None:
+        json_path.write_text(json.dumps(dict(config=config, metrics=metrics), indent=2) + '\n')
+    if baseline_path is None:
+        return True
+    baseline_run, regressions = json.loads(baseline_path.read_text()), []
+    if baseline_run['config'] != config:
+        print(f"Note: {baseline_path} was run with another configuration, metrics may not be comparable.")
+    for name, baseline in baseline_run['metrics'].items():
+        if name not in metrics or baseline == 0:
+            continue
+        change = metrics[name] / baseline - 1  # Relative change, positive if worse
+        change = -change if name.endswith('_per_s') else change
+        if change > tolerance:
+            regressions.append(f"  {name.ljust(40)} {baseline:12.2f} -> {metrics[name]:.2f} ({change:+.0%} worse)")
+    print(f"Regressions against {baseline_path} (more than {tolerance:.0%} worse):")
+    print('\n'.join(regressions) if regressions else '  none')
+    return len(regressions) == 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark hot paths of browse_containers.py.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    classify_parser = subparsers.add_parser('classify', help='Severity classification of log lines.')
+    classify_parser.add_argument('-n', '--num-lines', type=int, default=200_000,
+                                 help='Number of log lines (default: 200000).')
+    classify_parser.add_argument('-b', '--batch-size', type=int, default=500,
+                                 help='Lines per ingested batch (default: 500).')
+    classify_parser.add_argument('-r', '--repeats', type=int, default=3,
+                                 help='Repetitions, best is reported (default: 3).')
+    ingest_parser = subparsers.add_parser('ingest', help='Parsing and storing log frames of the Engine API.')
+    ingest_parser.add_argument('-n', '--num-lines', type=int, default=200_000,
+                               help='Number of log lines (default: 200000).')
+    ingest_parser.add_argument('-r', '--repeats', type=int, default=3,
+                               help='Repetitions, best is reported (default: 3).')
+    search_parser = subparsers.add_parser('search', help='Searching and filtering stored log lines.')
+    search_parser.add_argument('-n', '--num-lines', type=int, default=1_000_000,
+                               help='Number of log lines (default: 1000000).')
+    search_parser.add_argument('-r', '--repeats', type=int, default=3,
+                               help='Repetitions, best is reported (default: 3).')
+    archive_parser = subparsers.add_parser('archive', help='Writing and reading the on-disk log archive.')
+    archive_parser.add_argument('-n', '--num-lines', type=int, default=1_000_000,
+                                help='Number of log lines (default: 1000000).')
+    archive_parser.add_argument('-r', '--repeats', type=int, default=3,
+                                help='Repetitions, best is reported (default: 3).')
+    write_parser = subparsers.add_parser('write', help='Formatting and writing lines in the headless mode.')
+    write_parser.add_argument('-n', '--num-lines', type=int, default=200_000,
+                              help='Number of log lines (default: 200000).')
+    write_parser.add_argument('-r', '--repeats', type=int, default=3,
+                              help='Repetitions, best is reported (default: 3).')
+    merge_parser = subparsers.add_parser('merge', help='Merging the lines of all containers for the merged tab.')
+    merge_parser.add_argument('-c', '--num-containers', type=int, default=5,
+                              help='Number of containers (default: 5).')
+    merge_parser.add_argument('-f', '--frame-lines', type=int, default=1000,
+                              help='Lines added by all containers together per frame (default: 1000).')
+    merge_parser.add_argument('-r', '--repeats', type=int, default=3,
+                              help='Repetitions, best is reported (default: 3).')
+    startup_parser = subparsers.add_parser('startup', help='Browser startup with a stub docker executable.')
+    startup_parser.add_argument('-l', '--latency', type=float, default=0.05,
+                                help='Seconds each call of the stub docker executable takes (default: 0.05).')
+    startup_parser.add_argument('-r', '--repeats', type=int, default=3,
+                                help='Repetitions, best is reported (default: 3).')
+    load_parser = subparsers.add_parser('load', help='Suite: synthetic load on the classifier, containers, frame '
+                                                     'rendering and the whole browser, fed by a fake Engine API.')
+    load_parser.add_argument('-c', '--num-containers', type=int, default=4,
+                             help='Number of containers (default: 4).')
+    load_parser.add_argument('--rate', type=float, default=20_000,
+                             help='Lines per second each fake container logs, 0 for as fast as they are read '
+                                  '(default: 20000).')
+    load_parser.add_argument('-l', '--line-length', type=int, default=120,
+                             help='Average number of characters per line (default: 120).')
+    load_parser.add_argument('--severity-mix', type=_parse_severity_mix, default=DEFAULT_SEVERITY_MIX,
+                             help='Relative frequencies of the severities (default: %(default)s).')
+    load_parser.add_argument('--ansi', type=float, default=0.,
+                             help='Fraction of lines colored with ANSI escape codes (default: 0).')
+    load_parser.add_argument('-d', '--duration', type=float, default=5.,
+                             help='Seconds the fake containers keep logging (default: 5).')
+    load_parser.add_argument('-n', '--num-lines', type=int, default=500_000,
+                             help='Number of lines for the classifier and container measurements (default: 500000).')
+    load_parser.add_argument('--json', type=Path, metavar='FILE',
+                             help='Also write the configuration and metrics to this JSON file.')
+    load_parser.add_argument('--baseline', type=Path, metavar='FILE',
+                             help='JSON file of an earlier run to compare with, exits with 1 on regressions.')
+    load_parser.add_argument('--tolerance', type=float, default=.2,
+                             help='Relative change of a metric that counts as a regression (default: 0.2).')
+    fake_engine_parser = subparsers.add_parser('fake-engine', help='Serve synthetic logs on a unix socket like the '
+                                                                   'Engine API (started by load).')
+    fake_engine_parser.add_argument('socket', help='Path of the unix socket to listen on.')
+    fake_engine_parser.add_argument('config', type=json.loads, help='Configuration of the load, as JSON.')
+    args = parser.parse_args()
+
+    match args.benchmark:
+        case 'classify':
+            benchmark_classification(args.num_lines, args.batch_size, args.repeats)
+        case 'ingest':
+            benchmark_ingestion(args.num_lines, args.repeats)
+        case 'search':
+            benchmark_search(args.num_lines, args.repeats)
+        case 'archive':
+            benchmark_archive(args.num_lines, args.repeats)
+        case 'write':
+            benchmark_writing(args.num_lines, args.repeats)
+        case 'merge':
+            benchmark_merging(args.num_containers, args.frame_lines, args.repeats)
+        case 'startup':
+            benchmark_startup(args.latency, args.repeats)
+        case 'load':
+            if not benchmark_load(args.num_containers, args.rate, args.line_length, args.severity_mix, args.ansi,
+                                  args.duration, args.num_lines, args.json, args.baseline, args.tolerance):
+                exit(1)
+        case 'fake-engine':
+            serve_fake_engine(args.socket, args.config['num_containers'], args.config['rate'],
+                              args.config['line_length'], _parse_severity_mix(','.join(
+                                  f'{name}={weight}' for name, weight in args.config['severity_mix'].items())),
+                              args.config['ansi_fraction'], args.config['duration'])
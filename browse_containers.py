@@ -1,18 +1,38 @@
 
 import os
 import sys
+import json
+import mmap
+import struct
+import zlib
+import math
+import heapq
+import asyncio
 import tty
 import termios
+import re
+import shutil
+import signal
 import subprocess
 import datetime as dt
-from argparse import ArgumentParser
-from functools import cached_property
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import Future
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, chain, compress, islice, repeat
+from operator import eq, itemgetter
 from pathlib import Path
-from threading import Thread
-from time import sleep
+from string import ascii_lowercase, ascii_uppercase
+from urllib.parse import quote
+from threading import Event, Lock, Thread
+from typing import Callable
+from time import perf_counter, sleep, time
 
 
 YML = Path(__file__).parent / 'src/services/docker-compose.yml'
+COMPOSE_PROJECT = next((line.removeprefix('name:').strip() for line in YML.read_text().splitlines()
+                        if line.startswith('name:')), YML.parent.name)
 
 
 class ANSICODES:
@@ -27,6 +47,28 @@ class ANSICODES:
     RESET = '\033[0m'
     CLEAR_SCREEN = '\033[2J\033[H'
     NOTBOLD = '\033[22m'
+    REVERSE = '\033[7m'
+    NOTREVERSE = '\033[27m'
+    # - Colors of the container names before merged lines, cycled through
+    CONTAINER_FGS = ('\033[38;5;75m', '\033[38;5;176m', '\033[38;5;114m', '\033[38;5;215m', '\033[38;5;141m',
+                     '\033[38;5;80m', '\033[38;5;211m', '\033[38;5;186m')
+
+
+_TERMINAL_SIZE: os.terminal_size = NotImplemented  # Cached, refreshed on SIGWINCH
+
+
+def _refresh_terminal_size(*_):
+    global _TERMINAL_SIZE
+    try:
+        _TERMINAL_SIZE = os.get_terminal_size()
+    except OSError:  # Not attached to a terminal
+        _TERMINAL_SIZE = shutil.get_terminal_size()
+
+
+def _get_terminal_size():
+    if _TERMINAL_SIZE is NotImplemented:
+        _refresh_terminal_size()
+    return _TERMINAL_SIZE
 
 
 def _get_keypress():
@@ -39,8 +81,8 @@ def _get_keypress():
     try:
         # - Set terminal to raw mode to capture keypresses immediately
         tty.setraw(fd)
-        # - Read a single character
-        key = sys.stdin.read(1)
+        # - Read a single keypress, which might be a whole escape sequence (e.g. '\033[5~' for PgUp)
+        key = os.read(fd, 32).decode('utf-8', errors='replace')
     finally:
         # - Restore original terminal settings
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
@@ -49,191 +91,2753 @@ def _get_keypress():
     return key
 
 
+def _list_running_containers():
+    """IDs and names of all running containers, with a single call."""
+    ps_output = subprocess.run(["docker", "ps", "--no-trunc", "--format", "{{.ID}} {{.Names}}"],
+                               capture_output=True, text=True)
+    return [tuple(line.split(' ', 1)) for line in ps_output.stdout.strip().splitlines()]
+
+
+def _list_yml_services():
+    """Names of the services listed in docker-compose.yml."""
+    services_text = YML.read_text().split('services:')[1]
+    return [line.removesuffix(':').strip() for line in services_text.splitlines()
+            if line.removeprefix('  ') == line.strip()  # Second level indent only
+            and line.endswith(':') and not line.strip().startswith('#')]
+
+
+def _parse_time_argument(text: str):
+    """A point in time from the command line, either a full ISO date and time or a time of today."""
+    try:
+        return dt.datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return dt.datetime.combine(dt.date.today(), dt.time.fromisoformat(text))
+    except ValueError:
+        raise ArgumentTypeError(f"invalid time '{text}', expected e.g. 2025-01-01T02:00 or 02:00 (today)")
+
+
+_ASCII_LOWERCASE = str.maketrans(ascii_uppercase, ascii_lowercase)
+
+
+def _find_spans(text: str, query: str):
+    """Start and end positions of all occurrences of the query in the text, ignoring the case of ASCII letters."""
+    # - Like the search (see SearchIndex), which lowercases encoded texts, and keeps the positions unlike str.lower()
+    text, query = text.translate(_ASCII_LOWERCASE), query.translate(_ASCII_LOWERCASE)
+    spans, position = [], 0
+    while (start := text.find(query, position)) >= 0:
+        spans.append((start, start + len(query)))
+        position = start + len(query)
+    return spans
+
+
+def _highlight_spans(row: str, row_start: int, spans: list[tuple[int, int]]):
+    """Show the parts of a row (starting at the given position of its line) within the given spans reversed."""
+    parts, position = [], 0
+    for start, end in spans:
+        start, end = max(start - row_start, position), min(end - row_start, len(row))
+        if start < end:
+            parts.extend((row[position:start], ANSICODES.REVERSE, row[start:end], ANSICODES.NOTREVERSE))
+            position = end
+    parts.append(row[position:])
+    return ''.join(parts)
+
+
+class SEVERITY:
+    # - Ordered by urgency, so the most urgent severity of some lines is their maximum
+    NONE, DEBUG, SUCCESS, INFO, WARN, ERROR, STOPPED = range(7)
+    COLORS = ('', ANSICODES.GRAY_FG, ANSICODES.GREEN_FG, ANSICODES.BLUE_FG, ANSICODES.YELLOW_FG, ANSICODES.RED_FG,
+              ANSICODES.RED_FG)
+    NAMES = ('none', 'debug', 'success', 'info', 'warning', 'error', 'stopped')
+    FILTER_LEVELS = (NONE, INFO, WARN, ERROR)  # Minimum severities to cycle through when filtering
+
+
+class STREAM:
+    # - Same values as the stream type in the frame headers of the Docker Engine API (which uses 0 for stdin)
+    UNKNOWN, STDOUT, STDERR = range(3)  # Unknown for output that is merged already, like that of the docker CLI
+    NAMES = ('unknown', 'stdout', 'stderr')
+
+
+class SeverityClassifier:
+    """
+    Classifies the severities of whole batches of (still encoded) log lines at once.
+
+    The keyword tables are compiled into a plan of substring scans, ordered by priority (error > warn > info > success >
+    debug). A batch is lowercased and joined into one bytes object, every keyword is searched through it with find (and
+    extra regex patterns with one compiled regex per severity), and each hit is mapped to its line. Python code only
+    runs per hit, and only once per keyword and line, instead of per keyword and line. Keyword tables can be extended
+    per service, see SERVICE_PATTERNS.
+    """
+    DEFAULT_KEYWORDS = {
+        SEVERITY.ERROR: ("error", "fail", "fatal", "panic", "exception", "traceback", "can't", "denied", "unavailable",
+                         "unreachable", "not found", "no such"),
+        SEVERITY.WARN: ("warn", "retrying", "retry", "slow", "slowly"),
+        SEVERITY.INFO: ("info", "notice", "starting", "started", "listening", "listened"),
+        SEVERITY.SUCCESS: ("success", "ready", "connected", "completed", "done"),
+        SEVERITY.DEBUG: ("debug", "verbos", "trace", "http", "https", "delete", "request", "response", "sql", "select",
+                         "insert", "inject", "update", "query"),
+    }
+    NGINX_PATTERNS = {
+        SEVERITY.ERROR: (r'" 5\d\d ', r'\[(?:crit|alert|emerg)\]'),  # 5xx status codes, severe error log levels
+        SEVERITY.WARN: (r'" 4\d\d ',),  # 4xx status codes
+    }
+    SERVICE_PATTERNS = {  # Extra patterns by service name (or prefix, if ending with '-')
+        'reverse-proxy': NGINX_PATTERNS,
+        'papsite-': NGINX_PATTERNS,
+    }
+
+    @staticmethod
+    def for_service(name: str):
+        for service, patterns in SeverityClassifier.SERVICE_PATTERNS.items():
+            if name == service or (service.endswith('-') and name.startswith(service)):
+                return SeverityClassifier(patterns=patterns)
+        return SeverityClassifier()
+
+    def __init__(self, keywords: dict[int, tuple[str, ...]] = NotImplemented,
+                 patterns: dict[int, tuple[str, ...]] = None):
+        """
+        Compile a classifier.
+
+        :param keywords: Plain (lowercase) keywords by severity, defaults to DEFAULT_KEYWORDS
+        :param patterns: Additional regex patterns by severity, matched against the lowercased lines
+        """
+        keywords = self.DEFAULT_KEYWORDS if keywords is NotImplemented else keywords
+        patterns = {} if patterns is None else patterns
+        # - The plan holds (severity, encoded keyword or compiled regex) pairs, most urgent first
+        self._plan: list[tuple[int, bytes | re.Pattern]] = []
+        for severity in sorted(set(keywords) | set(patterns), reverse=True):
+            if len(patterns.get(severity, ())) > 0:
+                self._plan.append((severity, re.compile('|'.join(patterns[severity]).encode('utf-8'))))
+            # - Keywords containing another keyword of the same severity can never change the outcome
+            severity_keywords = keywords.get(severity, ())
+            self._plan.extend((severity, kw.encode('utf-8')) for kw in severity_keywords
+                              if not any(other != kw and other in kw for other in severity_keywords))
+
+    def classify_batch(self, lines: list[bytes]) -> list[int]:
+        text = b'\n'.join(lines).lower()
+        line_starts = list(accumulate((len(line) + 1 for line in lines), initial=0))  # Incl. end of the last line
+        severities = [SEVERITY.NONE] * len(lines)
+        for severity, matcher in self._plan:
+            if isinstance(matcher, bytes):
+                find, position = text.find, 0
+                while (start := find(matcher, position)) >= 0:
+                    i = bisect_right(line_starts, start) - 1
+                    if severity > severities[i]:
+                        severities[i] = severity
+                    position = line_starts[i + 1]  # Further hits in this line don't change anything
+            else:
+                search, position = matcher.search, 0
+                while match := search(text, position):
+                    i = bisect_right(line_starts, match.start()) - 1
+                    if severity > severities[i]:
+                        severities[i] = severity
+                    position = line_starts[i + 1]
+        return severities
+
+
 class LogLine:
-    def __init__(self, timestamp: dt.datetime, text: str):
-        self._timestamp = timestamp
-        self._text = text
+    """Lightweight view on a single line inside a LogStore. Nothing is decoded before it is accessed."""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: 'LogStore', index: int):
+        self._store = store
+        self._index = index  # Absolute index inside the store
 
     @property
-    def timestamp(self): return self._timestamp
+    def timestamp(self): return dt.datetime.fromtimestamp(self._store.timestamp(self._index))
     @property
-    def raw(self): return self._text
+    def severity(self): return self._store.severity(self._index)
+    @property
+    def stream(self): return self._store.stream(self._index)
+    @property
+    def num_repeats(self): return self._store.num_repeats(self._index)
+    @property
+    def raw(self): return self._store.text(self._index) + self._store.repeat_suffix(self._index)
     @property
     def colorized(self): return self.color + self.raw + ANSICODES.RESET
-
-    @cached_property
-    def color(self):
-        line_lower = self.raw.lower()
-        if any(kw in line_lower for kw in ("info", "notice", "starting", "started", "listening", "listened")):
-            return ANSICODES.BLUE_FG
-        elif any(kw in line_lower for kw in ("warn", "retrying", "retry", "slow", "slowly")):
-            return ANSICODES.YELLOW_FG
-        elif any(kw in line_lower for kw in ("error", "fail", "fatal", "panic", "exception", "traceback", "can't",
-                                             "denied", "unavailable", "unreachable", "not found", "no such")):
-            return ANSICODES.RED_FG
-        elif any(kw in line_lower for kw in ("success", "ready", "connected", "completed", "done")):
-            return ANSICODES.GREEN_FG
-        elif any(kw in line_lower for kw in ("debug", "verbos", "trace", "http", "https", "delete", "request",
-                                             "response", "sql", "select", "insert", "inject", "update", "query")):
-            return ANSICODES.GRAY_FG
-        else:
-            return ''
+    @property
+    def color(self): return SEVERITY.COLORS[self.severity]
 
     @property
     def num_wraps(self):
-        terminal_width = os.get_terminal_size().columns
+        terminal_width = _get_terminal_size().columns
         return (len(self.raw) // terminal_width) + (1 if len(self.raw) % terminal_width > 0 else 0)
 
 
 class StoppedLogLine(LogLine):
-    def __init__(self, timestamp: dt.datetime):
-        super().__init__(timestamp, 'stopped')
+    __slots__ = ()
+
+    @property
+    def raw(self):
+        terminal_width = _get_terminal_size().columns
+        return f' {self._store.text(self._index)} '.center(terminal_width - 10, '-')
+
+
+class LogStore:
+    """
+    Compact, columnar and memory-bounded storage for the log lines of one container.
+
+    Timestamps are kept in a float64 array, severities and streams in uint8 arrays and the UTF-8 encoded texts (as they
+    came from Docker, they are decoded only when shown) in one contiguous buffer, delimited by an array of (absolute)
+    end offsets. The character length of each line is kept as well, for a prefix-sum index of how many terminal rows
+    the lines take at the current terminal width. Each line therefore costs 30 bytes plus its encoded text, which is
+    about 130 MB per million lines of 100 characters (a list of LogLine objects holding a datetime and a str needed
+    roughly 350 MB for the same lines). Lines are addressed by absolute indices that stay valid when the oldest lines
+    are evicted to keep the store below its memory cap, and when older history is paged in before the first line (the
+    indices of paged-in lines are negative). Lines standing for repeats of themselves (see Container) are counted in a
+    sparse dict, and their character lengths include the suffix showing the count.
+    """
+    EVICTION_SLACK = 0.1  # Fraction of the memory cap freed at once, so eviction is amortized over many appends
+    REPEAT_SUFFIX = ' (×{})'  # Appended to lines that stand for repeats, with the total number of occurrences
+    _SEVERITY_MASKS = [bytes(1 if severity >= min_severity else 0 for severity in range(256))
+                       for min_severity in range(SEVERITY.STOPPED + 1)]
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._timestamps = array('d')
+        self._severities = array('B')
+        self._streams = array('B')
+        self._end_offsets = array('q')  # Absolute end offset of each line's text in the stream of all texts
+        self._text = bytearray()
+        self._lengths = array('I')  # Number of characters of each line, including the repeat suffix
+        self._repeats: dict[int, int] = {}  # Number of further occurrences by absolute index, only for repeated lines
+        self._wrap_width = 0  # Terminal width the wrap index was built for
+        self._wrap_rows = array('Q')  # Absolute row number after each line at that width (prefix sums)
+        self._wrap_rows_base = 0  # Absolute row number before the first stored line
+        self._first_index = 0  # Absolute index of the first line still stored
+        self._first_offset = 0  # Absolute offset of the first text byte still stored
+        self._has_evicted = False  # Whether lines were dropped for the memory cap, older history isn't paged in then
+        # - Numbers of the lines appended (not paged in, those have negative indices) by severity, and of them evicted
+        self._appended_counts = [0] * (SEVERITY.STOPPED + 1)
+        self._evicted_counts = [0] * (SEVERITY.STOPPED + 1)
+        self._lock = Lock()
+
+    def __len__(self): return len(self._timestamps)
 
     @property
-    def color(self): return ANSICODES.RED_FG
+    def first_index(self): return self._first_index
+    @property
+    def end_index(self): return self._first_index + len(self._timestamps)
+    @property
+    def max_bytes(self): return self._max_bytes
+    @property
+    def has_evicted(self): return self._has_evicted
 
     @property
-    def raw(self):
-        terminal_width = os.get_terminal_size().columns
-        return f' {self._text} '.center(terminal_width - 10, '-')
+    def nbytes(self):
+        return (len(self._text) + self._timestamps.itemsize * len(self._timestamps) + len(self._severities)
+                + len(self._streams) + self._end_offsets.itemsize * len(self._end_offsets)
+                + self._lengths.itemsize * len(self._lengths) + self._wrap_rows.itemsize * len(self._wrap_rows))
 
+    def nbytes_from(self, index: int):
+        """Memory taken by the lines from the given absolute index on, counted like nbytes."""
+        with self._lock:
+            position = min(max(index - self._first_index, 0), len(self._timestamps))
+            if position == len(self._timestamps):
+                return 0
+            start = self._end_offsets[position - 1] if position > 0 else self._first_offset
+            return self._end_offsets[-1] - start + (len(self._timestamps) - position) * self._line_overhead()
+
+    def _line_overhead(self):
+        # - Bytes taken by each line besides its text, in the columns and the wrap index
+        return (self._timestamps.itemsize + 2 + self._end_offsets.itemsize + self._lengths.itemsize
+                + self._wrap_rows.itemsize)
 
-class Container:
     @staticmethod
-    def from_id(cid: str):
-        result = subprocess.run(["docker", "inspect", "--format={{.Name}}", cid], capture_output=True, text=True)
-        name = result.stdout.strip().lstrip('/')
-        return Container(cid, name)
+    def _lengths_of(lines: list[bytes]):
+        # - Only non-ASCII lines need decoding to know their number of characters, most batches have none at all
+        if b''.join(lines).isascii():
+            return list(map(len, lines))
+        return [len(line) if line.isascii() else len(line.decode('utf-8', errors='replace')) for line in lines]
+
+    def _add_repeat_suffixes(self, lengths: list[int], repeats: dict[int, int] | None):
+        for position, num_repeats in ({} if repeats is None else repeats).items():
+            lengths[position] += len(self.REPEAT_SUFFIX.format(num_repeats + 1))
+
+    def extend(self, timestamps: list[float], severities: list[int], lines: list[bytes], streams: list[int],
+               repeats: dict[int, int] = None):
+        """
+        Append lines after the last stored one.
+
+        :param repeats: Number of further occurrences of the lines that stand for repeats, by position among the lines
+        """
+        lengths = self._lengths_of(lines)
+        self._add_repeat_suffixes(lengths, repeats)
+        with self._lock:
+            if repeats:
+                end_index = self.end_index
+                self._repeats.update((end_index + position, num_repeats) for position, num_repeats in repeats.items())
+            last_end_offset = self._end_offsets[-1] if len(self._end_offsets) > 0 else self._first_offset
+            self._timestamps.extend(timestamps)
+            self._severities.extend(severities)
+            self._count_severities(self._appended_counts, bytes(severities))
+            self._streams.extend(streams)
+            self._end_offsets.extend(islice(accumulate(map(len, lines), initial=last_end_offset), 1, None))
+            self._text += b''.join(lines)
+            self._lengths.extend(lengths)
+            if self.nbytes > self._max_bytes:
+                self._evict()
+
+    def prepend(self, timestamps: list[float], severities: list[int], lines: list[bytes], streams: list[int],
+                repeats: dict[int, int] = None):
+        """Insert older lines before the first stored one, i.e. history paged in after the newer lines."""
+        lengths = self._lengths_of(lines)
+        self._add_repeat_suffixes(lengths, repeats)
+        with self._lock:
+            if repeats:
+                first_index = self._first_index - len(lines)
+                self._repeats.update((first_index + position, num_repeats) for position, num_repeats in repeats.items())
+            first_offset = self._first_offset - sum(map(len, lines))
+            self._timestamps[:0] = array('d', timestamps)
+            self._severities[:0] = array('B', severities)
+            self._streams[:0] = array('B', streams)
+            self._end_offsets[:0] = array('q', islice(accumulate(map(len, lines), initial=first_offset), 1, None))
+            self._text[:0] = b''.join(lines)
+            self._lengths[:0] = array('I', lengths)
+            self._first_index -= len(lines)
+            self._first_offset = first_offset
+            self._wrap_width, self._wrap_rows = 0, array('Q')  # Row numbers shift, rebuild the wrap index on demand
+            if self.nbytes > self._max_bytes:
+                self._evict()
+
+    def repeat_last(self, num_repeats: int):
+        """Count further occurrences of the last stored line, which then stands for all of them."""
+        with self._lock:
+            if len(self._timestamps) == 0:
+                return
+            index = self.end_index - 1
+            total = self._repeats.get(index, 0) + num_repeats
+            old_suffix = self.REPEAT_SUFFIX.format(self._repeats[index] + 1) if index in self._repeats else ''
+            self._repeats[index] = total
+            self._lengths[-1] += len(self.REPEAT_SUFFIX.format(total + 1)) - len(old_suffix)
+            if len(self._wrap_rows) == len(self._lengths):  # The last line's rows are indexed, only they change
+                last_row = self._wrap_rows[-2] if len(self._wrap_rows) > 1 else self._wrap_rows_base
+                self._wrap_rows[-1] = last_row + ((self._lengths[-1] + self._wrap_width - 1) // self._wrap_width or 1)
 
     @staticmethod
-    def from_name(name: str):
-        result = subprocess.run(["docker", "inspect", "--format={{.Id}}", name], capture_output=True, text=True)
-        cid = result.stdout.strip()
-        return Container(cid, name)
+    def _count_severities(counts: list[int], severities: bytes):
+        # - One scan in C per severity, of however many lines
+        for severity in range(len(counts)):
+            counts[severity] += severities.count(severity)
+
+    def _evict(self):
+        # - Free the oldest lines until the store is a bit below its memory cap (lock must be held)
+        bytes_to_free = self.nbytes - int(self._max_bytes * (1 - self.EVICTION_SLACK))
+        bytes_per_line_overhead = self._line_overhead()
+        num_lines = 0
+        while num_lines < len(self._timestamps) and bytes_to_free > 0:
+            start = self._end_offsets[num_lines - 1] if num_lines > 0 else self._first_offset
+            bytes_to_free -= self._end_offsets[num_lines] - start + bytes_per_line_overhead
+            num_lines += 1
+        if num_lines == 0:
+            return
+        num_bytes = self._end_offsets[num_lines - 1] - self._first_offset
+        self._count_severities(self._evicted_counts,
+                               self._severities[max(-self._first_index, 0):num_lines].tobytes())  # If appended
+        del self._timestamps[:num_lines]
+        del self._severities[:num_lines]
+        del self._streams[:num_lines]
+        del self._end_offsets[:num_lines]
+        del self._text[:num_bytes]
+        del self._lengths[:num_lines]
+        if len(self._wrap_rows) >= num_lines:
+            self._wrap_rows_base = self._wrap_rows[num_lines - 1]
+            del self._wrap_rows[:num_lines]
+        else:
+            self._wrap_width = 0  # Index was not up to date anyway, rebuild it on demand
+        self._first_index += num_lines
+        self._first_offset += num_bytes
+        self._has_evicted = True
+        if len(self._repeats) > 0:
+            self._repeats = {index: num_repeats for index, num_repeats in self._repeats.items()
+                             if index >= self._first_index}
+
+    def _position(self, index: int):
+        position = index - self._first_index
+        if not 0 <= position < len(self._timestamps):
+            raise IndexError(f"Log line {index} is not stored (anymore).")
+        return position
+
+    def timestamp(self, index: int):
+        with self._lock:
+            return self._timestamps[self._position(index)]
+
+    def severity(self, index: int):
+        with self._lock:
+            return self._severities[self._position(index)]
+
+    def stream(self, index: int):
+        with self._lock:
+            return self._streams[self._position(index)]
+
+    def text(self, index: int):
+        with self._lock:
+            position = self._position(index)
+            start = self._end_offsets[position - 1] if position > 0 else self._first_offset
+            end = self._end_offsets[position]
+            return self._text[start - self._first_offset:end - self._first_offset].decode('utf-8', errors='replace')
+
+    def num_repeats(self, index: int):
+        """Number of further occurrences the given line stands for."""
+        return self._repeats.get(index, 0)
+
+    def repeat_suffix(self, index: int):
+        num_repeats = self._repeats.get(index, 0)
+        return self.REPEAT_SUFFIX.format(num_repeats + 1) if num_repeats > 0 else ''
+
+    def _update_wrap_index(self, width: int):
+        # - Extend the prefix sums of wrapped rows to all stored lines, rebuild them after a resize (lock must be held)
+        if width != self._wrap_width:
+            self._wrap_width = width
+            self._wrap_rows = array('Q')
+            self._wrap_rows_base = 0
+        num_indexed = len(self._wrap_rows)
+        if num_indexed < len(self._lengths):
+            last_row = self._wrap_rows[-1] if num_indexed > 0 else self._wrap_rows_base
+            # - Each line takes at least one row, even if empty
+            num_rows = ((length + width - 1) // width or 1 for length in islice(self._lengths, num_indexed, None))
+            self._wrap_rows.extend(islice(accumulate(num_rows, initial=last_row), 1, None))
+
+    def first_row(self, width: int):
+        """Absolute row number (at the given terminal width) where the first stored line starts."""
+        with self._lock:
+            self._update_wrap_index(width)
+            return self._wrap_rows_base
+
+    def end_row(self, index: int, width: int):
+        """Absolute row number (at the given terminal width) right after the given line, clamped to stored lines."""
+        with self._lock:
+            self._update_wrap_index(width)
+            if len(self._wrap_rows) == 0:
+                return self._wrap_rows_base
+            position = min(max(index - self._first_index, 0), len(self._wrap_rows) - 1)
+            return self._wrap_rows[position]
+
+    def index_at_row(self, row: int, width: int):
+        """Index of the line covering the given absolute row (at the given terminal width), clamped to stored lines."""
+        with self._lock:
+            self._update_wrap_index(width)
+            position = min(bisect_right(self._wrap_rows, row), len(self._wrap_rows) - 1)
+            return self._first_index + max(position, 0)
+
+    def window_start(self, end: int, num_rows: int, width: int):
+        """Index of the first line of the longest run of lines ending before `end` that fits into `num_rows` rows."""
+        with self._lock:
+            self._update_wrap_index(width)
+            end_position = min(end - self._first_index, len(self._wrap_rows))
+            if end_position <= 0:
+                return end
+            top_row = self._wrap_rows[end_position - 1] - num_rows
+            if top_row <= self._wrap_rows_base:
+                return self._first_index
+            # - The first line to show is the one after the last line ending above the top row
+            return self._first_index + bisect_left(self._wrap_rows, top_row, hi=end_position) + 1
+
+    def length(self, index: int):
+        with self._lock:
+            return self._lengths[self._position(index)]
+
+    def _byte_range(self, start: int, end: int):
+        # - Positions and relative text offsets of the stored lines among the given ones (lock must be held)
+        start_position = min(max(start - self._first_index, 0), len(self._timestamps))
+        end_position = min(max(end - self._first_index, start_position), len(self._timestamps))
+        start_offset = self._end_offsets[start_position - 1] if start_position > 0 else self._first_offset
+        end_offset = self._end_offsets[end_position - 1] if end_position > 0 else self._first_offset
+        return start_position, end_position, start_offset - self._first_offset, end_offset - self._first_offset
+
+    def text_range(self, start: int, end: int):
+        """Encoded texts of the given lines, concatenated without any separator."""
+        with self._lock:
+            _, _, start_offset, end_offset = self._byte_range(start, end)
+            return bytes(self._text[start_offset:end_offset])
+
+    def find(self, needle: bytes, start: int, end: int):
+        """
+        Indices of the given lines containing the (lowercase) needle, ignoring the case of ASCII letters, with one scan
+        of their text.
+        """
+        matches = []
+        with self._lock:
+            start_position, end_position, start_offset, end_offset = self._byte_range(start, end)
+            text = self._text[start_offset:end_offset].lower()
+            end_offsets = self._end_offsets[start_position:end_position]
+            base_offset = start_offset + self._first_offset
+            position = 0
+            while (hit := text.find(needle, position)) >= 0:
+                i = bisect_right(end_offsets, base_offset + hit)  # Line containing the hit
+                line_end = end_offsets[i] - base_offset
+                if hit + len(needle) <= line_end:
+                    matches.append(self._first_index + start_position + i)
+                    position = line_end
+                else:  # Spans into the next line
+                    position = hit + 1
+        return matches
+
+    def find_severities(self, min_severity: int, start: int, end: int):
+        """Indices of the given lines with at least the given severity."""
+        matches = []
+        with self._lock:
+            start_position, end_position, _, _ = self._byte_range(start, end)
+            # - Map the severities to 1 if urgent enough, 0 otherwise, and find the ones
+            flags = self._severities[start_position:end_position].tobytes().translate(
+                self._SEVERITY_MASKS[min_severity])
+            base_index = self._first_index + start_position
+            position = 0
+            while (hit := flags.find(1, position)) >= 0:
+                matches.append(base_index + hit)
+                position = hit + 1
+        return matches
+
+    def severity_counts_until(self, end: int, counts: list[int], start: int):
+        """
+        Numbers of the appended lines before `end` by severity, from those before `start` (given as counts), counting
+        just the lines in between. Evicted lines count as well.
+        """
+        with self._lock:
+            counts = list(map(max, counts, self._evicted_counts))  # Also the counts before the first stored line
+            start_position, end_position, _, _ = self._byte_range(max(start, 0), max(end, 0))
+            self._count_severities(counts, self._severities[start_position:end_position].tobytes())
+            return counts
+
+    def severity_counts_from(self, counts: list[int]):
+        """Numbers of the appended lines still stored after the ones counted in the given counts, by severity."""
+        with self._lock:
+            return [appended - max(before, evicted)
+                    for appended, before, evicted in zip(self._appended_counts, counts, self._evicted_counts)]
+
+    def line(self, index: int):
+        if self.severity(index) == SEVERITY.STOPPED:
+            return StoppedLogLine(self, index)
+        return LogLine(self, index)
+
+    def lines(self, start: int, end: int):
+        return [self.line(i) for i in range(max(start, self.first_index), min(end, self.end_index))]
+
+    def timestamps_and_severities(self, start: int, end: int):
+        """Index of the first of the given lines still stored, and the timestamps and severities from there on."""
+        with self._lock:
+            start_position, end_position, _, _ = self._byte_range(start, end)
+            return (self._first_index + start_position, self._timestamps[start_position:end_position].tolist(),
+                    self._severities[start_position:end_position].tolist())
+
+    def columns(self, start: int, end: int):
+        """Timestamps, severities, encoded texts and streams of the given lines, all read at once."""
+        with self._lock:
+            start_position, end_position, start_offset, end_offset = self._byte_range(start, end)
+            text = bytes(self._text[start_offset:end_offset])
+            offsets = [0, *(offset - self._first_offset - start_offset
+                            for offset in self._end_offsets[start_position:end_position])]
+            return (self._timestamps[start_position:end_position].tolist(),
+                    self._severities[start_position:end_position].tolist(),
+                    [text[line_start:line_end] for line_start, line_end in zip(offsets, offsets[1:])],
+                    self._streams[start_position:end_position].tolist())
+
+
+class SearchIndex:
+    """
+    Incremental block-level trigram index over the lines of a LogStore, to find the lines containing a text quickly.
+
+    Lines are grouped into blocks of BLOCK_SIZE lines by their absolute index. Once a block is complete, the trigrams of
+    its distinct (lowercased, whitespace-separated) tokens are added to an inverted index from each trigram to the
+    blocks containing it. A query then only scans the blocks that contain all trigrams of the query, plus the incomplete
+    blocks at both ends, each with a single find over its text. Tokenizing first keeps indexing cheap, as most tokens of
+    a block repeat, and it is enough as no trigram of a query token spans the whitespace between two tokens of a line.
+    """
+    BLOCK_SIZE = 4096
+
+    def __init__(self, store: LogStore):
+        self._store = store
+        self._blocks: dict[tuple[int, int, int], array] = {}  # Numbers of the blocks containing each trigram
+        self._indexed_start = 0  # Absolute index of the first line of the first indexed block
+        self._indexed_end = 0  # Absolute index after the last line of the last indexed block
+        self._num_stale_blocks = 0  # Blocks that were evicted but are still referenced in the index
+        self._lock = Lock()
+
+    @staticmethod
+    def _trigrams(text: bytes):
+        tokens = b' '.join(set(text.lower().split()))
+        return set(zip(tokens, tokens[1:], tokens[2:]))
+
+    def update(self):
+        """Index the blocks completed since the last update, at both ends of the store."""
+        size, first, end = self.BLOCK_SIZE, self._store.first_index, self._store.end_index
+        with self._lock:
+            if self._indexed_end <= first:  # Nothing indexed yet, or all of it evicted
+                self._blocks.clear()
+                self._indexed_start = self._indexed_end = -(-first // size) * size
+                self._num_stale_blocks = 0
+            while self._indexed_end + size <= end:
+                self._add_block(self._indexed_end)
+                self._indexed_end += size
+            while self._indexed_start - size >= first:  # Older history paged in
+                self._indexed_start -= size
+                self._add_block(self._indexed_start)
+            if first >= self._indexed_start + size:
+                num_evicted = (first - self._indexed_start) // size
+                self._indexed_start += num_evicted * size
+                self._num_stale_blocks += num_evicted
+            if self._num_stale_blocks > (self._indexed_end - self._indexed_start) // size:
+                self._drop_stale_blocks()
+
+    def _add_block(self, start: int):
+        number = start // self.BLOCK_SIZE
+        for trigram in self._trigrams(self._store.text_range(start, start + self.BLOCK_SIZE)):
+            blocks = self._blocks.get(trigram)
+            if blocks is None:
+                self._blocks[trigram] = array('i', (number,))
+            else:
+                blocks.append(number)
+
+    def _drop_stale_blocks(self):
+        first_number = self._indexed_start // self.BLOCK_SIZE
+        for trigram, blocks in list(self._blocks.items()):
+            blocks = array('i', (number for number in blocks if number >= first_number))
+            if len(blocks) > 0:
+                self._blocks[trigram] = blocks
+            else:
+                del self._blocks[trigram]
+        self._num_stale_blocks = 0
+
+    def search(self, query: str, start: int, end: int, limit: int = None):
+        """
+        Find the lines containing the query, ignoring the case of ASCII letters (the texts are lowercased encoded, so
+        the query is too, other letters must match exactly).
+
+        :param query: Text to search for
+        :param start: Absolute index of the first line to search
+        :param end: Absolute index after the last line to search
+        :param limit: Maximum number of matches, the newest ones are kept, None for all
+        :return: Absolute indices of the matching lines, ascending
+        """
+        needle = query.encode('utf-8').lower()
+        trigrams = set().union(*(zip(token, token[1:], token[2:]) for token in needle.split()))
+        with self._lock:
+            indexed_start, indexed_end = max(self._indexed_start, start), min(self._indexed_end, end)
+            if len(trigrams) == 0 or indexed_start >= indexed_end:
+                ranges = [(start, end)]  # Nothing to narrow the search down with
+            else:
+                block_sets = sorted((set(self._blocks.get(trigram, ())) for trigram in trigrams), key=len)
+                candidates = block_sets[0].intersection(*block_sets[1:])
+                size = self.BLOCK_SIZE
+                ranges = [(start, indexed_start)]
+                ranges.extend((max(number * size, indexed_start), min((number + 1) * size, indexed_end))
+                              for number in sorted(candidates))
+                ranges.append((indexed_end, end))
+        # - Newest ranges first, so a limited search can stop early
+        chunks, num_matches = [], 0
+        for range_start, range_end in reversed(ranges):
+            if range_start < range_end and (chunk := self._store.find(needle, range_start, range_end)):
+                chunks.append(chunk)
+                num_matches += len(chunk)
+                if limit is not None and num_matches >= limit:
+                    break
+        matches = [index for chunk in reversed(chunks) for index in chunk]
+        return matches if limit is None else matches[max(len(matches) - limit, 0):]
+
+
+class LogArchive:
+    """
+    Append-only on-disk archive of one container's log lines, in zlib compressed, size-rotated segment files.
+
+    Lines are buffered and written in blocks of about BLOCK_BYTES of text, each compressed on its own and stored
+    column-wise like in the LogStore. Every segment file `<first timestamp in µs>.seg` comes with a sparse index
+    `<...>.idx` holding one fixed-size entry per block (time range, offset, size), so a time range is read by picking
+    the segment by its name, the block by bisecting the index and decompressing only the blocks in range straight from
+    the memory-mapped segment. Lines not newer than the newest archived one are skipped, so the backfill of a restarted
+    browser doesn't archive the same lines twice.
+    """
+    BLOCK_BYTES = 64 * 1024  # Text per compressed block
+    SEGMENT_BYTES = 16 * 1024 ** 2  # Compressed size after which a new segment is started
+    FLUSH_INTERVAL = 5.  # Seconds after which buffered lines are written even if the block isn't full yet
+    COMPRESSION_LEVEL = 1  # Half the time of the default level for ~15% larger segments, it runs during ingestion
+    _INDEX_ENTRY = struct.Struct('<ddQII')  # First and last timestamp, offset and size in the segment, number of lines
+    _BLOCK_HEADER = struct.Struct('<I')  # Number of lines
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+        self._buffer: tuple[list[float], list[int], list[bytes], list[int]] = ([], [], [], [])
+        self._num_buffered_bytes = 0
+        self._buffered_since = 0.  # Time the oldest buffered line came in
+        self._segment = None  # Segment file currently appended to, opened on the first write
+        self._index = None  # Index file of that segment
+        self._segment_size = 0
+        self._last_timestamp = float('-inf')  # Newest archived line
+        segments = self._segments()
+        if len(segments) > 0:
+            entries = self._read_index(segments[-1][1])
+            self._last_timestamp = max((entry[1] for entry in entries), default=segments[-1][0] / 1e6)
+        self._lock = Lock()
+
+    @property
+    def directory(self): return self._directory
+
+    def _segments(self):
+        # - First timestamps (in µs) and paths of the segment files, oldest first
+        if not self._directory.is_dir():
+            return []
+        return sorted((int(path.stem), path) for path in self._directory.glob('*.seg') if path.stem.isdigit())
+
+    def _read_index(self, segment_path: Path):
+        data = segment_path.with_suffix('.idx').read_bytes()
+        size = self._INDEX_ENTRY.size
+        return list(self._INDEX_ENTRY.iter_unpack(data[:len(data) // size * size]))  # Without a torn last entry
+
+    def append(self, timestamps: list[float], severities: list[int], lines: list[bytes], streams: list[int]):
+        with self._lock:
+            if len(timestamps) > 0 and min(timestamps) <= self._last_timestamp:  # Archived already
+                keep = [i for i, timestamp in enumerate(timestamps) if timestamp > self._last_timestamp]
+                timestamps, severities = [timestamps[i] for i in keep], [severities[i] for i in keep]
+                lines, streams = [lines[i] for i in keep], [streams[i] for i in keep]
+            if len(timestamps) == 0:
+                return
+            if self._num_buffered_bytes == 0:
+                self._buffered_since = time()
+            for column, values in zip(self._buffer, (timestamps, severities, lines, streams)):
+                column.extend(values)
+            self._num_buffered_bytes += sum(map(len, lines))
+            self._last_timestamp = max(self._last_timestamp, max(timestamps))
+            if (self._num_buffered_bytes >= self.BLOCK_BYTES
+                    or time() - self._buffered_since >= self.FLUSH_INTERVAL):
+                self._write_block()
+
+    def _write_block(self):
+        # - Compress the buffered lines into one block of the current segment (lock must be held)
+        timestamps, severities, lines, streams = self._buffer
+        if len(timestamps) == 0:
+            return
+        data = b''.join((self._BLOCK_HEADER.pack(len(lines)), array('d', timestamps).tobytes(), bytes(severities),
+                         bytes(streams), array('I', map(len, lines)).tobytes(), *lines))
+        block = zlib.compress(data, self.COMPRESSION_LEVEL)
+        if self._segment is None or self._segment_size >= self.SEGMENT_BYTES:
+            self._close_segment()
+            self._directory.mkdir(parents=True, exist_ok=True)
+            path = self._directory / f'{int(timestamps[0] * 1e6):017d}.seg'
+            self._segment, self._index = open(path, 'ab'), open(path.with_suffix('.idx'), 'ab')
+            self._segment_size = self._segment.tell()
+        self._segment.write(block)
+        self._segment.flush()  # Before its index entry, so the index never points past the segment's end
+        self._index.write(self._INDEX_ENTRY.pack(min(timestamps), max(timestamps), self._segment_size, len(block),
+                                                 len(lines)))
+        self._index.flush()
+        self._segment_size += len(block)
+        self._buffer = ([], [], [], [])
+        self._num_buffered_bytes = 0
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
 
-    def __init__(self, cid: str, name: str):
+    def close(self):
+        """Write the buffered lines and close the current segment."""
+        with self._lock:
+            self._write_block()
+            self._close_segment()
+
+    def read(self, since: float = float('-inf'), until: float = float('inf')):
+        """
+        Read the archived lines of a time range, without touching the segments and blocks outside of it.
+
+        :param since: Timestamp of the oldest line to read
+        :param until: Timestamp of the newest line to read
+        :return: Generator of (timestamps, severities, lines, streams) per block, oldest first
+        """
+        segments = self._segments()
+        first_segment = max(bisect_right([start for start, _ in segments], since * 1e6) - 1, 0)
+        for start, path in segments[first_segment:]:
+            if start / 1e6 > until:
+                break
+            entries = [entry for entry in self._read_index(path) if entry[1] >= since and entry[0] <= until]
+            if len(entries) == 0:
+                continue
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+                for _, _, offset, size, num_lines in entries:
+                    yield self._decode_block(zlib.decompress(segment[offset:offset + size]), num_lines, since, until)
+
+    def _decode_block(self, data: bytes, num_lines: int, since: float, until: float):
+        position = self._BLOCK_HEADER.size
+        timestamps = array('d', data[position:position + 8 * num_lines])
+        position += 8 * num_lines
+        severities, streams = data[position:position + num_lines], data[position + num_lines:position + 2 * num_lines]
+        position += 2 * num_lines
+        end_offsets = list(accumulate(array('I', data[position:position + 4 * num_lines]),
+                                      initial=position + 4 * num_lines))
+        lines = [data[start:end] for start, end in zip(end_offsets, end_offsets[1:])]
+        if min(timestamps) < since or max(timestamps) > until:  # Block at an end of the range
+            keep = [i for i, timestamp in enumerate(timestamps) if since <= timestamp <= until]
+            return ([timestamps[i] for i in keep], [severities[i] for i in keep], [lines[i] for i in keep],
+                    [streams[i] for i in keep])
+        return list(timestamps), list(severities), lines, list(streams)
+
+
+class DockerAPI:
+    """
+    Minimal asyncio client for the Docker Engine API on its unix socket, covering only what this browser needs.
+
+    The socket is taken from DOCKER_HOST if that points to a unix socket, /var/run/docker.sock otherwise.
+    """
+    CHUNK_SIZE = 64 * 1024  # Maximum number of bytes read from a response at once
+
+    def __init__(self, socket_path: str = NotImplemented):
+        if socket_path is NotImplemented:
+            docker_host = os.environ.get('DOCKER_HOST', 'unix:///var/run/docker.sock')
+            socket_path = docker_host.removeprefix('unix://') if docker_host.startswith('unix://') else ''
+        self._socket_path = socket_path
+
+    @property
+    def is_available(self): return self._socket_path != '' and os.access(self._socket_path, os.R_OK | os.W_OK)
+
+    async def _open(self, path: str):
+        reader, writer = await asyncio.open_unix_connection(self._socket_path, limit=self.CHUNK_SIZE)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: docker\r\nConnection: close\r\n\r\n'.encode('ascii'))
+        await writer.drain()
+        status_line = await reader.readline()
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        status = int(status_line.split()[1]) if len(status_line.split()) > 1 else 0
+        if not 200 <= status < 300:
+            message = (await reader.read(self.CHUNK_SIZE)).decode('utf-8', errors='replace').strip()
+            writer.close()
+            raise RuntimeError(f"Docker API request {path} failed with status {status}: {message}")
+        return reader, writer, headers
+
+    async def stream(self, path: str):
+        """Request the given path and yield the response body in chunks as they arrive."""
+        reader, writer, headers = await self._open(path)
+        try:
+            if headers.get('transfer-encoding') == 'chunked':
+                while (size := int((await reader.readline()).split(b';')[0] or b'0', 16)) > 0:
+                    yield await reader.readexactly(size)
+                    await reader.readexactly(2)  # CRLF after each chunk
+            else:
+                remaining = int(headers.get('content-length', -1))  # Read until closed if unknown
+                while remaining != 0 and (chunk := await reader.read(self.CHUNK_SIZE if remaining < 0
+                                                                     else min(remaining, self.CHUNK_SIZE))):
+                    remaining -= len(chunk) if remaining > 0 else 0
+                    yield chunk
+        finally:
+            writer.close()
+
+    async def stream_json_lines(self, path: str):
+        """Request the given path and yield every newline-delimited JSON object of the response as it arrives."""
+        rest = b''
+        async for chunk in self.stream(path):
+            *lines, rest = (rest + chunk).split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if rest.strip():
+            yield json.loads(rest)
+
+    async def get_json(self, path: str):
+        return json.loads(b''.join([chunk async for chunk in self.stream(path)]))
+
+
+class LogStreamParser:
+    """
+    Splits the log stream of the Docker Engine API into timestamped lines of stdout and stderr, without decoding them.
+
+    Unless the container has a TTY, the stream is multiplexed into frames with an 8-byte header each (stream type, three
+    padding bytes, big-endian payload size). The headers are read from a memoryview on the receive buffer, and runs of
+    frames of the same stream are joined (the only copy of their payloads) and cut into lines at once. Every line
+    starts with its RFC3339Nano timestamp (timestamps=1).
+    """
+    HEADER_SIZE = 8
+    MAX_CACHED_SECONDS = 4096  # Number of parsed whole-second timestamp prefixes kept
+
+    def __init__(self, is_multiplexed: bool = True, stream: int = STREAM.STDOUT):
+        """
+        :param is_multiplexed: Whether the stream is split into frames, i.e. the container has no TTY
+        :param stream: Stream of all lines if not multiplexed (e.g. UNKNOWN for the merged output of the docker CLI)
+        """
+        self._is_multiplexed = is_multiplexed
+        self._stream = stream
+        self._buffer = bytearray()  # Received bytes not parsed yet (incomplete frame)
+        self._rests: dict[int, bytes] = {}  # Incomplete last line by stream
+        self._seconds: dict[bytes, float] = {}  # Unix time by whole-second timestamp prefix
+
+    def feed(self, chunk: bytes) -> tuple[list[float], list[bytes], list[int]]:
+        """Parse a chunk of the stream, return timestamps, lines and streams of all lines completed by it."""
+        timestamps, lines, streams = [], [], []
+        if not self._is_multiplexed:
+            self._split(self._stream, chunk, timestamps, lines, streams)
+            return timestamps, lines, streams
+        self._buffer += chunk
+        position, size = 0, len(self._buffer)
+        run_stream, run = STREAM.UNKNOWN, []  # Payloads of consecutive frames of one stream
+        with memoryview(self._buffer) as view:
+            while size - position >= self.HEADER_SIZE:
+                end = position + self.HEADER_SIZE + int.from_bytes(view[position + 4:position + 8], 'big')
+                if end > size:
+                    break  # Payload not complete yet
+                if view[position] != run_stream and len(run) > 0:
+                    self._split(run_stream, b''.join(run), timestamps, lines, streams)
+                    run = []
+                run_stream = view[position]
+                run.append(view[position + self.HEADER_SIZE:end])
+                if end > position + self.HEADER_SIZE and view[end - 1] != ord('\n'):
+                    # - Part of a long line, the next frame continues it with a timestamp of its own
+                    self._split(run_stream, b''.join(run), timestamps, lines, streams)
+                    run = []
+                position = end
+            if len(run) > 0:
+                self._split(run_stream, b''.join(run), timestamps, lines, streams)
+            run = []  # Release the views on the buffer before resizing it
+        del self._buffer[:position]
+        return timestamps, lines, streams
+
+    def flush(self) -> tuple[list[float], list[bytes], list[int]]:
+        """Return the incomplete last lines, once the stream has ended."""
+        timestamps, lines, streams = [], [], []
+        rests, self._rests = self._rests, {}
+        for stream, rest in rests.items():
+            if rest != b'':
+                self._split(stream, rest + b'\n', timestamps, lines, streams)
+        return timestamps, lines, streams
+
+    def _split(self, stream: int, payload: bytes, timestamps: list[float], lines: list[bytes], streams: list[int]):
+        if stream in self._rests:
+            rest = self._rests.pop(stream)
+            if self._is_multiplexed and rest != b'':
+                # - Docker splits long lines into several frames, each with its own timestamp
+                payload = payload[payload.find(b' ') + 1:]
+            payload = rest + payload
+        *complete, self._rests[stream] = payload.split(b'\n')
+        seconds_by_prefix = self._seconds
+        for line in complete:
+            timestamp, _, text = line.partition(b' ')
+            # - Like b'2025-01-01T02:00:00.123456789Z', always UTC. Parsing only the fraction for all but the first
+            #   line of each second is much faster than parsing whole timestamps.
+            seconds = seconds_by_prefix.get(timestamp[:19])
+            try:
+                parsed = seconds + float(timestamp[19:-1] or b'0')
+            except (TypeError, ValueError):
+                if (parsed := self._parse_timestamp(timestamp)) is None:
+                    parsed, text = time(), line  # Not timestamped after all
+            timestamps.append(parsed)
+            lines.append(text)
+        streams.extend([stream] * len(complete))
+
+    def _parse_timestamp(self, timestamp: bytes):
+        seconds = self._seconds.get(timestamp[:19])
+        if seconds is None:
+            try:
+                seconds = dt.datetime.fromisoformat(timestamp[:19].decode('ascii') + '+00:00').timestamp()
+            except (ValueError, UnicodeDecodeError):
+                return None
+            if len(self._seconds) >= self.MAX_CACHED_SECONDS:
+                self._seconds.clear()
+            self._seconds[timestamp[:19]] = seconds
+        fraction = timestamp[19:].rstrip(b'Z')
+        try:
+            return seconds + (float(fraction) if fraction else 0.)
+        except ValueError:
+            return seconds
+
+
+class LogIngestor:
+    """
+    Single asyncio event loop (running in one background thread) that multiplexes the log streams of all containers.
+
+    Log output is read in bulk chunks and split into lines batch-wise, instead of line by line in one thread per
+    container. Only the newest lines of each container's history are loaded at first, older ones are paged in when
+    scrolled up to. Starting and stopping a container's log collection are handled as events on this same loop. If the
+    Docker socket is accessible, logs are streamed from the Engine API directly (no docker CLI process per container,
+    separate stdout and stderr, Docker's own timestamps), and the Docker events stream of the compose project is
+    subscribed to once, so containers are marked as (not) running as soon as they start or die, and log collection
+    resumes by itself after a restart. Otherwise, logs are followed through 'docker compose logs'. For a headless
+    consumer, reading a container's logs pauses while too many of its lines are unseen (backpressure). Once requested,
+    resource usage is monitored on the same loop as well, through one long-lived stats stream per container (the Engine
+    API sends a sample per second on its own), or a single 'docker stats' process for all of them without the socket.
+    """
+    CHUNK_SIZE = 64 * 1024  # Maximum number of bytes read from a log stream at once
+    EVENTS_RETRY_INTERVAL = 5.  # Seconds to wait before resubscribing to Docker events after the stream broke
+    DEFAULT_NUM_BACKFILL_LINES = 1000
+    HISTORY_PAGE_SIZE = 1000  # Number of older lines fetched at once when scrolling up to the oldest stored line
+    BACKPRESSURE_INTERVAL = .01  # Seconds between checks whether a consumer caught up with a container's lines
+    RESOURCES_RETRY_INTERVAL = 5.  # Seconds to wait before resubscribing to a stats stream that ended (or can't start)
+
+    def __init__(self, docker_api: DockerAPI = NotImplemented, num_backfill_lines: int = NotImplemented,
+                 follow: bool = True, max_unseen_share: float = None):
+        """
+        :param docker_api: Client for the Engine API, defaults to the local Docker socket
+        :param num_backfill_lines: Number of history lines loaded per container at first, negative for all of them
+        :param follow: Keep the log streams open for new lines, otherwise they end after the existing lines
+        :param max_unseen_share: Pause reading a container's logs while its unseen lines take more than this share of
+                                 its memory cap, so a slow consumer holds back the log streams instead of losing lines
+                                 to eviction (None: never pause)
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread: Thread = NotImplemented  # Thread running the event loop
+        self._docker_api = DockerAPI() if docker_api is NotImplemented else docker_api
+        self._num_backfill_lines = (self.DEFAULT_NUM_BACKFILL_LINES if num_backfill_lines is NotImplemented
+                                    else num_backfill_lines)
+        self._containers: dict[str, Container] = {}  # Containers whose logs are collected, by name
+        self._tasks: dict[str, asyncio.Task] = {}  # Log following tasks by container name
+        self._paging_tasks: dict[str, asyncio.Task] = {}  # Tasks fetching older history by container name
+        self._pending_restarts: set[str] = set()  # Containers that restarted while their old log stream was open
+        self._is_monitoring_resources = False
+        self._events_task: asyncio.Task = NotImplemented
+        self._is_watching_events = False
+        self._discovered = asyncio.Event()  # Set once the IDs of all containers are known (if they exist)
+        self._follow = follow
+        self._max_unseen_share = max_unseen_share
+
+    @property
+    def is_running(self): return isinstance(self._thread, Thread)
+
+    def start(self):
+        if self.is_running:
+            raise RuntimeError("Ingestor already started.")
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        if self._docker_api.is_available and self._follow:
+            self._loop.call_soon_threadsafe(self._start_watching_events)
+
+    def stop(self):
+        if not self.is_running:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop)
+        future.result(timeout=2.)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1.)
+        self._thread = NotImplemented
+
+    def emit_container_started(self, container: 'Container'):
+        self._loop.call_soon_threadsafe(self._on_container_started, container)
+
+    def emit_discovery(self, containers: list['Container']):
+        """Resolve IDs and states of the given containers in the background, all with a single request."""
+        return asyncio.run_coroutine_threadsafe(self._discover(containers), self._loop)
+
+    def emit_logs_ended(self):
+        """Future resolved once all log streams ended (which they only do by themselves when not following)."""
+        return asyncio.run_coroutine_threadsafe(self._wait_for_logs_ended(), self._loop)
+
+    def emit_container_stopped(self, container: 'Container'):
+        self._loop.call_soon_threadsafe(self._on_container_stopped, container)
+
+    def emit_older_logs_requested(self, container: 'Container'):
+        self._loop.call_soon_threadsafe(self._on_older_logs_requested, container)
+
+    def emit_access_log_analysis(self, containers: list['Container']):
+        """Start aggregating the access logs of the given containers (those running nginx), see Container."""
+        self._loop.call_soon_threadsafe(self._on_access_log_analysis_requested, containers)
+
+    def emit_resource_monitoring(self, containers: list['Container']):
+        """Start feeding the resource histories of the given containers, until the ingestor stops."""
+        self._loop.call_soon_threadsafe(self._on_resource_monitoring_requested, containers)
+
+    def _on_container_started(self, container: 'Container'):
+        self._containers[container.name] = container
+        if container.name in self._tasks:
+            return  # Already following this container
+        self._tasks[container.name] = self._loop.create_task(self._follow_logs(container))
+
+    @staticmethod
+    def _on_access_log_analysis_requested(containers: list['Container']):
+        # - Runs on the loop so that the backfill doesn't race with lines being added
+        for container in containers:
+            container.analyze_access_log()
+
+    def _on_container_stopped(self, container: 'Container'):
+        self._containers.pop(container.name, None)
+        self._pending_restarts.discard(container.name)
+        task = self._tasks.pop(container.name, None)
+        if task is not None:
+            task.cancel()
+
+    def _on_older_logs_requested(self, container: 'Container'):
+        if container.name in self._paging_tasks:
+            return  # Already fetching a page
+        self._paging_tasks[container.name] = self._loop.create_task(self._fetch_older_logs(container))
+
+    def _on_resource_monitoring_requested(self, containers: list['Container']):
+        if self._is_monitoring_resources:
+            return
+        self._is_monitoring_resources = True
+        if self._docker_api.is_available:
+            for container in containers:
+                self._loop.create_task(self._monitor_resources(container))
+        else:
+            self._loop.create_task(self._monitor_resources_from_cli(containers))
+
+    async def _monitor_resources(self, container: 'Container'):
+        # - Subscribed to again whenever the stream ends, e.g. when the container stops (and gets a new ID on restart)
+        if container.cid == '':
+            await self._discovered.wait()
+        while True:
+            if container.cid != '' and container.is_running:
+                try:
+                    async for stats in self._docker_api.stream_json_lines(f'/containers/{container.cid}/stats'
+                                                                          f'?stream=1'):
+                        container.add_resource_sample(*ResourceHistory.parse_api_stats(stats))
+                except (OSError, RuntimeError, ValueError, AttributeError, asyncio.IncompleteReadError):
+                    pass  # Docker daemon restarted or socket vanished
+            await asyncio.sleep(self.RESOURCES_RETRY_INTERVAL)
+
+    async def _monitor_resources_from_cli(self, containers: list['Container']):
+        # - One 'docker stats' stream for all running containers, entries are matched by their (short) IDs
+        await self._discovered.wait()
+        while True:
+            by_id = {container.cid[:12]: container for container in containers
+                     if container.cid != '' and container.is_running}
+            if len(by_id) > 0:
+                process = await asyncio.create_subprocess_exec("docker", "stats", "--format", "{{json .}}", *by_id,
+                                                               stdout=asyncio.subprocess.PIPE,
+                                                               stderr=asyncio.subprocess.DEVNULL)
+                try:
+                    while line := await process.stdout.readline():
+                        # - The CLI clears the screen between rounds, even if it doesn't write to a terminal
+                        start = line.find(b'{')
+                        try:
+                            entry = json.loads(line[start:]) if start >= 0 else {}
+                        except ValueError:
+                            continue
+                        container = by_id.get(str(entry.get('ID', ''))[:12])
+                        if container is not None:
+                            container.add_resource_sample(*ResourceHistory.parse_cli_stats(entry))
+                    await process.wait()
+                finally:
+                    if process.returncode is None:
+                        process.terminate()
+                        await process.wait()
+            await asyncio.sleep(self.RESOURCES_RETRY_INTERVAL)
+
+    async def _wait_for_logs_ended(self):
+        while len(self._tasks) > 0:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _wait_for_consumer(self, container: 'Container'):
+        # - Backpressure: stop reading while the consumer hasn't caught up, the stream is held back by Docker meanwhile
+        while (self._max_unseen_share is not None
+               and container.num_unseen_bytes > self._max_unseen_share * container.log_store.max_bytes):
+            await asyncio.sleep(self.BACKPRESSURE_INTERVAL)
+
+    async def _discover(self, containers: list['Container']):
+        try:
+            await self._discover_states(containers)
+        finally:
+            self._discovered.set()
+
+    async def _discover_states(self, containers: list['Container']):
+        if len(containers) == 0:
+            return
+        states: dict[str, tuple[str, bool]] = {}  # ID and whether it is running, by container and service name
+        try:
+            if not self._docker_api.is_available:
+                raise OSError("Docker socket not accessible.")
+            filters = json.dumps({'label': [f'com.docker.compose.project={COMPOSE_PROJECT}']})
+            for entry in await self._docker_api.get_json(f'/containers/json?all=1&filters={quote(filters)}'):
+                state = entry['Id'], entry.get('State') == 'running'
+                for name in entry.get('Names', []):
+                    states[name.lstrip('/')] = state
+                states.setdefault(entry.get('Labels', {}).get('com.docker.compose.service'), state)
+        except (OSError, RuntimeError, ValueError, asyncio.IncompleteReadError):
+            # - Fall back to a single CLI call, 'docker inspect' prints all containers it found even if some are missing
+            process = await asyncio.create_subprocess_exec("docker", "inspect", *[c.name for c in containers],
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.DEVNULL)
+            output, _ = await process.communicate()
+            for entry in json.loads(output or b'[]'):
+                states[entry['Name'].lstrip('/')] = entry['Id'], entry['State']['Running']
+        for container in containers:
+            container.update_state(*states.get(container.name, (container.cid, False)))
+
+    def _start_watching_events(self):
+        self._events_task = self._loop.create_task(self._watch_events())
+
+    async def _watch_events(self):
+        filters = json.dumps({'type': ['container'], 'event': ['start', 'die'],
+                              'label': [f'com.docker.compose.project={COMPOSE_PROJECT}']})
+        while True:
+            try:
+                async for event in self._docker_api.stream_json_lines(f'/events?filters={quote(filters)}'):
+                    self._is_watching_events = True
+                    self._on_docker_event(event)
+            except (OSError, RuntimeError, ValueError, asyncio.IncompleteReadError):
+                pass  # Docker daemon restarted or socket vanished, try again later
+            self._is_watching_events = False
+            await asyncio.sleep(self.EVENTS_RETRY_INTERVAL)
+
+    def _on_docker_event(self, event: dict):
+        attributes = event.get('Actor', {}).get('Attributes', {})
+        container = (self._containers.get(attributes.get('name'))
+                     or self._containers.get(attributes.get('com.docker.compose.service')))
+        if container is None:
+            return  # Not a container of this browser
+        timestamp = event.get('timeNano', 0) / 1e9 or time()
+        match event.get('Action', event.get('status')):
+            case 'start':
+                container.mark_started(event.get('id', container.cid))
+                if container.name in self._tasks:
+                    self._pending_restarts.add(container.name)  # Resume once the old stream is closed
+                else:
+                    self._on_container_started(container)
+            case 'die':
+                if container.is_running:
+                    container.mark_stopped(timestamp)
+
+    async def _cancel_all(self):
+        # - Includes tasks of stopped containers which are cancelled already but may still be terminating their process
+        tasks = asyncio.all_tasks(self._loop) - {asyncio.current_task()}
+        self._tasks.clear()
+        self._paging_tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(.05)  # Let the subprocess transports see their pipes close, they complain at exit otherwise
+
+    async def _follow_logs(self, container: 'Container'):
+        if container.cid == '':
+            await self._discovered.wait()
+        store, on_lines = container.log_store, container.add_log_lines
+        if container.stopped_at is not None:  # Resuming after a restart, don't replay the lines seen already
+            since = container.stopped_at
+        elif store.end_index > store.first_index:  # Stopped when discovered, for example, its last lines are stored
+            since = store.timestamp(store.end_index - 1)
+
+            def on_lines(timestamps: list[float], lines: list[bytes], streams: list[int]):
+                # - Docker includes the lines at exactly that time, which are stored already
+                nonlocal since
+                num_known = 0
+                while num_known < len(lines) and timestamps[num_known] <= since:
+                    num_known += 1
+                if num_known < len(lines):
+                    since = -math.inf  # Only the first lines of the stream can be known
+                    container.add_log_lines(timestamps[num_known:], lines[num_known:], streams[num_known:])
+        else:
+            since = None
+        if since is not None:
+            api_query = f'since={since:.9f}'
+            cli_args = ["--since", dt.datetime.fromtimestamp(since, dt.timezone.utc).isoformat()]
+        elif self._num_backfill_lines < 0:
+            api_query, cli_args = 'tail=all', []
+            container.mark_history_complete()
+        else:  # Only the newest lines at first, older ones are paged in when scrolling up to them
+            api_query, cli_args = f'tail={self._num_backfill_lines}', ["--tail", str(self._num_backfill_lines)]
+        if self._follow:
+            api_query, cli_args = f'follow=1&{api_query}', ["-f", *cli_args]
+        try:
+            await self._read_logs_from_api(container, api_query, on_lines)
+        except (OSError, RuntimeError, ValueError, KeyError, asyncio.IncompleteReadError):
+            await self._read_logs_from_cli(container, cli_args, on_lines)
+        self._tasks.pop(container.name, None)
+        if not self._follow:
+            return  # The stream ended as it should
+        if self._is_watching_events:
+            # - Stops are known from the events already, just resume if the container has been restarted meanwhile
+            if container.name in self._pending_restarts:
+                self._pending_restarts.discard(container.name)
+                self._on_container_started(container)
+            return
+        # - Log stream ended, check whether the container is still running
+        try:
+            if not self._docker_api.is_available or container.cid == '':
+                raise OSError("Docker socket not accessible or container unknown to Docker.")
+            is_running = (await self._docker_api.get_json(f'/containers/{container.cid}/json'))['State']['Running']
+        except (OSError, RuntimeError, ValueError, KeyError, asyncio.IncompleteReadError):
+            ps = await asyncio.create_subprocess_exec("docker", "ps", "-q", "-f", f"id={container.cid}",
+                                                      stdout=asyncio.subprocess.PIPE,
+                                                      stderr=asyncio.subprocess.DEVNULL)
+            ps_output, _ = await ps.communicate()
+            is_running = ps_output.strip() != b''
+        if not is_running:
+            container.mark_stopped(time())
+
+    async def _fetch_older_logs(self, container: 'Container'):
+        try:
+            store = container.log_store
+            until = store.timestamp(store.first_index)
+            # - Docker returns the lines at exactly that time as well, some of them are stored already
+            num_known = 0
+            while (store.first_index + num_known < store.end_index
+                   and store.timestamp(store.first_index + num_known) == until):
+                num_known += 1
+            num_lines = self.HISTORY_PAGE_SIZE + num_known
+            page = ([], [], [])  # Timestamps, lines and streams
+
+            def on_lines(*batch: list):
+                for column, values in zip(page, batch):
+                    column.extend(values)
+
+            try:
+                await self._read_logs_from_api(container, f'until={until:.9f}&tail={num_lines}', on_lines)
+            except (OSError, RuntimeError, ValueError, KeyError, asyncio.IncompleteReadError):
+                for column in page:
+                    column.clear()
+                await self._read_logs_from_cli(container, [
+                    "--until", dt.datetime.fromtimestamp(until, dt.timezone.utc).isoformat(), "--tail", str(num_lines)
+                ], on_lines)
+            timestamps, lines, streams = page
+            if len(lines) < num_lines:
+                container.mark_history_complete()
+            num_duplicates = 0
+            while num_duplicates < min(num_known, len(lines)) and timestamps[-1 - num_duplicates] >= until:
+                num_duplicates += 1
+            for column in page:
+                del column[len(column) - num_duplicates:]
+            if len(lines) > 0:
+                container.prepend_log_lines(timestamps, lines, streams)
+        except IndexError:
+            pass  # All stored lines were evicted meanwhile
+        finally:
+            self._paging_tasks.pop(container.name, None)
+
+    async def _read_logs_from_api(self, container: 'Container', query: str, on_lines: Callable):
+        """Read the container's logs from the Engine API and pass every batch of lines to on_lines as it comes in."""
+        # - Errors before the stream is open propagate (so the CLI can take over), later ones just end the stream
+        if not self._docker_api.is_available or container.cid == '':
+            raise OSError("Docker socket not accessible or container unknown to Docker.")
+        info = await self._docker_api.get_json(f'/containers/{container.cid}/json')
+        parser = LogStreamParser(is_multiplexed=not info['Config'].get('Tty', False))
+        stream = self._docker_api.stream(f'/containers/{container.cid}/logs?stdout=1&stderr=1&timestamps=1&{query}')
+        try:
+            chunk = await anext(stream, b'')
+            try:
+                while chunk:
+                    timestamps, lines, streams = parser.feed(chunk)
+                    if len(lines) > 0:
+                        on_lines(timestamps, lines, streams)
+                        await self._wait_for_consumer(container)
+                    chunk = await anext(stream, b'')
+            except (OSError, RuntimeError, asyncio.IncompleteReadError):
+                pass  # Docker daemon restarted or socket vanished
+        finally:
+            await stream.aclose()
+        timestamps, lines, streams = parser.flush()
+        if len(lines) > 0:
+            on_lines(timestamps, lines, streams)
+
+    async def _read_logs_from_cli(self, container: 'Container', args: list[str], on_lines: Callable):
+        """Read the container's logs through 'docker compose logs' and pass every batch of lines to on_lines."""
+        process = await asyncio.create_subprocess_exec("docker", "compose", "-f", str(YML), "logs", container.name,
+                                                       "--no-log-prefix", "--timestamps", *args,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        parser = LogStreamParser(is_multiplexed=False, stream=STREAM.UNKNOWN)
+        try:
+            while chunk := await process.stdout.read(self.CHUNK_SIZE):
+                timestamps, lines, streams = parser.feed(chunk)
+                if len(lines) > 0:
+                    on_lines(timestamps, lines, streams)
+                    await self._wait_for_consumer(container)
+            timestamps, lines, streams = parser.flush()
+            if len(lines) > 0:
+                on_lines(timestamps, lines, streams)
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+
+class ResourceHistory:
+    """
+    The newest resource samples of a container (about one per second, as Docker sends them), in a ring buffer.
+
+    Each metric is kept in a float64 array of fixed capacity that is overwritten in a circle, so memory stays the same
+    however long the browser runs. Network and block I/O come in as totals since the container started and are kept
+    as rates, derived from the totals of the previous sample.
+    """
+    CPU, MEMORY, NETWORK, BLOCK_IO = range(4)  # Metrics: CPU %, memory bytes, network and block I/O bytes per second
+    CAPACITY = 120  # Samples kept per metric
+    _SIZE_UNITS = {'B': 1, 'kB': 1e3, 'KB': 1e3, 'MB': 1e6, 'GB': 1e9, 'TB': 1e12,
+                   'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4}
+
+    def __init__(self, capacity: int = NotImplemented):
+        self._capacity = self.CAPACITY if capacity is NotImplemented else capacity
+        self._samples = [array('d', bytes(8 * self._capacity)) for _ in range(4)]
+        self._num_samples = 0  # Ever added, the next one goes to position num_samples % capacity
+        self._totals: tuple[float, float, float] | None = None  # Time, network and block I/O totals of the last one
+        self._lock = Lock()
+
+    def __len__(self): return min(self._num_samples, self._capacity)
+
+    def add(self, cpu_percent: float, memory_bytes: float, network_bytes: float, block_io_bytes: float,
+            at: float = NotImplemented):
+        """
+        Add a sample, with network and block I/O as totals (of received and sent, or read and written, bytes).
+
+        :param at: Time of the sample in seconds (monotonic), defaults to now
+        """
+        at = perf_counter() if at is NotImplemented else at
+        with self._lock:
+            if self._totals is None or at <= self._totals[0]:
+                network_rate = block_io_rate = 0.
+            else:  # Totals restart with the container, rates can't be negative then
+                elapsed = at - self._totals[0]
+                network_rate = max(network_bytes - self._totals[1], 0) / elapsed
+                block_io_rate = max(block_io_bytes - self._totals[2], 0) / elapsed
+            self._totals = at, network_bytes, block_io_bytes
+            position = self._num_samples % self._capacity
+            for samples, value in zip(self._samples, (cpu_percent, memory_bytes, network_rate, block_io_rate)):
+                samples[position] = value
+            self._num_samples += 1
+
+    def values(self, metric: int, n: int = None):
+        """The newest n (or all) values of the given metric, oldest first."""
+        with self._lock:
+            n = len(self) if n is None else min(n, len(self))
+            end = self._num_samples % self._capacity or self._capacity
+            samples = self._samples[metric]
+            if n <= end:
+                return samples[end - n:end].tolist()
+            return samples[self._capacity - (n - end):].tolist() + samples[:end].tolist()
+
+    @staticmethod
+    def parse_api_stats(stats: dict):
+        """CPU %, memory, network and block I/O totals of a sample from the stats stream of the Engine API."""
+        cpu, previous_cpu = stats.get('cpu_stats') or {}, stats.get('precpu_stats') or {}
+        cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - previous_cpu.get('cpu_usage', {}).get(
+            'total_usage', 0)
+        system_delta = cpu.get('system_cpu_usage', 0) - previous_cpu.get('system_cpu_usage', 0)
+        num_cpus = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or ()) or 1
+        # - The first sample has no previous one to compare with
+        cpu_percent = (cpu_delta / system_delta * num_cpus * 100 if system_delta > 0 and cpu_delta > 0
+                       and previous_cpu.get('system_cpu_usage') else 0.)
+        memory = stats.get('memory_stats') or {}
+        memory_stats = memory.get('stats') or {}
+        # - Like 'docker stats', without the page cache that can be reclaimed (cgroup v1 or v2 names)
+        memory_bytes = memory.get('usage', 0) - memory_stats.get('total_inactive_file',
+                                                                 memory_stats.get('inactive_file', 0))
+        network_bytes = sum(network.get('rx_bytes', 0) + network.get('tx_bytes', 0)
+                            for network in (stats.get('networks') or {}).values())
+        block_io_bytes = sum(entry.get('value', 0) for entry in
+                             (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or ()
+                             if entry.get('op', '').lower() in ('read', 'write'))
+        return cpu_percent, max(memory_bytes, 0), network_bytes, block_io_bytes
+
+    @staticmethod
+    def _parse_size(text: str):
+        match = re.fullmatch(r'\s*([\d.]+)\s*([A-Za-z]*)\s*', text)
+        return float(match[1]) * ResourceHistory._SIZE_UNITS.get(match[2], 1) if match else 0.
+
+    @staticmethod
+    def parse_cli_stats(entry: dict):
+        """CPU %, memory, network and block I/O totals of an entry of 'docker stats --format "{{json .}}"'."""
+        try:
+            cpu_percent = float(entry.get('CPUPerc', '0').rstrip('%') or 0)
+        except ValueError:
+            cpu_percent = 0.
+        memory_bytes = ResourceHistory._parse_size(entry.get('MemUsage', '0B').split('/')[0])
+        network_bytes = sum(map(ResourceHistory._parse_size, entry.get('NetIO', '0B / 0B').split('/')))
+        block_io_bytes = sum(map(ResourceHistory._parse_size, entry.get('BlockIO', '0B / 0B').split('/')))
+        return cpu_percent, memory_bytes, network_bytes, block_io_bytes
+
+
+class LatencySketch:
+    """
+    Streaming quantiles of durations with a bounded relative error, in the style of DDSketch.
+
+    Values are counted in buckets whose bounds grow geometrically (by gamma = (1 + a) / (1 - a) for the relative
+    accuracy a), so any quantile is off by at most a relative to its true value, and the number of buckets only grows
+    with the logarithm of the range of values (about 1100 for 1 µs to an hour at 1%). Sketches are merged by adding
+    their bucket counts, which makes them fit for rolling windows of time buckets.
+    """
+    RELATIVE_ACCURACY = .01
+    MIN_VALUE = 1e-6  # Values below this (e.g. 0 for cached responses) share the lowest bucket
+
+    def __init__(self):
+        self._log_gamma = math.log((1 + self.RELATIVE_ACCURACY) / (1 - self.RELATIVE_ACCURACY))
+        self._counts: Counter[int] = Counter()  # Number of values by bucket
+        self._num_values = 0
+
+    def __len__(self): return self._num_values
+
+    def add(self, value: float, count: int = 1):
+        self._counts[math.ceil(math.log(max(value, self.MIN_VALUE)) / self._log_gamma)] += count
+        self._num_values += count
+
+    def merge(self, other: 'LatencySketch'):
+        self._counts.update(other._counts)
+        self._num_values += other._num_values
+
+    def quantile(self, q: float):
+        """Value at the given quantile (0 to 1), None without values."""
+        if self._num_values == 0:
+            return None
+        rank, seen = q * (self._num_values - 1), 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen > rank:
+                # - Middle of the bucket (in relative terms), so the error is at most the accuracy either way
+                return 2 * math.exp(bucket * self._log_gamma) / (1 + math.exp(self._log_gamma))
+        return math.exp(max(self._counts) * self._log_gamma)
+
+
+class AccessLogStats:
+    """
+    Rolling aggregates of the nginx access log lines of a container: requests per second, status codes, top paths, bytes
+    sent and latency quantiles (the upstream response time if logged, the request time otherwise).
+
+    Lines are parsed batch-wise as they come in and tallied into buckets of BUCKET_SECONDS (by their Docker timestamps),
+    counting each distinct status, path, size and time once per batch. Only the newest NUM_BUCKETS are kept, and each
+    counts at most MAX_PATHS_PER_BUCKET distinct paths, so memory stays bounded whatever the traffic. Aggregates of a
+    window are merged from its buckets when shown. Lines in the combined format count as well, just without latency.
+    For latencies, nginx needs to append 'rt=$request_time urt="$upstream_response_time"' (see log_format timed in the
+    nginx.conf files). Parsing only starts once the aggregates are asked for, with the lines stored by then, see
+    Container.
+    """
+    SERVICES = ('reverse-proxy', 'papsite-')  # Services running nginx, by name (or prefix, if ending with '-')
+    BUCKET_SECONDS = 10
+    NUM_BUCKETS = 30  # Five minutes
+    MAX_PATHS_PER_BUCKET = 1000  # Further distinct paths are counted as OTHER_PATHS
+    OTHER_PATHS = '(other paths)'
+    _UPSTREAM_SEPARATORS = re.compile(rb'[,:]\s*')
+    # - The times are looked for from the end of the line on (greedily), which is much faster than a lazy scan
+    _REQUEST = re.compile(rb'"[A-Z]+ ([^ "?\n]*)[^"\n]*" (\d{3}) (\d+|-)(?:[^\n]* rt=([\d.]+)(?: urt="([^"\n]*)")?)?')
+
+    class _Bucket:
+        __slots__ = ('num_requests', 'statuses', 'paths', 'error_paths', 'num_bytes', 'latencies')
+
+        def __init__(self):
+            self.num_requests = 0
+            self.statuses: Counter[int] = Counter()
+            self.paths: Counter[str] = Counter()
+            self.error_paths: Counter[str] = Counter()  # Requests answered with 5xx, by path
+            self.num_bytes = 0
+            self.latencies = LatencySketch()
+
+    @staticmethod
+    def is_nginx_service(name: str):
+        return any(name == service or (service.endswith('-') and name.startswith(service))
+                   for service in AccessLogStats.SERVICES)
+
+    def __init__(self):
+        self._buckets: dict[int, AccessLogStats._Bucket] = {}  # By start time (whole seconds)
+        self._lock = Lock()
+
+    @staticmethod
+    def _latency(request_time: bytes | None, upstream_times: bytes | None):
+        # - Several upstreams tried add up, '-' means none was asked (e.g. served from cache)
+        try:
+            if upstream_times and upstream_times != b'-':
+                if b',' not in upstream_times and b':' not in upstream_times:  # Mostly a single upstream
+                    return float(upstream_times)
+                seconds = [float(part) for part in AccessLogStats._UPSTREAM_SEPARATORS.split(upstream_times)
+                           if part.strip() not in (b'', b'-')]
+                if len(seconds) > 0:
+                    return sum(seconds)
+            return float(request_time) if request_time else None
+        except ValueError:  # Not times after all (e.g. 'rt=.' or another log_format), counted without latency
+            return None
+
+    def _bucket(self, start: int):
+        # - The bucket starting at the given time, created if new, None if older than the window
+        if (bucket := self._buckets.get(start)) is None:
+            if len(self._buckets) >= self.NUM_BUCKETS and start < min(self._buckets):
+                return None
+            bucket = self._buckets[start] = self._Bucket()
+            if len(self._buckets) > self.NUM_BUCKETS:
+                del self._buckets[min(self._buckets)]
+        return bucket
+
+    def add_lines(self, timestamps: list[float], lines: list[bytes], counts: list[int] = None):
+        """
+        Count the access log lines among the given ones (others are ignored).
+
+        :param counts: Number of requests each line stands for (e.g. repeats collapsed into it), 1 by default
+        """
+        matches = list(map(self._REQUEST.search, lines))
+        positions = list(compress(range(len(lines)), matches))  # Of the access log lines
+        if len(positions) == 0:
+            return
+        starts = [int(timestamps[i]) // self.BUCKET_SECONDS * self.BUCKET_SECONDS for i in positions]
+        paths, statuses, sizes, request_times, upstream_times = zip(*(matches[i].groups() for i in positions))
+        weights = None if counts is None else [counts[i] for i in positions]
+
+        def tally(*columns):
+            # - Occurrences of each distinct combination (counted in C), so the rest only loops over those
+            keys = zip(starts, *columns)
+            return Counter(keys if weights is None else chain.from_iterable(map(repeat, keys, weights)))
+
+        with self._lock:
+            for (start, status, path), count in tally(statuses, paths).items():
+                if (bucket := self._bucket(start)) is None:
+                    continue  # Older than the window
+                path = path.decode('utf-8', errors='replace')
+                if path not in bucket.paths and len(bucket.paths) >= self.MAX_PATHS_PER_BUCKET:
+                    path = self.OTHER_PATHS
+                status = int(status)
+                bucket.num_requests += count
+                bucket.statuses[status] += count
+                bucket.paths[path] += count
+                if status >= 500:
+                    bucket.error_paths[path] += count
+            for (start, size), count in tally(sizes).items():
+                if size != b'-' and (bucket := self._bucket(start)) is not None:
+                    bucket.num_bytes += int(size) * count
+            for (start, request_time, upstream_time), count in tally(request_times, upstream_times).items():
+                if (latency := self._latency(request_time, upstream_time)) is not None and (
+                        bucket := self._bucket(start)) is not None:
+                    bucket.latencies.add(latency, count)
+
+    @property
+    def newest_time(self):
+        """End of the newest bucket, None before the first request."""
+        with self._lock:
+            return max(self._buckets) + self.BUCKET_SECONDS if len(self._buckets) > 0 else None
+
+    @staticmethod
+    def summarize(stats: list['AccessLogStats'], until: float):
+        """
+        Aggregates of the window of NUM_BUCKETS buckets up to the given time, merged over the given stats: requests per
+        second by bucket (oldest first), and the number of requests, bytes, status codes, requests and 5xx by path and
+        the latency sketch in the whole window.
+        """
+        seconds = AccessLogStats.BUCKET_SECONDS
+        last_start = int(until) // seconds * seconds
+        starts = range(last_start - (AccessLogStats.NUM_BUCKETS - 1) * seconds, last_start + 1, seconds)
+        total = AccessLogStats._Bucket()
+        rates = [0.] * len(starts)
+        for access_log_stats in stats:
+            with access_log_stats._lock:
+                for position, start in enumerate(starts):
+                    if (bucket := access_log_stats._buckets.get(start)) is None:
+                        continue
+                    rates[position] += bucket.num_requests / seconds
+                    total.num_requests += bucket.num_requests
+                    total.num_bytes += bucket.num_bytes
+                    total.statuses.update(bucket.statuses)
+                    total.paths.update(bucket.paths)
+                    total.error_paths.update(bucket.error_paths)
+                    total.latencies.merge(bucket.latencies)
+        return dict(rates=rates, num_requests=total.num_requests, num_bytes=total.num_bytes, statuses=total.statuses,
+                    paths=total.paths, error_paths=total.error_paths, latencies=total.latencies)
+
+
+class Container:
+    """
+    A container, the lines collected from it and what of them is shown.
+
+    To keep log storms (e.g. of a container stuck in a crash loop) from inflating memory and rendering, consecutive
+    lines differing only in their numbers (counters, IDs, timestamps) but not in stream and severity are collapsed into
+    the first of them, which shows the number of occurrences. The archive still gets all of them, they compress well.
+    Optionally, a token bucket limits how many distinct lines are stored per second of log time (which makes backfilled
+    history limited the same way as live lines). Lines over the limit are dropped, and a warning line tells how many.
+    """
+    DEFAULT_MAX_LOG_BYTES = 64 * 1024 ** 2  # Roughly half a million lines of 100 characters
+    LINE_BURST_SECONDS = 2.  # The token bucket holds this many seconds of the line rate, for bursts after quiet times
+    DROP_NOTE_INTERVAL = 1.  # Seconds of log time between warnings about dropped lines while they are being dropped
+    _DIGITS = b'0123456789'
+
+    def __init__(self, cid: str, name: str, max_log_bytes: int = NotImplemented, archive: LogArchive = None,
+                 is_searchable: bool = True, is_classified: bool = True, collapse_repeats: bool = True,
+                 max_line_rate: float = None):
+        """
+        :param cid: Container ID, empty if it is discovered later
+        :param name: Container or service name
+        :param max_log_bytes: Memory cap for the stored log lines
+        :param archive: Archive to append all collected lines to as well
+        :param is_searchable: Whether to keep a search index (searches scan the whole store without it)
+        :param is_classified: Whether to classify the severities of the lines (all have none otherwise)
+        :param collapse_repeats: Whether to collapse consecutive lines that differ only in their numbers
+        :param max_line_rate: Maximum number of distinct lines stored per second, None for no limit
+        """
         self._cid = cid
         self._name = name
         self._is_running = True
-        self._logging_process: subprocess.Popen = NotImplemented  # Process pulling logs
-        self._log_polling_thread: Thread = NotImplemented  # Thread processing log lines
-        self._log_lines: list[LogLine] = []
-        self._log_shown_until = 0  # Index of the last log line shown
+        self._stopped_at: float | None = None  # Time the container was last seen stopping
+        self._ingestor: LogIngestor = NotImplemented  # Ingestor collecting this container's logs
+        self._log_store = LogStore(self.DEFAULT_MAX_LOG_BYTES if max_log_bytes is NotImplemented else max_log_bytes)
+        self._classifier = SeverityClassifier.for_service(name) if is_classified else None
+        self._log_shown_until = 0  # Absolute index of the last log line shown
+        self._seen_severity_counts = [0] * (SEVERITY.STOPPED + 1)  # Lines before that one by severity, see LogStore
+        self._num_lines_skipped = 0  # Unseen lines evicted before they were taken, see take_unseen_log_lines
+        self._is_history_complete = False  # Whether the oldest line of the container's history has been fetched
+        self._search_index = SearchIndex(self._log_store)
+        self._is_searchable = is_searchable
+        self._search_query: str | None = None  # If set, only lines containing it are shown
+        self._min_severity = SEVERITY.NONE  # Only lines at least this urgent are shown
+        self._matches = array('q')  # Indices of the lines shown with the current search and filter, ascending
+        self._matched_start = 0  # The lines from here ...
+        self._matched_end = 0  # ... to here have been matched already
+        self._matches_lock = Lock()
+        self._archive = archive  # If set, all collected lines are archived on disk as well
+        self._collapse_repeats = collapse_repeats
+        self._last_line_key: tuple[bytes, int, int] | None = None  # Text without numbers, stream and severity of ...
+        self._is_last_line_kept = False  # ... the last line that came in, and whether it was stored (as the last one)
+        self._max_line_rate = max_line_rate
+        self._line_tokens = 0. if max_line_rate is None else max_line_rate * self.LINE_BURST_SECONDS
+        self._line_tokens_at: float | None = None  # Log time of the last line the bucket saw
+        self._num_unnoted_drops = 0  # Lines dropped since the last warning about them ...
+        self._last_drop_at: float | None = None  # ... the last of them at this log time
+        self._drops_noted_at = float('-inf')  # Log time of the last warning
+        # - Counters for the performance stats, only ever increased (by the ingestor thread)
+        self._num_lines_ingested = 0
+        self._classification_seconds = 0.
+        self._storage_seconds = 0.  # Time spent storing, indexing and archiving lines
+        self._last_line_at: float | None = None  # Wall clock time the last line came in
+        self._num_lines_collapsed = 0  # Counted as repeats of a stored line instead of being stored
+        self._num_lines_dropped = 0  # Over the line rate limit
+        self._change_listener: Callable[[], None] | None = None  # Called whenever lines come in or the state changes
+        self._resources = ResourceHistory()  # Filled once resources are monitored, see LogIngestor
+        self._access_log_stats: AccessLogStats | None = None  # Fed once analyzed, see analyze_access_log
 
     @property
     def cid(self): return self._cid
     @property
     def name(self): return self._name
+
+    @property
+    def num_unseen_lines(self):
+        return self._log_store.end_index - max(self._log_shown_until, self._log_store.first_index)
+
+    @property
+    def num_unseen_bytes(self): return self._log_store.nbytes_from(self._log_shown_until)
     @property
-    def num_unseen_lines(self): return len(self._log_lines) - self._log_shown_until
+    def num_lines_skipped(self): return self._num_lines_skipped
+
     @property
     def is_running(self): return self._is_running
+    @property
+    def stopped_at(self): return self._stopped_at
+    @property
+    def is_history_complete(self): return self._is_history_complete
+    @property
+    def search_query(self): return self._search_query
+    @property
+    def min_severity(self): return self._min_severity
+    @property
+    def is_filtered(self): return self._search_query is not None or self._min_severity > SEVERITY.NONE
 
     @property
-    def most_urgent_unseen_color(self):
-        color_order = [ANSICODES.RED_FG, ANSICODES.YELLOW_FG, ANSICODES.BLUE_FG, ANSICODES.GREEN_FG,
-                       ANSICODES.GRAY_FG, '']
-        unseen_colors = [ll.color for ll in self._log_lines[self._log_shown_until:]]
-        for color in color_order:
-            if color in unseen_colors:
-                return color
-        return ''  # No unseen lines
-
-    def _poll_logs(self):
-        last_ps_call = dt.datetime.fromtimestamp(0)
-        while isinstance(self._logging_process, subprocess.Popen) and self._logging_process.stdout is not None:
-            for line in self._logging_process.stdout:
-                self._log_lines.append(LogLine(dt.datetime.now(), line.strip()))
-            # - Break if container is not running anymore
-            if (dt.datetime.now() - last_ps_call).total_seconds() > 2:
-                ps_output = subprocess.run(["docker", "ps", "-q", "-f", f"id={self.cid}"],
-                                           capture_output=True, text=True)
-                if ps_output.stdout.strip() == '':
-                    self._is_running = False
-                    self._log_lines.append(StoppedLogLine(dt.datetime.now()))
-                    break
-                else:
-                    last_ps_call = dt.datetime.now()
+    def log_store(self): return self._log_store
+    @property
+    def num_lines_ingested(self): return self._num_lines_ingested
+    @property
+    def classification_seconds(self): return self._classification_seconds
+    @property
+    def storage_seconds(self): return self._storage_seconds
+    @property
+    def last_line_at(self): return self._last_line_at
+    @property
+    def num_lines_collapsed(self): return self._num_lines_collapsed
+    @property
+    def resources(self): return self._resources
+    @property
+    def has_access_log(self): return AccessLogStats.is_nginx_service(self._name)
+    @property
+    def access_log_stats(self): return self._access_log_stats
+    @property
+    def num_lines_dropped(self): return self._num_lines_dropped
+
+    @property
+    def unseen_severity_counts(self):
+        """Numbers of the unseen lines by severity, in O(1)."""
+        return self._log_store.severity_counts_from(self._seen_severity_counts)
+
+    @property
+    def most_urgent_unseen_severity(self):
+        counts = self.unseen_severity_counts
+        return next((severity for severity in range(SEVERITY.STOPPED, SEVERITY.NONE, -1) if counts[severity] > 0),
+                    SEVERITY.NONE)
+
+    @property
+    def most_urgent_unseen_color(self): return SEVERITY.COLORS[self.most_urgent_unseen_severity]
+
+    def set_change_listener(self, listener: Callable[[], None] | None):
+        """Have the given function called (from whichever thread made the change) when lines or the state change."""
+        self._change_listener = listener
+
+    def _notify_change(self):
+        if self._change_listener is not None:
+            self._change_listener()
+
+    def _classify(self, lines: list[bytes]):
+        return [SEVERITY.NONE] * len(lines) if self._classifier is None else self._classifier.classify_batch(lines)
+
+    def _find_repeats(self, lines: list[bytes], severities: list[int], streams: list[int],
+                      last_key: tuple[bytes, int, int] | None):
+        """
+        Ascending positions of the lines repeating the line before them (the first one: the line of the given key), and
+        the key of the last line. Lines repeat each other if only their digits differ, but not their stream or severity.
+        """
+        # - Without their digits, all lines in one go, and compared to their predecessors in C (repeats are rare mostly)
+        texts = b'\n'.join(lines).translate(None, self._DIGITS).split(b'\n')
+        if len(texts) != len(lines):  # A line containing a line break, not from the parser
+            texts = [line.translate(None, self._DIGITS) for line in lines]
+        repeated = [i for i in compress(range(1, len(texts)), map(eq, islice(texts, 1, None), texts))
+                    if streams[i] == streams[i - 1] and severities[i] == severities[i - 1]]
+        if (texts[0], streams[0], severities[0]) == last_key:
+            repeated.insert(0, 0)
+        return repeated, (texts[-1], streams[-1], severities[-1])
+
+    @staticmethod
+    def _collapsed(num_lines: int, repeated: list[int]):
+        """Positions of the lines that aren't repeats, their numbers of repeats by their position among them (only if
+        repeated), and the number of repeats of the line before the first one."""
+        repeats, num_last_repeats = {}, 0
+        for num_repeats_before, i in enumerate(repeated):
+            position = i - num_repeats_before - 1  # Of the repeated line among the ones that aren't repeats
+            if position < 0:
+                num_last_repeats += 1
+            else:
+                repeats[position] = repeats.get(position, 0) + 1
+        is_repeated = set(repeated)
+        return [i for i in range(num_lines) if i not in is_repeated], repeats, num_last_repeats
+
+    def _collapse(self, timestamps: list[float], severities: list[int], lines: list[bytes], streams: list[int]):
+        """The given columns with repeats collapsed (only within them), and the numbers of repeats by position."""
+        if not self._collapse_repeats or len(lines) == 0:
+            return (timestamps, severities, lines, streams), None
+        repeated, _ = self._find_repeats(lines, severities, streams, None)
+        if len(repeated) == 0:
+            return (timestamps, severities, lines, streams), None
+        self._num_lines_collapsed += len(repeated)
+        kept, repeats, _ = self._collapsed(len(lines), repeated)
+        return tuple([column[i] for i in kept] for column in (timestamps, severities, lines, streams)), repeats
+
+    def _is_within_rate(self, timestamp: float):
+        # - Token bucket refilled by the time between the lines, according to their timestamps
+        if self._line_tokens_at is not None and timestamp > self._line_tokens_at:
+            self._line_tokens = min(self._line_tokens + (timestamp - self._line_tokens_at) * self._max_line_rate,
+                                    self._max_line_rate * self.LINE_BURST_SECONDS)
+        self._line_tokens_at = timestamp if self._line_tokens_at is None else max(self._line_tokens_at, timestamp)
+        if self._line_tokens >= 1:
+            self._line_tokens -= 1
+            return True
+        return False
+
+    def _collapse_and_limit(self, timestamps: list[float], severities: list[int], lines: list[bytes],
+                            streams: list[int]):
+        """
+        Positions of the lines to store, the numbers of repeats of the repeated ones among them (by their position
+        among the ones to store), the number of repeats of the last stored line, and the positions of the lines to
+        archive (all but the dropped ones).
+        """
+        repeated = []
+        if self._collapse_repeats:
+            repeated, self._last_line_key = self._find_repeats(lines, severities, streams, self._last_line_key)
+            self._num_lines_collapsed += len(repeated)
+        if self._max_line_rate is None:  # Nothing is dropped
+            kept, repeats, num_last_repeats = self._collapsed(len(lines), repeated)
+            return kept, repeats, num_last_repeats, range(len(lines))
+        # - Lines that aren't repeats take a token, repeats follow the line they repeat (dropped with it, if it is)
+        is_repeated, is_last_kept = set(repeated), self._is_last_line_kept
+        archived, dropped = [], []
+        for i, timestamp in enumerate(timestamps):
+            if i not in is_repeated:
+                is_last_kept = self._is_within_rate(timestamp)
+            (archived if is_last_kept else dropped).append(i)
+        self._is_last_line_kept = is_last_kept
+        if len(dropped) > 0:
+            self._num_lines_collapsed -= len(is_repeated.intersection(dropped))
+            self._num_lines_dropped += len(dropped)
+            self._num_unnoted_drops += len(dropped)
+            self._last_drop_at = timestamps[dropped[-1]]
+            # - Renumbered among the archived lines, the repeats among them repeat the same lines as before
+            repeated = [position for position, i in enumerate(archived) if i in is_repeated]
+        kept, repeats, num_last_repeats = self._collapsed(len(archived), repeated)
+        return [archived[position] for position in kept], repeats, num_last_repeats, archived
+
+    def _add_drop_note(self, columns: tuple[list, ...], archived_columns: tuple[list, ...], repeats: dict[int, int],
+                       at_front: bool):
+        """The columns to store and to archive, and the repeats, with a warning about the lines dropped meanwhile."""
+        note = f'[{self._num_unnoted_drops} lines dropped, over the limit of {self._max_line_rate:g} lines/s]'
+        timestamp = (self._last_drop_at if at_front or len(columns[0]) == 0
+                     else max(self._last_drop_at, columns[0][-1]))  # Keeps the lines in time order
+        note_columns = ([timestamp], [SEVERITY.WARN], [note.encode('utf-8')], [STREAM.UNKNOWN])
+        self._num_unnoted_drops, self._drops_noted_at = 0, self._last_drop_at
+        if at_front:
+            return (tuple(note_column + column for note_column, column in zip(note_columns, columns)),
+                    tuple(note_column + column for note_column, column in zip(note_columns, archived_columns)),
+                    {position + 1: num_repeats for position, num_repeats in repeats.items()})
+        self._last_line_key = None  # The note is the last stored line now
+        return (tuple(column + note_column for note_column, column in zip(note_columns, columns)),
+                tuple(column + note_column for note_column, column in zip(note_columns, archived_columns)), repeats)
+
+    def add_log_lines(self, timestamps: list[float], lines: list[bytes], streams: list[int]):
+        start = perf_counter()
+        lines = [line.strip() for line in lines]
+        severities = self._classify(lines)
+        if self._access_log_stats is not None:  # All requests, before repeats are collapsed or lines dropped
+            self._access_log_stats.add_lines(timestamps, lines)
+        classified = perf_counter()
+        columns = archived_columns = (timestamps, severities, lines, streams)
+        num_last_repeats, repeats = 0, None
+        if self._collapse_repeats or self._max_line_rate is not None:
+            num_unnoted_drops = self._num_unnoted_drops
+            kept, repeats, num_last_repeats, archived = self._collapse_and_limit(*columns)
+            if len(archived) < len(lines):
+                archived_columns = tuple([column[i] for i in archived] for column in columns)
+            if len(kept) < len(lines):
+                columns = tuple([column[i] for i in kept] for column in columns)
+            # - Warn about dropped lines once no more are dropped (before the new lines), and every DROP_NOTE_INTERVAL
+            #   while they are (after them)
+            if 0 < num_unnoted_drops == self._num_unnoted_drops:
+                if len(columns[0]) == 0:
+                    self._last_line_key = None
+                columns, archived_columns, repeats = self._add_drop_note(columns, archived_columns, repeats, True)
+            elif (self._num_unnoted_drops > 0
+                  and self._last_drop_at - self._drops_noted_at >= self.DROP_NOTE_INTERVAL):
+                columns, archived_columns, repeats = self._add_drop_note(columns, archived_columns, repeats, False)
+        if num_last_repeats > 0:
+            self._log_store.repeat_last(num_last_repeats)
+        if len(columns[0]) > 0:
+            self._log_store.extend(*columns, repeats)
+        if self._is_searchable:
+            self._search_index.update()
+        if self._archive is not None and len(archived_columns[0]) > 0:
+            self._archive.append(*archived_columns)
+        self._classification_seconds += classified - start
+        self._storage_seconds += perf_counter() - classified
+        self._num_lines_ingested += len(lines)
+        self._last_line_at = time()
+        self._notify_change()
+
+    def load_archived_log_lines(self, since: float = float('-inf'), until: float = float('inf')):
+        """Fill the store with the archived lines of a time range (the newest ones, if they exceed the memory cap)."""
+        for timestamps, severities, lines, streams in self._archive.read(since, until):
+            columns, repeats = self._collapse(timestamps, severities, lines, streams)  # Archived uncollapsed
+            self._log_store.extend(*columns, repeats)
+        if self._is_searchable:
+            self._search_index.update()
+        self._is_history_complete = True
+        self._notify_change()
+
+    def analyze_access_log(self):
+        """
+        Start aggregating the requests in the nginx access log (if this is an nginx service), with the stored lines and
+        from then on all new ones. Must run in the thread adding lines (if they are added), so no batch is missed.
+        """
+        if self._access_log_stats is not None or not self.has_access_log:
+            return
+        access_log_stats, store = AccessLogStats(), self._log_store
+        if len(store) > 0:
+            # - Only the lines in the window before the newest one (going back in steps), older ones wouldn't count
+            start, end = store.end_index, store.end_index
+            window_start = store.timestamp(end - 1) - AccessLogStats.BUCKET_SECONDS * AccessLogStats.NUM_BUCKETS
+            while start > store.first_index and store.timestamp(start - 1) > window_start:
+                start = max(start - 10_000, store.first_index)
+            timestamps, _, lines, _ = store.columns(start, end)
+            access_log_stats.add_lines(timestamps, lines, [store.num_repeats(index) + 1 for index in range(start, end)])
+        self._access_log_stats = access_log_stats
+
+    def close_archive(self):
+        if self._archive is not None:
+            self._archive.close()
+
+    def prepend_log_lines(self, timestamps: list[float], lines: list[bytes], streams: list[int]):
+        if self._log_store.has_evicted:
+            return  # Lines got dropped meanwhile, the older ones wouldn't connect to the stored ones anymore
+        lines = [line.strip() for line in lines]
+        columns, repeats = self._collapse(timestamps, self._classify(lines), lines, streams)
+        self._log_store.prepend(*columns, repeats)
+        if self._is_searchable:
+            self._search_index.update()
+        self._notify_change()
+
+    def mark_history_complete(self):
+        self._is_history_complete = True
+
+    def request_older_logs(self):
+        """Page in older history in the background, unless it is complete or older lines are dropped anyway."""
+        if (isinstance(self._ingestor, LogIngestor) and not self._is_history_complete
+                and not self._log_store.has_evicted and len(self._log_store) > 0):
+            self._ingestor.emit_older_logs_requested(self)
+
+    def search(self, query: str, limit: int = None):
+        """Indices of the stored lines containing the query (ignoring ASCII case, the newest `limit` ones) in order."""
+        return self._search_index.search(query, self._log_store.first_index, self._log_store.end_index, limit)
+
+    def set_search_query(self, query: str | None):
+        with self._matches_lock:
+            self._search_query = query if query else None
+            self._reset_matches()
+
+    def set_min_severity(self, min_severity: int):
+        with self._matches_lock:
+            self._min_severity = min_severity
+            self._reset_matches()
+
+    def _reset_matches(self):
+        self._matches = array('q')
+        self._matched_start = self._matched_end = self._log_store.first_index
+
+    def _match(self, start: int, end: int):
+        if self._search_query is None:
+            return self._log_store.find_severities(self._min_severity, start, end)
+        matches = self._search_index.search(self._search_query, start, end)
+        if self._min_severity > SEVERITY.NONE:
+            urgent = set(self._log_store.find_severities(self._min_severity, start, end))
+            matches = [index for index in matches if index in urgent]
+        return matches
+
+    def _update_matches(self):
+        # - Match only the lines added at either end since the last update
+        with self._matches_lock:
+            first, end = self._log_store.first_index, self._log_store.end_index
+            if first < self._matched_start:  # Older history paged in
+                self._matches[:0] = array('q', self._match(first, self._matched_start))
+                self._matched_start = first
+            if end > self._matched_end:
+                self._matches.extend(self._match(self._matched_end, end))
+                self._matched_end = end
+            if first > self._matched_start:  # Oldest lines evicted
+                del self._matches[:bisect_left(self._matches, first)]
+                self._matched_start = first
+            return self._matches
+
+    def update_state(self, cid: str, is_running: bool):
+        self._cid = cid
+        self._is_running = is_running
+        self._notify_change()
+
+    def mark_started(self, cid: str):
+        self._cid = cid
+        self._is_running = True
+        self._notify_change()
+
+    def add_resource_sample(self, cpu_percent: float, memory_bytes: float, network_bytes: float,
+                            block_io_bytes: float):
+        """Add a resource sample (see ResourceHistory.add), so the resource panel is drawn again."""
+        self._resources.add(cpu_percent, memory_bytes, network_bytes, block_io_bytes)
+        self._notify_change()
+
+    def mark_stopped(self, timestamp: float):
+        self._is_running = False
+        self._stopped_at = timestamp
+        self._last_line_key = None  # Lines after a restart are never collapsed into the ones before
+        self._log_store.extend([timestamp], [SEVERITY.STOPPED], [b'stopped'], [STREAM.UNKNOWN])
+        if self._archive is not None:
+            self._archive.append([timestamp], [SEVERITY.STOPPED], [b'stopped'], [STREAM.UNKNOWN])
+        self._notify_change()
+
+    def take_unseen_log_lines(self, max_lines: int):
+        """
+        Timestamps, severities, encoded texts and streams of the oldest unseen lines, which count as seen then. Unseen
+        lines evicted before being taken are counted in num_lines_skipped.
+        """
+        start = max(self._log_shown_until, self._log_store.first_index)
+        self._num_lines_skipped += max(start - self._log_shown_until, 0)
+        end = min(start + max_lines, self._log_store.end_index)
+        self.mark_seen(end)
+        return self._log_store.columns(start, end)
+
+    def mark_seen(self, end: int):
+        """Count the lines before the given index as seen, e.g. when shown among the lines of other containers."""
+        if end > self._log_shown_until:
+            # - Only the newly seen lines are counted, each line once
+            self._seen_severity_counts = self._log_store.severity_counts_until(end, self._seen_severity_counts,
+                                                                               self._log_shown_until)
+            self._log_shown_until = end
 
     def get_log_tail(self, n: int) -> list[LogLine]:
-        start = max(0, len(self._log_lines) - n)
-        for i, (line, color) in enumerate(zip(self._log_lines[start:], self._log_lines[start:])):
-            yield line
-            self._log_shown_until = start + i + 1
-
-    def get_log_tail_for_terminal_height(self, num_ui_lines: int = 10) -> list[LogLine]:
-        terminal_height = os.get_terminal_size().lines
-        height_available = terminal_height - num_ui_lines
-        n = 0
-        total_wraps = 0
-        for line in reversed(self._log_lines):
-            line_wraps = line.num_wraps
-            if total_wraps + line_wraps > height_available - 10:
+        end = self._log_store.end_index
+        self.mark_seen(end)
+        return self._log_store.lines(end - n, end)
+
+    def get_log_window(self, num_rows: int, until_index: int = None) -> list[LogLine]:
+        """
+        Get the lines that fit into the given number of terminal rows, found in O(log n) through the wrap index.
+
+        :param num_rows: Number of terminal rows available
+        :param until_index: Index of the last line to show, None for the newest one
+        """
+        width = _get_terminal_size().columns
+        end = self._log_store.end_index if until_index is None else min(until_index + 1, self._log_store.end_index)
+        self.mark_seen(end)
+        if self.is_filtered:
+            return self._get_filtered_log_window(num_rows, end, width)
+        start = self._log_store.window_start(end, num_rows, width)
+        if start <= self._log_store.first_index:
+            self.request_older_logs()  # Shown once they arrived, scrolling further up is possible then
+        return self._log_store.lines(start, end)
+
+    def _get_filtered_log_window(self, num_rows: int, end: int, width: int):
+        matches = self._update_matches()
+        end_position = bisect_left(matches, end)
+        start_position = end_position
+        while start_position > 0 and matches[start_position - 1] >= self._log_store.first_index:
+            line_rows = (self._log_store.length(matches[start_position - 1]) + width - 1) // width or 1
+            if line_rows > num_rows:
                 break
-            total_wraps += line_wraps
-            n += 1
-        return self.get_log_tail(n)
+            num_rows -= line_rows
+            start_position -= 1
+        if start_position == 0:
+            self.request_older_logs()
+        return [self._log_store.line(index) for index in matches[start_position:end_position]]
+
+    def scroll_log_window(self, until_index: int | None, num_rows: int):
+        """
+        Move a log window by some terminal rows (negative: up).
 
-    def start_collecting_logs(self):
-        if isinstance(self._logging_process, subprocess.Popen):
+        :param until_index: Index of the window's last line, None for the newest one
+        :param num_rows: Number of rows to move
+        :return: Index of the last line of the moved window, None if it reached the newest line
+        """
+        if self.is_filtered:  # Moves by lines instead of rows, close enough for the few lines shown
+            matches = self._update_matches()
+            position = len(matches) - 1 if until_index is None else bisect_right(matches, until_index) - 1
+            position = min(max(position + num_rows, 0), len(matches) - 1)
+            return None if position >= len(matches) - 1 else matches[position]
+        store, width = self._log_store, _get_terminal_size().columns
+        end = store.end_index if until_index is None else until_index + 1
+        new_until_index = store.index_at_row(store.end_row(end - 1, width) + num_rows - 1, width)
+        return None if new_until_index >= store.end_index - 1 else new_until_index
+
+    def log_window_at_top(self, num_rows: int):
+        """Index of the last line of a log window of the given number of rows that starts with the oldest line."""
+        if self.is_filtered:
+            matches = self._update_matches()
+            position = min(num_rows, len(matches)) - 1
+            return None if position >= len(matches) - 1 else matches[position]
+        width = _get_terminal_size().columns
+        new_until_index = self._log_store.index_at_row(self._log_store.first_row(width) + num_rows - 1, width)
+        # - The line crossing the window's bottom edge doesn't fit completely
+        if self._log_store.end_row(new_until_index, width) > self._log_store.first_row(width) + num_rows:
+            new_until_index = max(new_until_index - 1, self._log_store.first_index)
+        return None if new_until_index >= self._log_store.end_index - 1 else new_until_index
+
+    def start_collecting_logs(self, ingestor: LogIngestor):
+        if isinstance(self._ingestor, LogIngestor):
             raise RuntimeError("Logging already started.")
-        self._logging_process = subprocess.Popen(["docker", "compose", "-f", str(YML), "logs", "-f",
-                                                  self.name, "--no-log-prefix"],
-                                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        self._log_polling_thread = Thread(target=self._poll_logs, daemon=True)
-        self._log_polling_thread.start()
+        self._ingestor = ingestor
+        self._ingestor.emit_container_started(self)
 
     def stop_collecting_logs(self):
-        if isinstance(self._logging_process, subprocess.Popen):
-            self._logging_process.terminate()
-            self._logging_process = NotImplemented
-        if isinstance(self._log_polling_thread, Thread):
-            self._log_polling_thread.join(timeout=1.0)
-            self._log_polling_thread = NotImplemented
+        if isinstance(self._ingestor, LogIngestor):
+            self._ingestor.emit_container_stopped(self)
+            self._ingestor = NotImplemented
+
+
+class MergedLog:
+    """
+    Time-ordered view on the lines of several containers, shown in the "All containers" tab.
+
+    The timestamp, severity, container and index of every merged line are kept in flat arrays, in time order. Each
+    update only merges in the lines added to the stores since the last one: the new runs of all containers (each in
+    time order already) are k-way merged with heapq.merge and spliced in after the last merged line that isn't newer,
+    which is the very end unless a container lagged behind (then only the few lines after that point are merged again).
+    History paged in before the first lines is merged in at the front the same way. Lines evicted from their store are
+    skipped, and dropped from the front once they make up an eighth of the arrays. A window is found by walking back
+    from its last line, with the severities scanned in chunks, so neither updates nor frames take longer the more lines
+    are stored.
+    """
+    SCAN_CHUNK = 4096  # Severities scanned at once when looking for the lines to show
+
+    def __init__(self, containers: list[Container], prefix_width: int = 0):
+        """
+        :param containers: Containers whose lines are merged
+        :param prefix_width: Number of characters shown before each line (like the container name), for wrapping
+        """
+        self._containers = containers
+        self._prefix_width = prefix_width
+        self._timestamps = array('d')
+        self._severities = array('B')
+        self._sources = array('H')  # Position of each line's container in the list
+        self._indices = array('q')  # Index of each line in its container's store
+        self._merged_starts = [0] * len(containers)  # The lines of each store from here ...
+        self._merged_ends = [0] * len(containers)  # ... to here have been merged
+        self._lock = Lock()
+
+    def __len__(self): return len(self._timestamps)
+
+    @property
+    def _min_severity(self):
+        return min(container.min_severity for container in self._containers)  # The same for all, see Browser
+
+    def _run(self, source: int, start: int, end: int):
+        # - The given lines of one container as (timestamp, container, index, severity), in time order
+        start, timestamps, severities = self._containers[source].log_store.timestamps_and_severities(start, end)
+        return list(zip(timestamps, repeat(source), range(start, start + len(timestamps)), severities))
+
+    def _update(self):
+        # - Merge in the lines added to the stores since the last update (lock must be held)
+        older_runs, newer_runs = [], []
+        for source, container in enumerate(self._containers):
+            store = container.log_store
+            first, end = store.first_index, store.end_index
+            if first < self._merged_starts[source]:  # Older history paged in
+                older_runs.append(self._run(source, first, self._merged_starts[source]))
+                self._merged_starts[source] = first
+            if end > self._merged_ends[source]:
+                run = self._run(source, max(self._merged_ends[source], first), end)
+                if len(run) > 0:
+                    newer_runs.append(run)
+                    self._merged_ends[source] = run[-1][2] + 1
+        if any(older_runs):
+            self._merge_in([run for run in older_runs if len(run) > 0], at_front=True)
+        if len(newer_runs) > 0:
+            self._merge_in(newer_runs, at_front=False)
+        self._drop_evicted()
+
+    def _merge_in(self, runs: list[list[tuple]], at_front: bool):
+        # - k-way merge of the runs, then with the merged lines they overlap in time (lock must be held)
+        merged = runs[0] if len(runs) == 1 else list(heapq.merge(*runs))
+        if at_front:
+            start, end = 0, bisect_right(self._timestamps, merged[-1][0])
+        else:
+            start, end = bisect_right(self._timestamps, merged[0][0]), len(self._timestamps)
+        if end - start > 8 * len(merged):  # Far out of order, inserting each line moves less than merging all again
+            position = start
+            for timestamp, source, index, severity in merged:
+                position = bisect_right(self._timestamps, timestamp, lo=position)
+                self._timestamps.insert(position, timestamp)
+                self._sources.insert(position, source)
+                self._indices.insert(position, index)
+                self._severities.insert(position, severity)
+                position += 1
+            return
+        if start < end:
+            merged = list(heapq.merge(merged, zip(self._timestamps[start:end], self._sources[start:end],
+                                                  self._indices[start:end], self._severities[start:end])))
+        timestamps, sources, indices, severities = zip(*merged)
+        self._timestamps[start:end] = array('d', timestamps)
+        self._sources[start:end] = array('H', sources)
+        self._indices[start:end] = array('q', indices)
+        self._severities[start:end] = array('B', severities)
+
+    def _drop_evicted(self):
+        # - The lines older than the first stored line of every container were all evicted (lock must be held)
+        first_timestamps = []
+        for container in self._containers:
+            _, timestamps, _ = container.log_store.timestamps_and_severities(container.log_store.first_index,
+                                                                             container.log_store.first_index + 1)
+            first_timestamps.extend(timestamps)
+        if len(first_timestamps) == 0:
+            return
+        end = bisect_left(self._timestamps, min(first_timestamps))
+        if end > len(self._timestamps) // 8:  # Amortized over many evictions
+            del self._timestamps[:end]
+            del self._sources[:end]
+            del self._indices[:end]
+            del self._severities[:end]
+
+    def _is_stored(self, position: int):
+        return self._indices[position] >= self._containers[self._sources[position]].log_store.first_index
+
+    def _shown_before(self, end: int, min_severity: int):
+        # - Positions of the lines to show before the given position, newest first (lock must be held)
+        mask = LogStore._SEVERITY_MASKS[min_severity]
+        while end > 0:
+            start = max(end - self.SCAN_CHUNK, 0)
+            flags, hit = self._severities[start:end].tobytes().translate(mask), end - start
+            while (hit := flags.rfind(1, 0, hit)) >= 0:
+                if self._is_stored(start + hit):
+                    yield start + hit
+            end = start
+
+    def _shown_from(self, start: int, min_severity: int):
+        # - Positions of the lines to show from the given position on, oldest first (lock must be held)
+        mask = LogStore._SEVERITY_MASKS[min_severity]
+        while start < len(self._timestamps):
+            end = min(start + self.SCAN_CHUNK, len(self._timestamps))
+            flags, hit = self._severities[start:end].tobytes().translate(mask), 0
+            while (hit := flags.find(1, hit)) >= 0:
+                if self._is_stored(start + hit):
+                    yield start + hit
+                hit += 1
+            start = end
+
+    def _num_rows(self, position: int, width: int):
+        length = self._containers[self._sources[position]].log_store.length(self._indices[position])
+        return (self._prefix_width + length + width - 1) // width or 1
+
+    def _end_position(self, until: float | None):
+        return len(self._timestamps) if until is None else bisect_right(self._timestamps, until)
+
+    def _request_older_logs(self):
+        for container in self._containers:
+            container.request_older_logs()  # Merged in once they arrived
+
+    def get_log_window(self, num_rows: int, until: float = None) -> list[tuple[int, LogLine]]:
+        """
+        Get the lines of all containers that fit into the given number of terminal rows, in time order.
+
+        :param num_rows: Number of terminal rows available
+        :param until: Timestamp of the last line to show, None for the newest one
+        :return: Position of each line's container and the line
+        """
+        width = _get_terminal_size().columns
+        with self._lock:
+            self._update()
+            positions = []
+            for position in self._shown_before(self._end_position(until), self._min_severity):
+                line_rows = self._num_rows(position, width)
+                if line_rows > num_rows:
+                    break
+                num_rows -= line_rows
+                positions.append(position)
+            else:
+                self._request_older_logs()
+            if until is None:
+                for container, end in zip(self._containers, self._merged_ends):
+                    container.mark_seen(end)
+            else:
+                for position in positions:
+                    self._containers[self._sources[position]].mark_seen(self._indices[position] + 1)
+            return [(self._sources[position], self._containers[self._sources[position]].log_store.line(
+                self._indices[position])) for position in reversed(positions)]
+
+    def scroll_log_window(self, until: float | None, num_rows: int):
+        """
+        Move a log window by some terminal rows (negative: up).
+
+        :param until: Timestamp of the window's last line, None for the newest one
+        :param num_rows: Number of rows to move
+        :return: Timestamp of the last line of the moved window, None if it reached the newest line
+        """
+        width = _get_terminal_size().columns
+        with self._lock:
+            self._update()
+            end, min_severity = self._end_position(until), self._min_severity
+            if num_rows < 0:  # The line above the rows scrolled past becomes the last one
+                position = None
+                for position in self._shown_before(end, min_severity):
+                    if num_rows >= 0:
+                        break
+                    num_rows += self._num_rows(position, width)
+                return until if position is None else self._timestamps[position]
+            positions = self._shown_from(end, min_severity)
+            for position in positions:
+                num_rows -= self._num_rows(position, width)
+                if num_rows <= 0:
+                    return None if next(positions, None) is None else self._timestamps[position]
+            return None
+
+    def log_window_at_top(self, num_rows: int):
+        """Timestamp of the last line of a log window of the given number of rows that starts with the oldest line."""
+        width = _get_terminal_size().columns
+        with self._lock:
+            self._update()
+            self._request_older_logs()
+            last_position = None
+            for position in self._shown_from(0, self._min_severity):
+                num_rows -= self._num_rows(position, width)
+                if num_rows < 0:
+                    return None if last_position is None else self._timestamps[last_position]
+                last_position = position
+            return None
+
+
+class ScreenRenderer:
+    """
+    Differential terminal renderer that keeps the last frame and only sends what changed.
+
+    A frame is a list of rows that each fit into one terminal row. Changed rows are sent as a cursor move plus the row,
+    everything in one buffered write. If the log region of a frame is the previous one moved up by some rows (i.e. new
+    log lines came in), the region is scrolled by the terminal itself, so only the new rows need to be sent.
+    """
+    MAX_SCROLL_ROWS = 64  # Larger shifts are cheaper to redraw than to detect
+    _ESCAPE_CODE = re.compile('\033\\[[0-9;]*[A-Za-z]')
+
+    def __init__(self, full_redraw: bool = False):
+        """
+        :param full_redraw: Clear and redraw the whole screen every frame (for comparison only)
+        """
+        self._full_redraw = full_redraw
+        self._rows: list[str] = []  # Rows of the last frame, as they are on screen
+        self._is_invalidated = True
+        self._lock = Lock()
+        self.last_frame_bytes = 0  # Number of bytes sent for the last frame
+        self.last_frame_seconds = 0.  # Time it took to compose and send the last frame
+        self.total_frame_bytes = 0
+        self.num_frames = 0
+
+    def invalidate(self):
+        """Make the next frame a full redraw, e.g. after something else has written to the terminal."""
+        self._is_invalidated = True
+
+    def _find_scroll(self, rows: list[str], log_region_start: int):
+        # - Find the number of rows k by which the log region moved up, anchored on the second row of the region
+        old, new = self._rows[log_region_start:], rows[log_region_start:]
+        if len(old) < 3 or len(new) < 3:
+            return 0
+        num_unshifted_equal = sum(o == n for o, n in zip(old, new))
+        for k in range(1, min(len(old) - 2, self.MAX_SCROLL_ROWS) + 1):
+            if old[k + 1] == new[1]:
+                num_shifted_equal = sum(o == n for o, n in zip(old[k:], new))
+                if num_shifted_equal > num_unshifted_equal + 1:  # Scrolling costs about one row of escape codes
+                    return k
+        return 0
+
+    def render(self, rows: list[str], log_region_start: int):
+        """
+        Send a frame to the terminal.
+
+        :param rows: All rows of the frame, each fitting into one terminal row
+        :param log_region_start: Index of the first row that belongs to the (scrollable) log region
+        """
+        with self._lock:
+            start_time = perf_counter()
+            if self._full_redraw:
+                parts = [ANSICODES.CLEAR_SCREEN, '\r\n'.join(rows)]
+            elif self._is_invalidated:
+                parts = [ANSICODES.CLEAR_SCREEN]
+                parts.extend(f'\033[{i + 1};1H{row}' for i, row in enumerate(rows))
+            else:
+                parts = []
+                k = self._find_scroll(rows, log_region_start)
+                if k > 0:
+                    # - Scroll the old log region up by k rows and update the model of what is on screen
+                    top, bottom = log_region_start + 1, len(self._rows)
+                    parts.append(f'\033[{top};{bottom}r\033[{k}S\033[r')
+                    self._rows[log_region_start:] = self._rows[log_region_start + k:] + [''] * k
+                terminal_width = _get_terminal_size().columns
+                for i, row in enumerate(rows):
+                    if i >= len(self._rows) or self._rows[i] != row:
+                        parts.append(f'\033[{i + 1};1H{row}')
+                        # - Clear the rest of the row, but not after a full one: with the cursor waiting to wrap, many
+                        #   terminals would erase its last character
+                        if len(row) < terminal_width or len(self._ESCAPE_CODE.sub('', row)) < terminal_width:
+                            parts.append('\033[K')
+                if len(rows) < len(self._rows):
+                    parts.append(f'\033[{len(rows) + 1};1H\033[J')  # Clear everything below the frame
+            data = ''.join(parts).encode('utf-8')
+            sys.stdout.flush()
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            self._rows = rows
+            self._is_invalidated = False
+            self.last_frame_bytes = len(data)
+            self.total_frame_bytes += len(data)
+            self.num_frames += 1
+            self.last_frame_seconds = perf_counter() - start_time
+
+
+class LogWriter:
+    """
+    Headless front-end that streams the lines of containers to a binary output, as plain text or JSON lines.
+
+    It uses the same ingestion as the Browser. In every round, the unseen lines of all containers are taken from their
+    stores column-wise, merged by timestamp, formatted in one go and written at once. Writing blocks while the consumer
+    is slow, and the ingestor stops reading a container's logs while the lines waiting for being written take more
+    than MAX_UNSEEN_SHARE of its memory cap, so eviction (which frees the oldest lines) doesn't reach them and memory
+    stays bounded (by the memory caps of the stores, as in the Browser). Should a single huge batch still push unwritten
+    lines out, their number is reported on stderr. Lines are merged by time within each round, so a container lagging
+    behind can't hold back the others.
+    """
+    FORMATS = ('text', 'json')
+    MAX_UNSEEN_SHARE = .5  # Of each container's memory cap
+    MAX_BATCH_LINES = 10_000  # Taken per container and round
+    IDLE_INTERVAL = .05  # Seconds to wait for new lines after all were written
+    _NEEDS_ESCAPING = re.compile(rb'[\x00-\x1f"\\\x80-\xff]')  # Bytes that can't go into a JSON string as they are
+    _NEEDS_DECODING = re.compile(rb'[\x00-\x1f\x80-\xff]')  # ... of which these need decoding, not just a backslash
+
+    def __init__(self, containers: list[Container], output_format: str = 'text', follow: bool = True,
+                 num_backfill_lines: int = NotImplemented, output=NotImplemented):
+        """
+        :param containers: Containers to stream the lines of
+        :param output_format: 'text' for lines like 'docker compose logs --timestamps' prints them, or 'json' for one
+                              object per line with container name, timestamp, stream, severity and line
+        :param follow: Keep streaming new lines, otherwise stop once the existing ones are written
+        :param num_backfill_lines: Number of history lines written per container first, negative for all of them
+        :param output: Binary file to write to, defaults to stdout
+        """
+        assert output_format in self.FORMATS, f"Output format must be one of {self.FORMATS}."
+        self._containers = containers
+        self._output_format = output_format
+        self._output = sys.stdout.buffer if output is NotImplemented else output
+        self._ingestor = LogIngestor(num_backfill_lines=num_backfill_lines, follow=follow,
+                                     max_unseen_share=self.MAX_UNSEEN_SHARE)
+        self._seconds: dict[int, bytes] = {}  # Formatted date and time by whole second (UTC), as in the parser
+        name_width = max(len(container.name) for container in containers)
+        if output_format == 'json':
+            self._prefixes = [b'{"container":' + json.dumps(container.name).encode('utf-8') + b',"time":"'
+                              for container in containers]
+            # - Everything between time and line, by stream and severity
+            self._infixes = [[f'","stream":"{stream}","severity":"{severity}","line":'.encode('utf-8')
+                              for severity in SEVERITY.NAMES] for stream in STREAM.NAMES]
+        else:
+            self._prefixes = [f'{container.name.ljust(name_width)} | '.encode('utf-8') for container in containers]
+
+    def _format_second(self, timestamp: float):
+        # - Date and time up to the fraction of a second, formatted once per second (lines are about in time order)
+        seconds = int(timestamp)
+        if len(self._seconds) >= LogStreamParser.MAX_CACHED_SECONDS:
+            self._seconds.clear()
+        date_and_time = dt.datetime.fromtimestamp(seconds, dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.')
+        self._seconds[seconds] = date_and_time = date_and_time.encode('ascii')
+        return date_and_time
+
+    def _escaped_lines(self, lines: list[bytes]):
+        """Positions and JSON strings of the lines that can't be quoted as they are, with one scan of all of them."""
+        text = b' '.join(lines)
+        line_starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
+        escaped, search, position = [], self._NEEDS_ESCAPING.search, 0
+        while match := search(text, position):
+            i = bisect_right(line_starts, match.start()) - 1
+            line = lines[i]
+            if self._NEEDS_DECODING.search(line) is None:  # Just quotes and backslashes, most of the time
+                escaped.append((i, b'"%b"' % line.replace(b'\\', b'\\\\').replace(b'"', b'\\"')))
+            else:
+                escaped.append((i, json.dumps(line.decode('utf-8', errors='replace'), ensure_ascii=False)
+                                .encode('utf-8')))
+            position = line_starts[i + 1]
+        return escaped
+
+    def _format_lines(self, container_id: int, timestamps: list[float], severities: list[int], lines: list[bytes],
+                      streams: list[int]):
+        prefix, seconds, format_second = self._prefixes[container_id], self._seconds, self._format_second
+        if self._output_format == 'text':
+            return [b'%b%b%06dZ %b\n' % (prefix, seconds.get(int(timestamp)) or format_second(timestamp),
+                                         timestamp % 1 * 1e6, line)
+                    for timestamp, line in zip(timestamps, lines)]
+        infixes = self._infixes
+        formatted = [b'%b%b%06dZ%b"%b"}\n' % (prefix, seconds.get(int(timestamp)) or format_second(timestamp),
+                                              timestamp % 1 * 1e6, infixes[stream][severity], line)
+                     for timestamp, severity, line, stream in zip(timestamps, severities, lines, streams)]
+        for i, string in self._escaped_lines(lines):
+            timestamp = timestamps[i]
+            formatted[i] = b'%b%b%06dZ%b%b}\n' % (prefix, seconds.get(int(timestamp)) or format_second(timestamp),
+                                                  timestamp % 1 * 1e6, infixes[streams[i]][severities[i]], string)
+        return formatted
+
+    def _write_unseen_lines(self):
+        """Write the unseen lines of all containers, merged by time, and return their number."""
+        runs = []  # Timestamps and formatted lines per container
+        for i, container in enumerate(self._containers):
+            if container.num_unseen_lines > 0:
+                num_lines_skipped = container.num_lines_skipped
+                timestamps, severities, lines, streams = container.take_unseen_log_lines(self.MAX_BATCH_LINES)
+                if container.num_lines_skipped > num_lines_skipped:
+                    print(f"{container.num_lines_skipped - num_lines_skipped} lines of {container.name} were evicted "
+                          f"from memory before being written.", file=sys.stderr)
+                runs.append((timestamps, self._format_lines(i, timestamps, severities, lines, streams)))
+        if len(runs) == 0:
+            return 0
+        if len(runs) == 1:
+            output = runs[0][1]
+        else:  # The runs are sorted already, which the sort detects, so this is a linear merge mostly
+            records = [record for timestamps, formatted in runs for record in zip(timestamps, formatted)]
+            records.sort(key=itemgetter(0))
+            output = map(itemgetter(1), records)
+        output = b''.join(output)
+        self._output.write(output)
+        self._output.flush()
+        return output.count(b'\n')
+
+    def start(self):
+        self._ingestor.start()
+        self._ingestor.emit_discovery([c for c in self._containers if c.cid == ''])
+        for container in self._containers:
+            container.start_collecting_logs(self._ingestor)
+        logs_ended = self._ingestor.emit_logs_ended()
+        try:
+            while True:
+                is_ended = logs_ended.done()  # Checked before writing, so the last lines are written for sure
+                if self._write_unseen_lines() == 0:
+                    if is_ended:
+                        break
+                    sleep(self.IDLE_INTERVAL)
+        except BrokenPipeError:
+            # - Consumer is gone (e.g. 'head'), keep Python from complaining when flushing stdout at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), self._output.fileno())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for container in self._containers:
+                container.stop_collecting_logs()
+            self._ingestor.stop()
+            for container in self._containers:
+                container.close_archive()
+
+
+class PerformanceStats:
+    """
+    Live performance numbers of the ingestion and the rendering, for the browser's HUD and the stats file.
+
+    The containers and the browser only add to plain counters (a few operations per batch of lines or per frame), so
+    collecting stays on all the time. Once per SAMPLE_INTERVAL, the counters are sampled and rates are derived from
+    their differences to the previous sample. Each sample can be appended to a file, as one JSON object per line.
+    """
+    SAMPLE_INTERVAL = 1.  # Seconds
+
+    def __init__(self, containers: list[Container], stats_path: Path = None):
+        """
+        :param containers: Containers to sample the ingestion counters of
+        :param stats_path: File to append every sample to, None for none
+        """
+        self._containers = containers
+        self._stats_path = stats_path
+        self._num_frames = 0
+        self._frame_seconds = 0.  # Time spent composing and sending frames
+        self._max_frame_seconds = 0.  # Of the frames since the last sample
+        self._num_lines_at_last_frame = 0  # Lines ingested by all containers when the last frame was drawn
+        self._lock = Lock()
+        self._sampled_at = perf_counter()
+        self._sampled_counters = self._counters()
+        self._latest: dict | None = None  # Latest sample, None before the first one
+
+    @property
+    def latest(self): return self._latest
+    @property
+    def is_exporting(self): return self._stats_path is not None
+
+    def _counters(self):
+        return (self._num_frames, self._frame_seconds,
+                [(container.num_lines_ingested, container.classification_seconds, container.storage_seconds)
+                 for container in self._containers])
+
+    def record_frame(self, seconds: float):
+        with self._lock:
+            self._num_frames += 1
+            self._frame_seconds += seconds
+            self._max_frame_seconds = max(self._max_frame_seconds, seconds)
+            self._num_lines_at_last_frame = sum(container.num_lines_ingested for container in self._containers)
+
+    def sample(self):
+        """Take a sample if SAMPLE_INTERVAL passed since the last one (cheap to call more often)."""
+        now = perf_counter()
+        if now - self._sampled_at < self.SAMPLE_INTERVAL:
+            return
+        with self._lock:
+            counters, max_frame_seconds, self._max_frame_seconds = self._counters(), self._max_frame_seconds, 0.
+            num_lines_at_last_frame = self._num_lines_at_last_frame
+        (num_frames, frame_seconds, container_counters), elapsed = counters, now - self._sampled_at
+        last_num_frames, last_frame_seconds, last_container_counters = self._sampled_counters
+        self._sampled_at, self._sampled_counters = now, counters
+        wall_time = time()
+        self._latest = {
+            'time': dt.datetime.fromtimestamp(wall_time).isoformat(timespec='seconds'),
+            'frames_per_s': (num_frames - last_num_frames) / elapsed,
+            'frame_ms': (frame_seconds - last_frame_seconds) / max(num_frames - last_num_frames, 1) * 1e3,
+            'max_frame_ms': max_frame_seconds * 1e3,
+            'rendering_share': (frame_seconds - last_frame_seconds) / elapsed,
+            'queue_depth': sum(num_lines for num_lines, _, _ in container_counters) - num_lines_at_last_frame,
+            'containers': [{
+                'name': container.name,
+                'lines_per_s': (num_lines - last_num_lines) / elapsed,
+                'stored_lines': len(container.log_store),
+                'stored_bytes': container.log_store.nbytes,
+                'seconds_since_last_line': (None if container.last_line_at is None
+                                            else wall_time - container.last_line_at),
+                'classification_share': (classification_seconds - last_classification_seconds) / elapsed,
+                'storage_share': (storage_seconds - last_storage_seconds) / elapsed,
+                'collapsed_lines': container.num_lines_collapsed,
+                'dropped_lines': container.num_lines_dropped,
+            } for container, (num_lines, classification_seconds, storage_seconds),
+                (last_num_lines, last_classification_seconds, last_storage_seconds)
+                in zip(self._containers, container_counters, last_container_counters)],
+        }
+        if self._stats_path is not None:
+            with open(self._stats_path, 'a') as stats_file:
+                stats_file.write(json.dumps(self._latest) + '\n')
 
 
 class Browser:
+    """
+    Interactive terminal front-end showing the lines of each container in a tab.
+
+    Frames are drawn by a printer thread that sleeps until something requests one: lines coming in or the state of a
+    container changing (the containers notify the browser), a keypress or a terminal resize. Requests arriving while a
+    frame is drawn or within the minimum interval after it (1 / max frame rate) are merged into the next frame, so a
+    log storm costs a fixed number of frames per second, and an idle browser doesn't wake up at all (except once per
+    second to sample the performance numbers, if they are shown or exported).
+    """
+    MAX_MERGED_NAME_WIDTH = 12  # Container names before merged lines are cut to this
+    DEFAULT_MAX_FRAME_RATE = 20.  # Frames per second
+    SPARKS = '▁▂▃▄▅▆▇█'  # Sparkline levels, lowest first
+
     @staticmethod
-    def from_running_containers(select_by_names: list[str] = None, update_interval: float = 0.3):
-        ps_output = subprocess.run(["docker", "ps", "-q"], capture_output=True, text=True)
-        containers = [Container.from_id(cid) for cid in ps_output.stdout.strip().splitlines()]
+    def from_running_containers(select_by_names: list[str] = None, max_frame_rate: float = NotImplemented,
+                                max_log_bytes: int = NotImplemented, full_redraw: bool = False,
+                                num_backfill_lines: int = NotImplemented, archive_dir: Path = None,
+                                stats_path: Path = None, collapse_repeats: bool = True, max_line_rate: float = None):
+        containers = [Container(cid, name, max_log_bytes,
+                                None if archive_dir is None else LogArchive(archive_dir / name),
+                                collapse_repeats=collapse_repeats, max_line_rate=max_line_rate)
+                      for cid, name in _list_running_containers()]
         if select_by_names is not None:
             containers = [c for c in containers if c.name in select_by_names]
         if len(containers) == 0:
             print("No running containers found.")
             exit()
-        return Browser(containers, update_interval)
+        return Browser(containers, max_frame_rate, full_redraw, num_backfill_lines, stats_path=stats_path)
 
     @staticmethod
-    def from_yml_listed_containers(select_by_names: list[str] = None, update_interval: float = 0.3):
-        yml_text = YML.read_text()
-        services_text = yml_text.split('services:')[1]
-        container_names = [line.removesuffix(':').strip() for line in services_text.splitlines()
-                           if line.removeprefix('  ') == line.strip()  # Second level indent only
-                           and line.endswith(':') and not line.strip().startswith('#')]
+    def from_yml_listed_containers(select_by_names: list[str] = None, max_frame_rate: float = NotImplemented,
+                                   max_log_bytes: int = NotImplemented, full_redraw: bool = False,
+                                   num_backfill_lines: int = NotImplemented, archive_dir: Path = None,
+                                   stats_path: Path = None, collapse_repeats: bool = True,
+                                   max_line_rate: float = None):
+        container_names = _list_yml_services()
         if select_by_names is not None:
             container_names = [cn for cn in container_names if cn in select_by_names]
-        containers = [Container.from_name(name) for name in container_names]
+        # - IDs and states are discovered in the background, see Browser.start
+        containers = [Container('', name, max_log_bytes,
+                                None if archive_dir is None else LogArchive(archive_dir / name),
+                                collapse_repeats=collapse_repeats, max_line_rate=max_line_rate)
+                      for name in container_names]
         if len(containers) == 0:
             print("No containers found in docker-compose.yml.")
             exit()
-        return Browser(containers, update_interval)
+        return Browser(containers, max_frame_rate, full_redraw, num_backfill_lines, stats_path=stats_path)
 
-    def __init__(self, containers: list[Container], update_interval: float = 0.3):
+    @staticmethod
+    def from_archive(archive_dir: Path, since: dt.datetime = None, until: dt.datetime = None,
+                     select_by_names: list[str] = None, max_frame_rate: float = NotImplemented,
+                     max_log_bytes: int = NotImplemented, full_redraw: bool = False, stats_path: Path = None,
+                     collapse_repeats: bool = True):
+        # - One subdirectory per archived container, only the segments of the time range are read
+        container_names = sorted(path.name for path in archive_dir.iterdir() if path.is_dir()) \
+            if archive_dir.is_dir() else []
+        if select_by_names is not None:
+            container_names = [cn for cn in container_names if cn in select_by_names]
+        if len(container_names) == 0:
+            print(f"No archived containers found in {archive_dir}.")
+            exit()
+        since = dt.datetime.fromtimestamp(0) if since is None else since
+        until = dt.datetime.now() if until is None else until
+        containers = []
+        for name in container_names:
+            container = Container('', name, max_log_bytes, LogArchive(archive_dir / name),
+                                  collapse_repeats=collapse_repeats)
+            container.load_archived_log_lines(since.timestamp(), until.timestamp())
+            containers.append(container)
+        return Browser(containers, max_frame_rate, full_redraw, archived_range=(since, until), stats_path=stats_path)
+
+    def __init__(self, containers: list[Container], max_frame_rate: float = NotImplemented, full_redraw: bool = False,
+                 num_backfill_lines: int = NotImplemented, archived_range: tuple[dt.datetime, dt.datetime] = None,
+                 stats_path: Path = None):
         assert len(containers) > 0, "At least one container must be provided."
         self._containers = containers
-        self._update_interval = update_interval
+        self._min_frame_interval = 1 / (self.DEFAULT_MAX_FRAME_RATE if max_frame_rate is NotImplemented
+                                        else max_frame_rate)
+        self._frame_requested = Event()
+        for container in containers:
+            container.set_change_listener(self.request_frame)
+        self._renderer = ScreenRenderer(full_redraw)
         self._start_time = dt.datetime.now()
+        self._archived_range = archived_range  # If set, the containers hold archived lines and aren't followed
         self._active_tab_id = 0
-        self._instruction_lines = [' Instructions: [A] ↔ [D]     - Switch tabs (containers)',
+        self._instruction_lines = [' Instructions: [A] ↔ [D]     - Switch tabs (containers, the last one merges all)',
+                                   '               [PgUp] [PgDn] - Scroll through the history of this container',
+                                   '               [Home] [End]  - Jump to the oldest / newest lines',
+                                   '               [/]           - Search this container (empty: clear)',
+                                   '               [?]           - Search all containers at once (empty: close)',
+                                   '               [F]           - Filter by severity (info, warning, error, all)',
+                                   '               [Esc]         - Clear searches and filter',
                                    '               [Space]       - Execute a command this container',
                                    '               [Enter]       - Open a shell in this container',
                                    '               [Ctrl+Enter]  - Enter this container with a shell',
+                                   '               [P]           - Show performance numbers',
+                                   '               [R]           - Show CPU, memory, network and disk use',
+                                   '               [N]           - Show nginx requests instead of the lines (toggle)',
                                    '               [I]           - Minimize these instructions',
                                    '               [Q]           - Quit this browser']
         self._is_instructions_minimized = True
+        self._stats = PerformanceStats(containers, stats_path)  # Sampled all the time, shown on demand
+        self._is_stats_shown = False
+        self._is_resources_shown = False
+        self._is_access_log_shown = False  # Instead of the lines, in containers running nginx
+        # - With several containers, the last tab shows the lines of all of them in time order
+        self._merged_name_width = min(max(len(container.name) for container in containers), self.MAX_MERGED_NAME_WIDTH)
+        self._merged_log = MergedLog(containers, self._merged_name_width + 3) if len(containers) > 1 else None
+        # - Last line shown per tab (its index, or its timestamp in the merged tab), None: newest
+        self._scroll_anchors: list[int | float | None] = [None] * self._num_tabs
+        self._global_search_query: str | None = None  # If set, the matches of all containers are shown
+        self._global_search_offset = 0  # Number of the newest matches of all containers scrolled past
+        self._ingestor = LogIngestor(num_backfill_lines=num_backfill_lines)
+        self._discovery: Future = NotImplemented  # Resolving IDs and states of containers listed by name only
         self._printer_thread: Thread = Thread(target=self._printer_loop, daemon=True)
-        self._last_updated_tabs_bar: dt.datetime = dt.datetime.fromtimestamp(0)
         self._is_printing_paused = False
 
         class PrintPause:
@@ -243,111 +2847,467 @@ class Browser:
             def __exit__(slf, exc_type, exc_val, exc_tb):
                 self._is_printing_paused = False
                 if not slf._is_in_print_function:  # Avoid recursive calls to _print
-                    self._print()
+                    self._renderer.invalidate()  # Something else has written to the terminal meanwhile
+                    self.request_frame()
 
         self._print_pause = PrintPause
 
     @property
-    def _max_log_lines(self):
-        terminal_width = os.get_terminal_size().columns
-        terminal_height = os.get_terminal_size().lines
-        return os.get_terminal_size().lines - 20 + (5 if self._is_instructions_minimized else 0)
+    def _num_log_rows(self):
+        num_ui_lines = 2 + (1 if self._is_instructions_minimized else len(self._instruction_lines))
+        num_ui_lines += 1 + len(self._containers) if self._is_stats_shown else 0
+        num_ui_lines += 1 + len(self._containers) if self._is_resources_shown else 0
+        return _get_terminal_size().lines - num_ui_lines - 10  # Leave some room for time separator rows
+
+    @property
+    def containers(self): return self._containers
+    @property
+    def _num_tabs(self): return len(self._containers) + (0 if self._merged_log is None else 1)
+    @property
+    def is_merged_tab_active(self): return self._active_tab_id == len(self._containers)
 
     @property
-    def active_tab_container(self): return self._containers[self._active_tab_id]
+    def active_tab_container(self):
+        return None if self.is_merged_tab_active else self._containers[self._active_tab_id]
+
+    @staticmethod
+    def _compact_count(count: int):
+        if count < 1000:
+            return str(count)
+        if count < 10_000:
+            return f'{count / 1000:.1f}k'
+        return f'{count // 1000}k' if count < 1_000_000 else f'{count / 1_000_000:.1f}M'
+
+    @staticmethod
+    def _badge(counts: list[int]):
+        """Colored badge of a tab's unseen lines by severity, and its width."""
+        num_lines = sum(counts)
+        if num_lines == 0:
+            return ' ', 1
+        if num_lines < 10:  # A single digit, in the color of the most urgent line
+            severity = next(severity for severity in range(SEVERITY.STOPPED, -1, -1) if counts[severity] > 0)
+            return f'{SEVERITY.COLORS[severity]}{num_lines}{ANSICODES.RESET}', 1
+        # - Compact counts of the errors (incl. stops), the warnings and the other lines, e.g. "3/12/1.5k" in colors
+        num_errors, num_warnings = counts[SEVERITY.ERROR] + counts[SEVERITY.STOPPED], counts[SEVERITY.WARN]
+        parts = [(SEVERITY.COLORS[severity], Browser._compact_count(count)) for severity, count in
+                 ((SEVERITY.ERROR, num_errors), (SEVERITY.WARN, num_warnings),
+                  (SEVERITY.NONE, num_lines - num_errors - num_warnings)) if count > 0]
+        return ('/'.join(f'{color}{text}{ANSICODES.RESET}' for color, text in parts),
+                sum(len(text) for _, text in parts) + len(parts) - 1)
 
     @property
     def tabs_bar(self):
         tab_names = [container.name for container in self._containers]
-        terminal_width = os.get_terminal_size().columns
-        # - A Tab will look like this: " 3 container-name " (with colors)  -> 4 extra chars
-        if sum(len(tab_name) + 4 for tab_name in tab_names) > terminal_width:
+        unseen = [container.unseen_severity_counts for container in self._containers]
+        if self._merged_log is not None:
+            tab_names.append('All containers')
+            unseen.append(list(map(sum, zip(*unseen))))
+        badges = [self._badge(counts) for counts in unseen]
+        terminal_width = _get_terminal_size().columns
+        # - A Tab will look like this: " 3 container-name " (with colors)  -> 3 extra chars and the badge
+        if sum(len(tab_name) + 3 + badge_width for tab_name, (_, badge_width) in zip(tab_names, badges)) \
+                > terminal_width:
             width_per_tab = terminal_width // len(tab_names)
-            container_name_width = width_per_tab - 4
-            tab_names = []
-            for container in self._containers:
-                if len(container.name) <= container_name_width:
-                    tab_names.append(container.name)
-                else:
-                    tab_names.append(container.name[:container_name_width - 1] + '…')
-        badges = [(f'{container.most_urgent_unseen_color}'
-                   f'{container.num_unseen_lines if container.num_unseen_lines < 10 else "*"}'
-                   f'{ANSICODES.RESET}')
-                  if container.num_unseen_lines > 0 else ' ' for container in self._containers]
+            tab_names = [name if len(name) <= width_per_tab - 3 - badge_width
+                         else name[:max(width_per_tab - 4 - badge_width, 0)] + '…'
+                         for name, (_, badge_width) in zip(tab_names, badges)]
         tabs = [(f' {badge}{ANSICODES.BLACK_FG + ANSICODES.LIGHT_GRAY_BG if i == self._active_tab_id else ""} {name} '
-                 f'{ANSICODES.RESET}') for i, (name, badge) in enumerate(zip(tab_names, badges))]
+                 f'{ANSICODES.RESET}') for i, (name, (badge, _)) in enumerate(zip(tab_names, badges))]
         return ''.join(tabs)
 
+    @property
+    def renderer(self): return self._renderer
+
     def _print(self):
         with self._print_pause(is_in_print_function=True):
-            terminal_width = os.get_terminal_size().columns
-            print(ANSICODES.CLEAR_SCREEN, end='')
-            print(self.tabs_bar, end='\n\r')
+            start_time = perf_counter()
+            terminal_width = _get_terminal_size().columns
+            rows = [self.tabs_bar]
+            container = self.active_tab_container  # None in the merged tab
+            min_severity = self._containers[0].min_severity  # The same for all, see cycle_severity_filter
+            if self._global_search_query is not None:
+                started_line = f' All containers - Search "{self._global_search_query}"'
+                query = self._global_search_query
+            else:
+                title = 'All containers' if container is None else container.name
+                if self._archived_range is not None:
+                    started_line = (f' {title} - Archived logs from '
+                                    f'{self._archived_range[0].strftime("%Y-%m-%d %H:%M:%S")} to '
+                                    f'{self._archived_range[1].strftime("%Y-%m-%d %H:%M:%S")}')
+                else:
+                    started_line = (f' {title} - Capturing logs since '
+                                    f'{self._start_time.strftime("%Y-%m-%d %H:%M:%S")}')
+                query = None if container is None else container.search_query
+                if query is not None:
+                    started_line += f' - Search "{query}"'
+                if self._is_access_log_shown:
+                    started_line += ' - nginx requests, [N] for the lines'
+            if min_severity > SEVERITY.NONE:
+                started_line += f' - Only {SEVERITY.NAMES[min_severity]} and above'
+            if self._scroll_anchors[self._active_tab_id] is not None or self._global_search_offset > 0:
+                started_line += ' - Scrolled back, [End] to follow new lines'
+            started_line = started_line.ljust(terminal_width)[:terminal_width]
+            rows.append(ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + started_line + ANSICODES.RESET)
             if self._is_instructions_minimized:
-                instructions = f' [I] to expand instructions...'
+                rows.append(ANSICODES.DARK_GRAY_BG + f' [I] to expand instructions...' + ANSICODES.RESET)
+            else:
+                rows.extend(ANSICODES.DARK_GRAY_BG + line.ljust(terminal_width) + ANSICODES.RESET
+                            for line in self._instruction_lines)
+            if self._is_stats_shown:
+                rows.extend(ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + line.ljust(terminal_width)[:terminal_width]
+                            + ANSICODES.RESET for line in self._stats_lines())
+            if self._is_resources_shown:
+                rows.extend(self._resource_lines(terminal_width))
+            log_region_start = len(rows)
+            if self._is_access_log_shown and self._global_search_query is None:
+                rows.extend(self._access_log_lines(terminal_width, self._num_log_rows))
+                prefixed_lines = []
+            elif self._global_search_query is not None:
+                prefixed_lines = self._global_search_results(self._num_log_rows)
+            elif container is None:
+                prefixed_lines = [self._prefixed(source, line, self._merged_name_width)
+                                  for source, line in self._merged_log.get_log_window(
+                                      self._num_log_rows, self._scroll_anchors[self._active_tab_id])]
             else:
-                instructions = '\n\r'.join([line.ljust(terminal_width) for line in self._instruction_lines])
-            started_line = (f' {self.active_tab_container.name} - Capturing logs since '
-                            f'{self._start_time.strftime("%Y-%m-%d %H:%M:%S")}').ljust(terminal_width)
-            print(ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + started_line + ANSICODES.RESET, end='\n\r')
-            print(ANSICODES.DARK_GRAY_BG + instructions + ANSICODES.RESET, end='\n\r')
-            num_ui_lines = 4 + (5 if self._is_instructions_minimized else 0)
-            log_lines = self.active_tab_container.get_log_tail_for_terminal_height(num_ui_lines=num_ui_lines)
+                prefixed_lines = [('', '', line) for line in container.get_log_window(
+                    self._num_log_rows, self._scroll_anchors[self._active_tab_id])]
             current_timestamp: dt.datetime = NotImplemented
-            for log_line in log_lines:
+            for prefix, prefix_color, log_line in prefixed_lines:
+                raw, color, timestamp = prefix + log_line.raw, log_line.color, log_line.timestamp
+                spans = [] if query is None else [(start + len(prefix), end + len(prefix))
+                                                  for start, end in _find_spans(log_line.raw, query)]
                 appendix = ''
-                if current_timestamp is NotImplemented or (current_timestamp.date() != log_line.timestamp.date()
-                                                           and current_timestamp.hour != log_line.timestamp.hour
-                                                           and current_timestamp.minute != log_line.timestamp.minute):
-                    if current_timestamp is NotImplemented or current_timestamp.date() != log_line.timestamp.date():
-                        time_string = log_line.timestamp.strftime("%H:%M")
+                # - Mark every new minute, with the date for the first line and whenever the day changes
+                if (current_timestamp is NotImplemented
+                        or current_timestamp.replace(second=0, microsecond=0) != timestamp.replace(second=0,
+                                                                                                   microsecond=0)):
+                    if current_timestamp is NotImplemented or current_timestamp.date() != timestamp.date():
+                        time_string = timestamp.strftime("%Y-%m-%d %H:%M")
                     else:
-                        time_string = log_line.timestamp.strftime("%Y-%m-%d %H:%M")
+                        time_string = timestamp.strftime("%H:%M")
                     time_string = f' {time_string} '
-                    padding_size = terminal_width - len(time_string) - len(log_line.raw)
+                    padding_size = terminal_width - len(time_string) - len(raw)
                     if padding_size < 0:  # Just give it its own line before the log line
                         padding_size = terminal_width - len(time_string)
-                        print(' ' * padding_size + ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + time_string
-                              + ANSICODES.RESET, end='\n\r')
-                        appendix = ''
+                        rows.append(' ' * padding_size + ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + time_string
+                                    + ANSICODES.RESET)
                     else:
                         appendix = (' ' * padding_size
                                     + ANSICODES.LIGHT_GRAY_BG + ANSICODES.BLACK_FG + time_string + ANSICODES.RESET)
-                print(log_line.colorized + appendix, end='\n\r')
-                current_timestamp = log_line.timestamp
-            self._last_updated_tabs_bar = dt.datetime.now()
+                # - Split the line into terminal rows, so every row can be diffed on its own
+                for start in range(0, max(len(raw), 1), terminal_width):
+                    row = _highlight_spans(raw[start:start + terminal_width], start, spans)
+                    if start == 0 and prefix:  # Colored by container instead of severity, never highlighted
+                        row = prefix_color + row[:len(prefix)] + ANSICODES.RESET + color + row[len(prefix):]
+                    rows.append(color + row + ANSICODES.RESET)
+                rows[-1] += appendix
+                current_timestamp = timestamp
+            # - Sparse matches can need more time separators than there is room for, the oldest rows give way
+            del rows[log_region_start:log_region_start + max(len(rows) - _get_terminal_size().lines, 0)]
+            self._renderer.render(rows, log_region_start)
+            self._stats.record_frame(perf_counter() - start_time)
+
+    def _stats_lines(self):
+        # - The latest performance sample, the browser's numbers first and then one line per container
+        sample = self._stats.latest
+        if sample is None:
+            return [' Performance: measuring...'] + [''] * len(self._containers)
+        lines = [f' Performance: {sample["frames_per_s"]:.1f} frames/s, {sample["frame_ms"]:.1f} ms per frame '
+                 f'({sample["max_frame_ms"]:.1f} ms max, {sample["rendering_share"]:.0%} of the time), '
+                 f'{sample["queue_depth"]} lines waiting for the next frame']
+        name_width = max(len(container.name) for container in self._containers)
+        for stats in sample['containers']:
+            since_last_line = ('no lines yet' if stats['seconds_since_last_line'] is None
+                               else f'last {stats["seconds_since_last_line"]:.1f} s ago')
+            lines.append(f'   {stats["name"].ljust(name_width)} {stats["lines_per_s"]:8.0f} lines/s '
+                         f'{stats["stored_lines"]:9d} lines {stats["stored_bytes"] / 1024 ** 2:7.1f} MiB  '
+                         f'{since_last_line.ljust(18)} classifying {stats["classification_share"]:4.0%}  '
+                         f'storing {stats["storage_share"]:4.0%}'
+                         + (f'  {stats["collapsed_lines"]} repeats collapsed, {stats["dropped_lines"]} dropped'
+                            if stats['collapsed_lines'] > 0 or stats['dropped_lines'] > 0 else ''))
+        return lines
+
+    @staticmethod
+    def _format_bytes(num_bytes: float):
+        for unit in ('B', 'KiB', 'MiB', 'GiB'):
+            if num_bytes < 1024 or unit == 'GiB':
+                return f'{num_bytes:.0f} {unit}' if unit == 'B' else f'{num_bytes:.1f} {unit}'
+            num_bytes /= 1024
+
+    @staticmethod
+    def _sparkline(values: list[float], width: int):
+        # - Scaled to the largest value shown, so the shape is visible at any level (the current value is printed)
+        sparks = Browser.SPARKS
+        values = values[-width:] if width > 0 else []
+        highest = max(values, default=0.)
+        padding = ' ' * (width - len(values))  # Before the first sample
+        if highest <= 0:
+            return padding + sparks[0] * len(values)
+        return padding + ''.join(sparks[min(int(value / highest * len(sparks)), len(sparks) - 1)] for value in values)
+
+    def _resource_lines(self, terminal_width: int):
+        # - A title row and per container: CPU, memory, network and block I/O, each with a sparkline of its history
+        if self._archived_range is not None:
+            return [ANSICODES.DARK_GRAY_BG + ' Resources: not monitored while browsing archived logs'.ljust(
+                terminal_width)[:terminal_width] + ANSICODES.RESET] + [''] * len(self._containers)
+        name_width = min(max(len(container.name) for container in self._containers), self.MAX_MERGED_NAME_WIDTH)
+        # - Indented name, then four times a label, a sparkline and a value (16 characters without the sparkline)
+        spark_width = min(max((terminal_width - 3 - name_width - 4 * 16) // 4, 0), ResourceHistory.CAPACITY)
+        title = f' Resources: the last {spark_width} s, one sample per second' if spark_width > 0 else ' Resources:'
+        lines = [ANSICODES.DARK_GRAY_BG + title.ljust(terminal_width)[:terminal_width] + ANSICODES.RESET]
+        for i, container in enumerate(self._containers):
+            name = container.name
+            name = name.ljust(name_width) if len(name) <= name_width else name[:name_width - 1] + '…'
+            history = container.resources
+            if len(history) == 0:
+                lines.append(f'   {name} waiting for samples...')
+                continue
+            cpu, memory, network, block_io = (history.values(metric, max(spark_width, 1)) for metric in
+                                              (history.CPU, history.MEMORY, history.NETWORK, history.BLOCK_IO))
+            color = ANSICODES.CONTAINER_FGS[i % len(ANSICODES.CONTAINER_FGS)]
+            if spark_width == 0:  # Too narrow, just the values (cut, which needs the line without colors)
+                lines.append(f'   {name} CPU {cpu[-1]:.1f}% MEM {self._format_bytes(memory[-1])} NET '
+                             f'{self._format_bytes(network[-1])}/s I/O {self._format_bytes(block_io[-1])}/s'
+                             [:terminal_width])
+                continue
+            lines.append(f'   {color}{name}{ANSICODES.RESET}'
+                         f' CPU {color}{self._sparkline(cpu, spark_width)}{ANSICODES.RESET} {cpu[-1]:9.1f}%'
+                         f' MEM {color}{self._sparkline(memory, spark_width)}{ANSICODES.RESET}'
+                         f' {self._format_bytes(memory[-1]):>10}'
+                         f' NET {color}{self._sparkline(network, spark_width)}{ANSICODES.RESET}'
+                         f' {self._format_bytes(network[-1]):>8}/s'
+                         f' I/O {color}{self._sparkline(block_io, spark_width)}{ANSICODES.RESET}'
+                         f' {self._format_bytes(block_io[-1]):>8}/s')
+        return lines
+
+    @staticmethod
+    def _format_seconds(seconds: float):
+        return f'{seconds * 1000:.1f} ms' if seconds < 1 else f'{seconds:.2f} s'
+
+    def _access_log_lines(self, terminal_width: int, num_rows: int):
+        # - Requests of the active container (of all running nginx in the merged tab) in the window of AccessLogStats
+        containers = [self.active_tab_container] if not self.is_merged_tab_active else self._containers
+        containers = [container for container in containers if container.has_access_log]
+        if len(containers) == 0:
+            return [f' No access log here, only these run nginx: {", ".join(AccessLogStats.SERVICES)}'
+                    [:terminal_width]]
+        stats = [container.access_log_stats for container in containers if container.access_log_stats is not None]
+        if len(stats) < len(containers):
+            return [' Analyzing the access log...']
+        is_live = self._archived_range is None
+        newest_times = [newest for newest in (access_log_stats.newest_time for access_log_stats in stats)
+                        if newest is not None]
+        if len(newest_times) == 0:
+            return [' No requests logged' + (' yet' if is_live else '')]
+        # - Live, the newest bucket is still filling up, the one before it is the latest complete one
+        summary = AccessLogStats.summarize(stats, time() if is_live else max(newest_times) - 1)
+        rates, statuses, num_requests = summary['rates'], summary['statuses'], summary['num_requests']
+        window_minutes = AccessLogStats.BUCKET_SECONDS * AccessLogStats.NUM_BUCKETS / 60
+        complete_rates = rates[:-1] if is_live else rates
+        lines = [f' Requests: {complete_rates[-1]:.1f}/s {"now" if is_live else "at the end"}, '
+                 f'{sum(complete_rates) / len(complete_rates):.1f}/s on average over {window_minutes:.0f} min '
+                 f'({num_requests} requests, {self._format_bytes(summary["num_bytes"])} sent)',
+                 f'   {self._sparkline(rates, len(rates))} per {AccessLogStats.BUCKET_SECONDS} s, oldest first']
+        if num_requests == 0:
+            return [line[:terminal_width] for line in lines]
+        by_class = Counter()
+        for status, count in statuses.items():
+            by_class[f'{status // 100}xx'] += count
+        lines.append(' Statuses: ' + '  '.join(f'{status_class} {count / num_requests:.1%}'
+                                               for status_class, count in sorted(by_class.items()))
+                     + ' - ' + ', '.join(f'{status} ×{count}' for status, count in statuses.most_common(5)))
+        latencies = summary['latencies']
+        if len(latencies) > 0:
+            lines.append(' Latency: ' + '  '.join(f'p{round(q * 100)} {self._format_seconds(latencies.quantile(q))}'
+                                                  for q in (.5, .95, .99))
+                         + f' ({len(latencies)} requests timed)')
+        else:
+            lines.append(' Latency: not logged, see log_format timed in nginx.conf')
+        error_paths = summary['error_paths']
+        lines.append(f' {"Requests":>10} {"5xx":>8}  Top paths')
+        lines = [line[:terminal_width] for line in lines]
+        for path, count in summary['paths'].most_common(max(num_rows - len(lines), 0)):
+            num_errors = error_paths.get(path, 0)
+            line = f' {count:10d} {num_errors:8d}  {path}'[:terminal_width]
+            lines.append(ANSICODES.RED_FG + line + ANSICODES.RESET if num_errors > 0 else line)  # Server errors
+        return lines
+
+    def toggle_access_log(self):
+        self._is_access_log_shown = not self._is_access_log_shown
+        if self._is_access_log_shown:
+            # - Backfilled from the stored lines on the first time, counting the new ones from then on
+            if self._archived_range is None:
+                self._ingestor.emit_access_log_analysis(self._containers)
+            else:
+                for container in self._containers:
+                    container.analyze_access_log()
+
+    def _prefixed(self, source: int, line: LogLine, name_width: int):
+        # - A line with the name of its container before it, and the name's color
+        name = self._containers[source].name
+        name = name.ljust(name_width) if len(name) <= name_width else name[:name_width - 1] + '…'
+        return f'{name} │ ', ANSICODES.CONTAINER_FGS[source % len(ANSICODES.CONTAINER_FGS)], line
+
+    def _global_search_results(self, num_rows: int):
+        """The newest matches of all containers (before the scroll offset), as (name prefix, its color, line)."""
+        limit = self._global_search_offset + num_rows
+        name_width = max(len(container.name) for container in self._containers)
+        results = []  # Timestamp, container position and index of each match
+        for source, container in enumerate(self._containers):
+            store, min_severity = container.log_store, container.min_severity
+            # - Matches below the severity filter don't count towards the limit, so they are dropped before it
+            indices = container.search(self._global_search_query, None if min_severity > SEVERITY.NONE else limit)
+            indices = [index for index in indices if store.severity(index) >= min_severity][-limit:]
+            results.extend((store.timestamp(index), source, index)
+                           for index in indices if index >= store.first_index)
+        results.sort(key=lambda result: result[0])
+        self._global_search_offset = min(self._global_search_offset, max(len(results) - num_rows, 0))
+        results = results[max(len(results) - limit, 0):len(results) - self._global_search_offset]
+        return [self._prefixed(source, self._containers[source].log_store.line(index), name_width)
+                for _, source, index in results]
+
+    def request_frame(self):
+        """Have the printer thread draw a frame soon, cheap to call from any thread and as often as needed."""
+        self._frame_requested.set()
 
     def _printer_loop(self):
         while isinstance(self._printer_thread, Thread):
-            if not self._is_printing_paused:
-                # - Update screen if there are new lines in the active tab or if more than 1s passed since last update
-                if (self.active_tab_container.num_unseen_lines > 0
-                        or (dt.datetime.now() - self._last_updated_tabs_bar).total_seconds() > self._update_interval):
+            # - Sleep until a frame is requested, waking up only to sample the performance numbers if they are used
+            is_sampling = (self._is_stats_shown or self._is_resources_shown or self._is_access_log_shown
+                           or self._stats.is_exporting)
+            is_requested = self._frame_requested.wait(self._stats.SAMPLE_INTERVAL if is_sampling else None)
+            self._stats.sample()
+            if not isinstance(self._printer_thread, Thread):
+                break
+            if is_requested or self._is_stats_shown or self._is_resources_shown or self._is_access_log_shown:
+                self._frame_requested.clear()  # Requests from now on are drawn by the next frame
+                if not self._is_printing_paused:
+                    frame_start = perf_counter()
                     self._print()
-            # Sleep a bit to avoid busy loop
-            sleep(self._update_interval / 5)
+                    # - Requests arriving meanwhile are merged into one frame after the minimum interval
+                    sleep(max(self._min_frame_interval - (perf_counter() - frame_start), 0))
+
+    def toggle_resources(self):
+        self._is_resources_shown = not self._is_resources_shown
+        if self._is_resources_shown and self._archived_range is None:
+            self._ingestor.emit_resource_monitoring(self._containers)  # Only the first time, keeps going from then on
 
     def switch_tab(self, backwards: bool = False):
-        self._active_tab_id = (self._active_tab_id + (-1 if backwards else 1)) % len(self._containers)
+        self._active_tab_id = (self._active_tab_id + (-1 if backwards else 1)) % self._num_tabs
+
+    def scroll(self, num_pages: float):
+        num_rows = round(num_pages * self._num_log_rows)
+        if self._global_search_query is not None:  # Scrolled by matches, the newest window is clamped when printed
+            self._global_search_offset = max(self._global_search_offset - num_rows, 0)
+            return
+        anchor = self._scroll_anchors[self._active_tab_id]
+        log = self._merged_log if self.is_merged_tab_active else self.active_tab_container
+        self._scroll_anchors[self._active_tab_id] = log.scroll_log_window(anchor, num_rows)
+
+    def scroll_to_top(self):
+        if self._global_search_query is not None:
+            self._global_search_offset = sys.maxsize
+            return
+        log = self._merged_log if self.is_merged_tab_active else self.active_tab_container
+        self._scroll_anchors[self._active_tab_id] = log.log_window_at_top(self._num_log_rows)
+
+    def scroll_to_end(self):
+        if self._global_search_query is not None:
+            self._global_search_offset = 0
+            return
+        self._scroll_anchors[self._active_tab_id] = None
+
+    def _on_resize(self, *_):
+        _refresh_terminal_size()
+        self._renderer.invalidate()  # Redrawn by the printer loop, printing right here might interrupt a frame
+        self.request_frame()
+
+    def _prompt(self, text: str):
+        with self._print_pause():
+            query = input(f'\n{ANSICODES.GRAY_FG}{text}: ')
+            print(ANSICODES.RESET)
+        return query
+
+    def search_in_active_tab(self):
+        if self.is_merged_tab_active:
+            self.search_in_all_tabs()
+            return
+        query = self._prompt(f'Search {self.active_tab_container.name} (empty to clear)')
+        self.active_tab_container.set_search_query(query or None)
+        self._scroll_anchors[self._active_tab_id] = None
+        self._global_search_query = None
+
+    def search_in_all_tabs(self):
+        query = self._prompt('Search all containers (empty to close)')
+        self._global_search_query = query or None
+        self._global_search_offset = 0
+
+    def cycle_severity_filter(self):
+        levels = SEVERITY.FILTER_LEVELS
+        min_severity = levels[(levels.index(self._containers[0].min_severity) + 1) % len(levels)]
+        for container in self._containers:
+            container.set_min_severity(min_severity)
+        self._scroll_anchors = [None] * self._num_tabs
+        self._global_search_offset = 0
+
+    def clear_filters(self):
+        for container in self._containers:
+            container.set_search_query(None)
+            container.set_min_severity(SEVERITY.NONE)
+        self._scroll_anchors = [None] * self._num_tabs
+        self._global_search_query = None
+        self._global_search_offset = 0
 
     def prompt_user_in_active_tab(self):
+        if self.is_merged_tab_active:
+            return  # No single container to run it in
         with self._print_pause():
             inp = input(f'\n{ANSICODES.GRAY_FG}Command to execute -$: ')
             print(ANSICODES.RESET)
             subprocess.run(["docker", "exec", "-it", self.active_tab_container.cid, "sh", "-c", inp])
 
     def open_shell_in_active_tab(self):
+        if self.is_merged_tab_active:
+            return
         with self._print_pause():
             subprocess.run(["make", "shell", "SERVICE=" + self.active_tab_container.name])
 
     def enter_active_tab_with_shell(self):
+        if self.is_merged_tab_active:
+            return
         with self._print_pause():
             subprocess.run(["make", "enter", "SERVICE=" + self.active_tab_container.name])
 
-    def start(self):
-        for container in self._containers:
-            container.start_collecting_logs()
+    @property
+    def discovery(self): return self._discovery
+
+    def _start_background_work(self):
+        if self._archived_range is not None:  # Nothing to collect
+            self._discovery = Future()
+            self._discovery.set_result(None)
+        else:
+            self._ingestor.start()
+            # - Discover unknown container IDs and states with one request, while the first screen is painted
+            self._discovery = self._ingestor.emit_discovery([c for c in self._containers if c.cid == ''])
+            for container in self._containers:
+                container.start_collecting_logs(self._ingestor)
+        self._print()
         self._printer_thread.start()  # Start log updating thread after initial screen print
+
+    def _stop_background_work(self):
+        for container in self._containers:
+            container.stop_collecting_logs()
+        self._ingestor.stop()
+        for container in self._containers:
+            container.close_archive()  # After the ingestor stopped, so no lines come in anymore
+        thread = self._printer_thread
+        self._printer_thread = None
+        self.request_frame()  # Wake the printer thread up, so it sees it's done
+        thread.join(timeout=1.)
+
+    def start(self):
+        signal.signal(signal.SIGWINCH, self._on_resize)
+        self._start_background_work()
         while True:
             key = _get_keypress()
             match key:
@@ -356,28 +3316,57 @@ class Browser:
                     break
                 case 'a':
                     self.switch_tab(backwards=True)
-                    self._print()
+                    self.request_frame()
                 case 'd':
                     self.switch_tab()
-                    self._print()
+                    self.request_frame()
                 case 'i':
                     self._is_instructions_minimized = not self._is_instructions_minimized
-                    self._print()
+                    self.request_frame()
+                case 'p':
+                    self._is_stats_shown = not self._is_stats_shown
+                    self.request_frame()
+                case 'r':
+                    self.toggle_resources()
+                    self.request_frame()
+                case 'n':
+                    self.toggle_access_log()
+                    self.request_frame()
+                case '\033[5~':  # PgUp
+                    self.scroll(-.9)
+                    self.request_frame()
+                case '\033[6~':  # PgDn
+                    self.scroll(.9)
+                    self.request_frame()
+                case '\033[H' | '\033[1~' | '\033OH':  # Home (depending on the terminal)
+                    self.scroll_to_top()
+                    self.request_frame()
+                case '\033[F' | '\033[4~' | '\033OF':  # End (depending on the terminal)
+                    self.scroll_to_end()
+                    self.request_frame()
+                case '/':
+                    self.search_in_active_tab()
+                    self.request_frame()
+                case '?':
+                    self.search_in_all_tabs()
+                    self.request_frame()
+                case 'f':
+                    self.cycle_severity_filter()
+                    self.request_frame()
+                case '\033':  # Esc
+                    self.clear_filters()
+                    self.request_frame()
                 case ' ':  # Space
                     self.prompt_user_in_active_tab()
-                    self._print()
+                    self.request_frame()
                 case '\r':  # Enter
                     self.open_shell_in_active_tab()  # Blocking call
-                    self._print()
+                    self.request_frame()
                 case '\n':  # Ctrl + Enter
                     self.enter_active_tab_with_shell()  # Blocking call
-                    self._print()
+                    self.request_frame()
                 case _: pass  # Ignore other keys
-        for container in self._containers:
-            container.stop_collecting_logs()
-        thread = self._printer_thread
-        self._printer_thread = None
-        thread.join(timeout=1.)
+        self._stop_background_work()
 
 
 if __name__ == "__main__":
@@ -387,11 +3376,91 @@ if __name__ == "__main__":
                         help='Names of containers to show (default: all in docker-compose.yml).')
     parser.add_argument('-r', '--running', action='store_true',
                         help='Only show containers if running (default: false).')
+    parser.add_argument('--full-redraw', action='store_true',
+                        help='Clear and redraw the whole screen every frame instead of only sending changed rows '
+                             '(default: false).')
+    parser.add_argument('--max-fps', type=float, default=Browser.DEFAULT_MAX_FRAME_RATE,
+                        help='Maximum number of frames drawn per second, bursts of new lines are merged into one '
+                             'frame (default: %(default)s).')
+    parser.add_argument('-m', '--max-memory', type=float, default=Container.DEFAULT_MAX_LOG_BYTES / 1024 ** 2,
+                        help='Memory cap for the logs of each container in MiB, oldest lines are dropped first. '
+                             'A million lines of 100 characters take about 124 MiB (default: %(default)s).')
+    parser.add_argument('-t', '--tail', type=int, default=LogIngestor.DEFAULT_NUM_BACKFILL_LINES,
+                        help='Number of the newest log lines loaded per container at startup, older ones are loaded '
+                             'when scrolling up to them. Negative to load all (default: %(default)s).')
+    parser.add_argument('--no-collapse', action='store_true',
+                        help='Keep consecutive lines that differ only in their numbers apart instead of showing them '
+                             'as one line with the number of repeats (always with --output, default: false).')
+    parser.add_argument('--max-line-rate', type=float, metavar='N',
+                        help='Store at most N distinct lines per second of each container (in bursts of up to '
+                             f'{Container.LINE_BURST_SECONDS:g} seconds of them), drop and count the others during log '
+                             'storms (not with --output, default: no limit).')
+    parser.add_argument('--archive', type=Path, metavar='DIR',
+                        help='Also append all collected log lines to compressed segment files in this directory, one '
+                             'subdirectory per container (default: no archive).')
+    parser.add_argument('--since', type=_parse_time_argument, metavar='TIME',
+                        help='Browse the archived lines from this time on instead of following the containers, e.g. '
+                             '2025-01-01T02:00 or 02:00 for today (needs --archive, default: oldest archived line).')
+    parser.add_argument('--until', type=_parse_time_argument, metavar='TIME',
+                        help='Browse the archived lines up to this time instead of following the containers '
+                             '(needs --archive, default: now).')
+    parser.add_argument('-o', '--output', choices=LogWriter.FORMATS,
+                        help='Stream the lines of the containers to stdout in this format instead of browsing them, '
+                             'plain text or JSON lines with container, time, stream and severity (default: browse).')
+    parser.add_argument('--stats-file', type=Path, metavar='FILE',
+                        help='Append performance numbers (as shown with [P]) to this file every second, as JSON lines '
+                             '(default: none).')
+    parser.add_argument('--no-follow', action='store_true',
+                        help='With --output, stop once the existing lines are written, e.g. for snapshots '
+                             '(default: false).')
     args = parser.parse_args()
 
     select_by_names = args.containers if len(args.containers) > 0 else None
-    if args.running:
-        browser = Browser.from_running_containers(select_by_names=select_by_names)
+    max_log_bytes = int(args.max_memory * 1024 ** 2)
+    if (args.since is not None or args.until is not None) and args.archive is None:
+        parser.error('--since and --until browse an archive, which needs --archive')
+    if args.output is not None:
+        if args.since is not None or args.until is not None:
+            parser.error('--output streams the containers, it can\'t be combined with --since and --until')
+        if args.stats_file is not None:
+            parser.error('--stats-file samples the browser, it can\'t be combined with --output')
+        if args.max_line_rate is not None:
+            parser.error('--output writes every line, it can\'t be combined with --max-line-rate')
+        # - Severities are only needed if they are written or archived, nothing is searched
+        is_classified = args.output == 'json' or args.archive is not None
+        if args.running:
+            containers = [Container(cid, name, max_log_bytes,
+                                    None if args.archive is None else LogArchive(args.archive / name),
+                                    is_searchable=False, is_classified=is_classified, collapse_repeats=False)
+                          for cid, name in _list_running_containers()]
+        else:
+            containers = [Container('', name, max_log_bytes,
+                                    None if args.archive is None else LogArchive(args.archive / name),
+                                    is_searchable=False, is_classified=is_classified, collapse_repeats=False)
+                          for name in _list_yml_services()]
+        if select_by_names is not None:
+            containers = [c for c in containers if c.name in select_by_names]
+        if len(containers) == 0:
+            print("No containers found.", file=sys.stderr)
+            exit(1)
+        LogWriter(containers, args.output, not args.no_follow, args.tail).start()
+        exit()
+    if args.since is not None or args.until is not None:
+        browser = Browser.from_archive(args.archive, args.since, args.until, select_by_names=select_by_names,
+                                       max_frame_rate=args.max_fps, max_log_bytes=max_log_bytes,
+                                       full_redraw=args.full_redraw, stats_path=args.stats_file,
+                                       collapse_repeats=not args.no_collapse)
+    elif args.running:
+        browser = Browser.from_running_containers(select_by_names=select_by_names, max_frame_rate=args.max_fps,
+                                                  max_log_bytes=max_log_bytes, full_redraw=args.full_redraw,
+                                                  num_backfill_lines=args.tail, archive_dir=args.archive,
+                                                  stats_path=args.stats_file, collapse_repeats=not args.no_collapse,
+                                                  max_line_rate=args.max_line_rate)
     else:
-        browser = Browser.from_yml_listed_containers(select_by_names=select_by_names)
+        browser = Browser.from_yml_listed_containers(select_by_names=select_by_names, max_frame_rate=args.max_fps,
+                                                     max_log_bytes=max_log_bytes, full_redraw=args.full_redraw,
+                                                     num_backfill_lines=args.tail, archive_dir=args.archive,
+                                                     stats_path=args.stats_file,
+                                                     collapse_repeats=not args.no_collapse,
+                                                     max_line_rate=args.max_line_rate)
     browser.start()
@@ -0,0 +1,276 @@
+#! /usr/bin/env python
+"""
+Incremental backups of the Schaluppe, Fregatte and Schatzinsel trees from one drive to another (see the crontab).
+
+Like the former 'rsync -au' calls, files and directories (empty ones too) are copied with their permissions, owners
+(when running as root), times and symbolic links (and special files like FIFOs and device nodes are recreated, as
+far as permitted), files that are newer on the destination are left alone and nothing is ever deleted there. Unlike
+them, the jobs run with a limited concurrency (one at a time by default, as they share the same two drives), and the
+destination tree isn't walked every night: each job keeps a manifest of the files it has backed up (size,
+modification time and, with --checksum, a content hash), so only the source tree is walked, and only files that
+changed since the last run are looked at on the destination and copied.
+Every job reports its duration and throughput.
+"""
+import os
+import sys
+import stat as stats
+import json
+import shutil
+import hashlib
+import datetime as dt
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+DEFAULT_SOURCE_ROOT = Path('/var/data/Pazifik_2TB')
+DEFAULT_DESTINATION_ROOT = Path('/var/data/Indik_1TB')
+DEFAULT_MANIFEST_DIR = Path('/var/data/.backup-manifests')  # On the mounted volume, so it survives rebuilds
+DEFAULT_JOBS = ('Schaluppe', 'Fregatte', 'Schatzinsel')
+
+
+class Manifest:
+    """
+    The files and directories of a backup as of its last run, by path relative to the backed up tree ('' for the tree
+    itself): size, modification time (ns) and content hash (None unless computed). Stored as JSON, replaced atomically
+    on save.
+    """
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        self._path = path
+        self.entries: dict[str, list] = {}  # Path -> [size, mtime_ns, hash or None]
+        try:
+            content = json.loads(path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):  # First run or damaged, everything is looked at again
+            return
+        if content.get('version') == self.VERSION:
+            self.entries = content['files']
+
+    def save(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self._path.with_name(self._path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'saved': dt.datetime.now().isoformat(timespec='seconds'),
+                       'files': self.entries}, f, separators=(',', ':'))
+        os.replace(temp_path, self._path)
+
+
+class BackupJob:
+    """
+    Backs up one source tree into a destination tree, see the module docstring.
+
+    :param checksum: Hash the contents of changed files. A file whose modification time changed but whose contents
+        didn't is then not copied again (only its times are), at the cost of reading it.
+    :param rescan: Ignore the manifest, so all files are compared to the destination again (e.g. after files were
+        removed from the backup, which the manifest doesn't notice). Files already backed up still aren't copied.
+    """
+    CHUNK_SIZE = 1024 ** 2
+    SAVE_INTERVAL = 60.  # Seconds between manifest saves during a run, so an interrupted run keeps its progress
+
+    def __init__(self, name: str, source: Path, destination: Path, manifest_path: Path, checksum: bool = False,
+                 rescan: bool = False, dry_run: bool = False):
+        self.name = name
+        self._source = source
+        self._destination = destination
+        self._manifest_path = manifest_path
+        self._checksum = checksum
+        self._rescan = rescan
+        self._dry_run = dry_run
+        # - Numbers of the last run
+        self.num_files = 0
+        self.num_copied = 0
+        self.num_bytes_copied = 0
+        self.num_errors = 0
+        self.seconds = 0.
+
+    def _log(self, message: str):
+        print(f'{dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")} [{self.name}] {message}', flush=True)
+
+    def _walk(self, directory: Path, relative: str = ''):
+        # - The directory (only at the top, as '') and everything below it, depth first with directories before their
+        #   contents, as (relative path, stat result)
+        try:
+            if relative == '':
+                yield '', os.stat(directory)
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            self._log(f'Cannot read {directory}: {e}')
+            self.num_errors += 1
+            return
+        for entry in entries:
+            path = relative + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    yield path, entry.stat(follow_symlinks=False)
+                    yield from self._walk(Path(entry.path), path + '/')
+                else:
+                    yield path, entry.stat(follow_symlinks=False)
+            except OSError as e:  # Vanished meanwhile, for example
+                self._log(f'Cannot read {entry.path}: {e}')
+                self.num_errors += 1
+
+    def _hash(self, path: Path):
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            while chunk := f.read(self.CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _make_directory(destination: Path, stat: os.stat_result):
+        # - Its mode and times are set by _finish_directory, once its contents are written
+        destination.mkdir(parents=True, exist_ok=True)
+        if os.geteuid() == 0:
+            os.chown(destination, stat.st_uid, stat.st_gid)
+
+    @staticmethod
+    def _finish_directory(destination: Path, stat: os.stat_result):
+        # - Writing the contents changes the times (and a read-only directory wouldn't take them), so this comes last
+        os.chmod(destination, stats.S_IMODE(stat.st_mode))
+        os.utime(destination, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def _copy(self, source: Path, destination: Path, stat: os.stat_result):
+        # - Through a temporary file, so an interrupted copy never leaves a truncated file under the real name. Returns
+        #   whether the file was copied, special files that can't be recreated without root are skipped.
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = destination.with_name(f'.{destination.name}.backup-tmp')
+        temp_path.unlink(missing_ok=True)  # Left over by an interrupted run
+        if stats.S_ISLNK(stat.st_mode):
+            os.symlink(os.readlink(source), temp_path)
+        elif stats.S_ISREG(stat.st_mode):
+            shutil.copy2(source, temp_path)
+        else:  # FIFOs, sockets and device nodes are recreated instead, their contents aren't files
+            try:
+                os.mknod(temp_path, stat.st_mode, stat.st_rdev)
+            except PermissionError:  # Device nodes need root, like with rsync that's no error
+                self._log(f'Skipping special file {source}, recreating it needs root')
+                return False
+            os.chmod(temp_path, stats.S_IMODE(stat.st_mode))  # Without the umask
+        if os.geteuid() == 0:
+            os.chown(temp_path, stat.st_uid, stat.st_gid, follow_symlinks=False)
+        os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns), follow_symlinks=False)
+        os.replace(temp_path, destination)
+        return True
+
+    def run(self):
+        """Back up all new and changed files, returns whether that worked for all of them."""
+        start_time = perf_counter()
+        self.num_files = self.num_copied = self.num_bytes_copied = self.num_errors = 0
+        manifest = Manifest(self._manifest_path)
+        old_entries, new_entries = {} if self._rescan else manifest.entries, {}
+        directories = {}  # Relative path -> stat result of all directories
+        unfinished_directories = {}  # ... of those whose mode and times are set at the end, see _finish_directory
+        last_save = perf_counter()
+        self._log(f'Backing up {self._source} to {self._destination}' + (' (dry run)' if self._dry_run else ''))
+        for path, stat in self._walk(self._source):
+            if stats.S_ISDIR(stat.st_mode):
+                directories[path] = stat
+                entry = old_entries.get(path)
+                if entry is not None and entry[1] == stat.st_mtime_ns:
+                    new_entries[path] = entry  # No entries added or removed, unless files get copied into it
+                elif not self._dry_run:
+                    try:
+                        self._make_directory(self._destination / path, stat)
+                        unfinished_directories[path] = stat
+                    except OSError as e:
+                        self._log(f'Cannot back up {path}: {e}')
+                        self.num_errors += 1
+                continue
+            self.num_files += 1
+            entry = old_entries.get(path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                new_entries[path] = entry  # Unchanged since the last run, the destination isn't looked at
+                continue
+            source, destination = self._source / path, self._destination / path
+            try:
+                content_hash = self._hash(source) if self._checksum and stats.S_ISREG(stat.st_mode) else None
+                try:
+                    destination_stat = os.stat(destination, follow_symlinks=False)
+                except FileNotFoundError:
+                    destination_stat = None
+                if destination_stat is not None and destination_stat.st_size == stat.st_size and (
+                        destination_stat.st_mtime_ns // 10 ** 9 == stat.st_mtime_ns // 10 ** 9
+                        or (content_hash is not None and entry is not None and entry[2] == content_hash)):
+                    # - Already there (e.g. from an earlier rsync or with only the times changed), just keep the times
+                    if not self._dry_run and destination_stat.st_mtime_ns != stat.st_mtime_ns:
+                        os.utime(destination, ns=(stat.st_atime_ns, stat.st_mtime_ns), follow_symlinks=False)
+                elif destination_stat is not None and destination_stat.st_mtime_ns > stat.st_mtime_ns:
+                    self._log(f'Skipping {path}, it is newer in the backup')
+                else:
+                    if self._dry_run:
+                        self._log(f'Would copy {path}')
+                    if self._dry_run or self._copy(source, destination, stat):
+                        self.num_copied += 1
+                        self.num_bytes_copied += stat.st_size
+                        parent = path.rpartition('/')[0]
+                        unfinished_directories.setdefault(parent, directories[parent])
+                new_entries[path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+            except OSError as e:
+                self._log(f'Cannot back up {path}: {e}')
+                self.num_errors += 1
+                continue  # Tried again on the next run
+            if not self._dry_run and perf_counter() - last_save > self.SAVE_INTERVAL:
+                # - Unfinished directories are left out, so an interrupted run is followed by one that finishes them
+                manifest.entries = {path: entry for path, entry in {**old_entries, **new_entries}.items()
+                                    if path not in unfinished_directories}
+                manifest.save()
+                last_save = perf_counter()
+        if not self._dry_run:
+            for path in sorted(unfinished_directories, key=lambda path: len(Path(path).parts), reverse=True):
+                stat = unfinished_directories[path]  # Deepest first, after all contents are written
+                try:
+                    self._finish_directory(self._destination / path, stat)
+                    new_entries[path] = [stat.st_size, stat.st_mtime_ns, None]
+                except OSError as e:
+                    self._log(f'Cannot back up {path}: {e}')
+                    self.num_errors += 1
+                    new_entries.pop(path, None)  # Tried again on the next run
+            # - Files gone from the source stay in the backup (like rsync without --delete), but not in the manifest
+            manifest.entries = new_entries
+            manifest.save()
+        self.seconds = perf_counter() - start_time
+        self._log(self.report)
+        return self.num_errors == 0
+
+    @property
+    def report(self):
+        throughput = self.num_bytes_copied / 1024 ** 2 / self.seconds if self.seconds > 0 else 0.
+        return (f'{self.num_files} files checked, {self.num_copied} copied ({self.num_bytes_copied / 1024 ** 2:.1f} '
+                f'MiB) in {self.seconds:.1f} s, {throughput:.1f} MiB/s'
+                + (f', {self.num_errors} errors' if self.num_errors > 0 else ''))
+
+
+def run_jobs(jobs: list[BackupJob], max_concurrent: int = 1):
+    """Run the given jobs, at most max_concurrent at a time, returns whether all of them succeeded."""
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        results = list(executor.map(BackupJob.run, jobs))
+    for job in jobs:
+        print(f'{job.name.ljust(max(len(j.name) for j in jobs))}  {job.report}')
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Back up the data trees from one drive to another, incrementally.")
+    parser.add_argument("jobs", type=str, nargs='*', default=list(DEFAULT_JOBS),
+                        help=f"Names of the trees to back up (default: {' '.join(DEFAULT_JOBS)})")
+    parser.add_argument("-s", "--source-root", type=Path, default=DEFAULT_SOURCE_ROOT,
+                        help="Directory holding the trees to back up")
+    parser.add_argument("-d", "--destination-root", type=Path, default=DEFAULT_DESTINATION_ROOT,
+                        help="Directory holding the backups of the trees")
+    parser.add_argument("-m", "--manifest-dir", type=Path, default=DEFAULT_MANIFEST_DIR,
+                        help="Directory for the manifests of the jobs (one JSON file per job)")
+    parser.add_argument("-j", "--max-concurrent", type=int, default=1,
+                        help="Number of jobs running at the same time (default: 1, they share the drives)")
+    parser.add_argument("-c", "--checksum", action="store_true",
+                        help="Hash the contents of changed files, files with only new times aren't copied again")
+    parser.add_argument("-r", "--rescan", action="store_true",
+                        help="Compare all files to the backup again, not only those changed since the last run")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="Only tell what would be copied, neither the backup nor the manifests are changed")
+    args = parser.parse_args()
+
+    backup_jobs = [BackupJob(name, args.source_root / name, args.destination_root / name,
+                             args.manifest_dir / f'{name}.json', args.checksum, args.rescan, args.dry_run)
+                   for name in args.jobs]
+    sys.exit(0 if run_jobs(backup_jobs, max(args.max_concurrent, 1)) else 1)
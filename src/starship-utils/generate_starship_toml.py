@@ -1,8 +1,13 @@
 
+import re
+import json
 import colorsys
+import hashlib
 from argparse import ArgumentParser
 from pathlib import Path
 
+GOOD_SPACERS = [4, 5, 6, 7, 9, -3, -2]
+
 
 class ColorPalette:
     ANSI_RESET = '\x1b[0m'
@@ -36,18 +41,32 @@ class ColorPalette:
         :param lightness_bounds: Tuple of (min_lightness, max_lightness)
         :return: List of hex color codes
         """
+        return ColorPalette.from_hues([hue_degrees], num_colors, spacers, saturation_bounds, lightness_bounds)[0]
+
+    @staticmethod
+    def from_hues(hues_degrees: list[int], num_colors: int, spacers: list[int],
+                  saturation_bounds: tuple[float, float], lightness_bounds: tuple[float, float]):
+        """
+        Generate one palette per hue (see from_hue) in one pass. The saturation and lightness steps are the same for all
+        hues, so they are computed only once.
+
+        :param hues_degrees: Hues in degrees (0-360)
+        :return: List of ColorPalette objects, in the order of the hues
+        """
         min_saturation, max_saturation = saturation_bounds
         min_lightness, max_lightness = lightness_bounds
-        hue = hue_degrees / 360.0  # Convert hue to [0, 1] range
-        colors = []
         total_num_colors = num_colors + len(spacers)
-        # - Generate colors by varying saturation and lightness
-        for i in range(total_num_colors):
-            saturation = min_saturation + (max_saturation - min_saturation) * i / (total_num_colors - 1)
-            lightness = min_lightness + (max_lightness - min_lightness) * i / (total_num_colors - 1)
-            r, g, b = (int(v * 255) for v in colorsys.hls_to_rgb(hue, lightness, saturation))
-            colors.append(ColorPalette.Color(r, g, b))
-        return ColorPalette(colors, thereof_spacers=spacers)
+        # - Colors vary by saturation and lightness
+        steps = [(min_lightness + (max_lightness - min_lightness) * i / (total_num_colors - 1),
+                  min_saturation + (max_saturation - min_saturation) * i / (total_num_colors - 1))
+                 for i in range(total_num_colors)]
+        palettes = []
+        for hue_degrees in hues_degrees:
+            hue = hue_degrees / 360.0  # Convert hue to [0, 1] range
+            colors = [ColorPalette.Color(*(int(v * 255) for v in colorsys.hls_to_rgb(hue, lightness, saturation)))
+                      for lightness, saturation in steps]
+            palettes.append(ColorPalette(colors, thereof_spacers=spacers))
+        return palettes
 
     def __init__(self, colors: list[Color], thereof_spacers: list[int]):
         """
@@ -101,9 +120,77 @@ class ColorPalette:
               f'{self.ANSI_RESET}')
 
 
+class StarshipTemplate:
+    """
+    A starship.toml template, with placeholders like %<c0>% for the colors of a palette (and %<user_cmd>%). It is
+    compiled once into a plan of literal text and placeholder names, so it can be filled in for any number of palettes
+    without escaping the curly braces of the TOML file.
+    """
+    _PLACEHOLDER = re.compile(r'%<(\w+)>%')
+
+    def __init__(self, text: str):
+        # - Alternating literal text and placeholder names, starting and ending with literal text
+        parts = self._PLACEHOLDER.split(text)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+        self.digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def from_file(path: Path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return StarshipTemplate(f.read())
+
+    def render(self, substitutions: dict[str, str]):
+        """The filled in template, raises a KeyError for a placeholder without substitution."""
+        parts = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            parts.append(substitutions[name])
+            parts.append(literal)
+        return ''.join(parts)
+
+
+def read_compose_hues(compose_file: Path):
+    """The PROMPTHUE build argument of each service in a docker-compose.yml, by service name."""
+    hues = {}
+    service = None
+    for line in compose_file.read_text(encoding='utf-8').split('services:', 1)[1].splitlines():
+        if line.removeprefix('  ') == line.strip() and line.endswith(':') and not line.strip().startswith('#'):
+            service = line.removesuffix(':').strip()  # Second level indent only
+        elif service is not None and (match := re.match(r'\s+PROMPTHUE:\s*"?(\d+)"?', line)):
+            hues[service] = int(match.group(1))
+    return hues
+
+
+def write_batch(hues: list[int], template: StarshipTemplate, output_dir: Path, user_cmd: str, spacers: list[int],
+                saturation_bounds: tuple[float, float], lightness_bounds: tuple[float, float]):
+    """
+    Write a starship.toml per hue to output_dir/hue-<hue>.toml. Files whose inputs (template, hue and settings) have
+    the same hash as when they were written, according to output_dir/hashes.json, are skipped.
+
+    :return: Hues written and hues skipped
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    hashes_file = output_dir / 'hashes.json'
+    hashes = json.loads(hashes_file.read_text(encoding='utf-8')) if hashes_file.exists() else {}
+    settings = json.dumps([template.digest, user_cmd, spacers, saturation_bounds, lightness_bounds])
+    input_hashes = {hue: hashlib.sha256(f'{hue} {settings}'.encode('utf-8')).hexdigest() for hue in sorted(set(hues))}
+    changed = [hue for hue, input_hash in input_hashes.items()
+               if hashes.get(f'hue-{hue}.toml') != input_hash or not (output_dir / f'hue-{hue}.toml').exists()]
+    palettes = ColorPalette.from_hues(changed, num_colors=7, spacers=spacers, saturation_bounds=saturation_bounds,
+                                      lightness_bounds=lightness_bounds)
+    for hue, palette in zip(changed, palettes):
+        substitutions = palette.as_format_dict
+        substitutions['user_cmd'] = user_cmd
+        with open(output_dir / f'hue-{hue}.toml', 'w', encoding='utf-8') as f:
+            f.write(template.render(substitutions))
+        hashes[f'hue-{hue}.toml'] = input_hashes[hue]
+    hashes_file.write_text(json.dumps(hashes, indent=2, sort_keys=True), encoding='utf-8')
+    return changed, [hue for hue in input_hashes if hue not in changed]
+
+
 if __name__ == "__main__":
     parser = ArgumentParser(description="Generate a starship.toml file based on requirements.")
-    parser.add_argument("hue", type=int, help="Hue value (0-360)")
+    parser.add_argument("hue", type=int, nargs='?', help="Hue value (0-360), not needed with --from-compose")
     parser.add_argument("-t", "--template", type=Path, default=Path(__file__).parent / "starship_template.toml",
                         help="Path to the starship.toml template file")
     parser.add_argument("-o", "--output-file", type=Path, default=Path(__file__).parent / "starship.toml",
@@ -121,14 +208,35 @@ if __name__ == "__main__":
     parser.add_argument("--lightness-bounds", type=float, nargs=2, default=(0.22, .95),
                         help="Min and max lightness values (0.0 to 1.0)")
     parser.add_argument("-q", "--quiet", action="store_true", help="Suppress output except for errors")
+    parser.add_argument("--from-compose", type=Path, metavar="COMPOSE_FILE",
+                        help="Batch mode: write a file per PROMPTHUE build argument in the given docker-compose.yml, "
+                             "named hue-<hue>.toml, into --output-dir. Files whose inputs didn't change are skipped.")
+    parser.add_argument("--output-dir", type=Path, default=Path(__file__).parent / "palettes",
+                        help="Directory for the files of the batch mode")
+    parser.add_argument("--user-cmd", type=str, default=str(Path(__file__).parent.resolve() / 'beautiful_user.sh'),
+                        help="Command showing the user in the prompt, as it is called where the prompt is used "
+                             "(defaults to beautiful_user.sh next to this script)")
     args = parser.parse_args()
 
     if args.spacers is None:
         if args.good_spacers:
-            args.spacers = [4, 5, 6, 7, 9, -3, -2]
+            args.spacers = GOOD_SPACERS
         else:
             args.spacers = []
 
+    if args.from_compose is not None:
+        # - Batch mode: all palettes at once, the template is compiled only once
+        hues = read_compose_hues(args.from_compose)
+        written, skipped = write_batch(list(hues.values()), StarshipTemplate.from_file(args.template), args.output_dir,
+                                       args.user_cmd, args.spacers, tuple(args.saturation_bounds),
+                                       tuple(args.lightness_bounds))
+        if not args.quiet:
+            print(f"Generated {len(written)} starship.toml files in {args.output_dir} for {len(hues)} services"
+                  + (f", {len(skipped)} unchanged" if len(skipped) > 0 else ""))
+        exit()
+    if args.hue is None:
+        parser.error("a hue is required without --from-compose")
+
     # - Generate color palette
     palette = ColorPalette.from_hue(args.hue, num_colors=7, spacers=args.spacers,
                                     saturation_bounds=args.saturation_bounds,
@@ -144,20 +252,11 @@ if __name__ == "__main__":
         palette.print_preview()
 
     if not args.preview:
-        # - Read template
-        with open(args.template, 'r', encoding='utf-8') as f:
-            template = f.read()
-        # - Escape curly braces for str.format()
-        template = template.replace('{', '&curlyopen').replace('}', '%curlyclose')
-        # - Replace '%<' and '>%' with '{' and '}' for str.format()
-        template = template.replace('%<', '{').replace('>%', '}')
         # - Prepare substitutions
         substitutions = palette.as_format_dict
-        substitutions['user_cmd'] = str(Path(__file__).parent.resolve() / 'beautiful_user.sh')
-        # - Format template
-        starship_toml_content = template.format(**substitutions)
-        # - Un-escape curly braces
-        starship_toml_content = starship_toml_content.replace('&curlyopen', '{').replace('%curlyclose', '}')
+        substitutions['user_cmd'] = args.user_cmd
+        # - Fill in template
+        starship_toml_content = StarshipTemplate.from_file(args.template).render(substitutions)
         # - Write to file
         with open(args.output_file, 'w', encoding='utf-8') as f:
             f.write(starship_toml_content)
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# - The tested scripts aren't packages, they are imported from where they are deployed from
+ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / 'src' / 'services' / 'backup-maker')]
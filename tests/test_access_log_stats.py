@@ -0,0 +1,28 @@
+from time import time
+
+from browse_containers import AccessLogStats
+
+LINE = (b'1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "GET /api/items?page=2 HTTP/1.1" 200 512 "-" "curl/8.0"'
+        b' rt=%s urt="%s"')
+
+
+def test_timed_lines_are_counted_with_latency():
+    stats = AccessLogStats()
+    now = time()
+    stats.add_lines([now, now], [LINE % (b'0.012', b'0.010'), LINE % (b'1.500', b'0.5, 0.7')])
+    summary = AccessLogStats.summarize([stats], now)
+    assert summary['num_requests'] == 2
+    assert summary['paths']['/api/items'] == 2
+    assert abs(summary['latencies'].quantile(1.) - 1.2) < .02
+
+
+def test_malformed_times_are_counted_without_latency():
+    assert AccessLogStats._latency(b'.', None) is None
+    assert AccessLogStats._latency(b'0.1', b'soon') is None
+    assert AccessLogStats._latency(b'0.1', b'0.2, x') is None
+    stats = AccessLogStats()
+    now = time()
+    stats.add_lines([now] * 3, [LINE % (b'.', b'-'), LINE % (b'0.1', b'soon'), LINE % (b'0.05', b'-')])
+    summary = AccessLogStats.summarize([stats], now)
+    assert summary['num_requests'] == 3
+    assert len(summary['latencies']) == 1
@@ -0,0 +1,103 @@
+import os
+import filecmp
+import random
+import shutil
+
+import pytest
+
+from backup_runner import BackupJob
+
+NUM_DIRECTORIES = 40
+NUM_FILES_PER_DIRECTORY = 50
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """A synthetic source tree of 2000 files in nested directories and an empty one, plus a symbolic link and a FIFO."""
+    source = tmp_path / 'source' / 'Schaluppe'
+    randomness = random.Random(1)
+    for d in range(NUM_DIRECTORIES):
+        directory = source / f'level{d // 10}' / f'dir{d}'
+        directory.mkdir(parents=True)
+        for f in range(NUM_FILES_PER_DIRECTORY):
+            (directory / f'file{f}.bin').write_bytes(randomness.randbytes(randomness.randint(0, 4096)))
+    os.symlink('level0/dir0/file0.bin', source / 'link')
+    os.mkfifo(source / 'pipe')
+    (source / 'empty').mkdir(mode=0o750)
+    for directory in [source / 'empty', source / 'level1', source / 'level1' / 'dir10']:
+        os.utime(directory, ns=(10 ** 18, 10 ** 18))
+    return tmp_path
+
+
+def _job(tree, **kwargs):
+    return BackupJob('Schaluppe', tree / 'source' / 'Schaluppe', tree / 'destination' / 'Schaluppe',
+                     tree / 'manifests' / 'Schaluppe.json', **kwargs)
+
+
+def _assert_same_trees(left, right):
+    comparison = filecmp.dircmp(left, right)
+    assert not comparison.left_only and not comparison.right_only and not comparison.diff_files
+    for subdirectory in comparison.common_dirs:
+        _assert_same_trees(left / subdirectory, right / subdirectory)
+
+
+def test_first_run_copies_everything(tree):
+    job = _job(tree)
+    assert job.run()
+    num_files = NUM_DIRECTORIES * NUM_FILES_PER_DIRECTORY + 2
+    assert job.num_files == num_files and job.num_copied == num_files and job.num_errors == 0
+    _assert_same_trees(tree / 'source' / 'Schaluppe', tree / 'destination' / 'Schaluppe')
+    source = tree / 'source' / 'Schaluppe' / 'level1' / 'dir10' / 'file3.bin'
+    destination = tree / 'destination' / 'Schaluppe' / 'level1' / 'dir10' / 'file3.bin'
+    assert os.stat(source).st_mtime_ns == os.stat(destination).st_mtime_ns
+
+
+def test_second_run_copies_nothing(tree):
+    _job(tree).run()
+    job = _job(tree)
+    assert job.run()
+    assert job.num_copied == 0 and job.num_bytes_copied == 0
+
+
+def test_changed_file_is_the_only_one_copied(tree):
+    _job(tree).run()
+    changed = tree / 'source' / 'Schaluppe' / 'level2' / 'dir25' / 'file7.bin'
+    changed.write_bytes(b'changed contents')
+    os.utime(changed, ns=(2 * 10 ** 18, 2 * 10 ** 18))
+    job = _job(tree)
+    assert job.run()
+    assert job.num_copied == 1 and job.num_bytes_copied == len(b'changed contents')
+    assert (tree / 'destination' / 'Schaluppe' / 'level2' / 'dir25' / 'file7.bin').read_bytes() == b'changed contents'
+
+
+def test_symbolic_links_and_special_files_are_preserved(tree):
+    assert _job(tree).run()
+    destination = tree / 'destination' / 'Schaluppe'
+    assert os.path.islink(destination / 'link') and os.readlink(destination / 'link') == 'level0/dir0/file0.bin'
+    assert os.path.exists(destination / 'pipe') and not os.path.isfile(destination / 'pipe')
+
+
+def test_directories_are_preserved(tree):
+    assert _job(tree).run()
+    for directory in ['empty', 'level1', 'level1/dir10']:
+        source = os.stat(tree / 'source' / 'Schaluppe' / directory)
+        destination = os.stat(tree / 'destination' / 'Schaluppe' / directory)
+        assert destination.st_mode == source.st_mode and destination.st_mtime_ns == source.st_mtime_ns == 10 ** 18
+
+
+def test_directory_times_are_kept_when_files_are_copied_into_it(tree):
+    _job(tree).run()
+    changed = tree / 'source' / 'Schaluppe' / 'level1' / 'dir10' / 'file7.bin'
+    changed.write_bytes(b'changed contents')
+    os.utime(tree / 'source' / 'Schaluppe' / 'level1' / 'dir10', ns=(10 ** 18, 10 ** 18))
+    assert _job(tree).run()
+    assert os.stat(tree / 'destination' / 'Schaluppe' / 'level1' / 'dir10').st_mtime_ns == 10 ** 18
+
+
+def test_existing_backup_without_manifest_is_adopted(tree):
+    _job(tree).run()
+    shutil.rmtree(tree / 'manifests')
+    job = _job(tree)
+    assert job.run()
+    assert job.num_copied == 0
+    assert (tree / 'manifests' / 'Schaluppe.json').exists()
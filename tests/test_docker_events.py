@@ -0,0 +1,215 @@
+import json
+import shutil
+import asyncio
+import tempfile
+import datetime as dt
+from pathlib import Path
+from threading import Thread
+from time import sleep, time_ns, perf_counter
+from urllib.parse import parse_qs
+
+import pytest
+
+from browse_containers import Container, DockerAPI, LogIngestor
+
+
+class FakeEngine:
+    """
+    Docker Engine API on a unix socket, with a single container whose log lines and events are added by the test.
+
+    Like the real one, log streams are multiplexed and include the lines at exactly their 'since' time, followed
+    streams stay open until the container dies, and the events and log streams are sent chunked.
+    """
+    CID = 'c0ffee'
+
+    def __init__(self, socket_path: Path, name: str, is_running: bool):
+        self.socket_path = socket_path
+        self.name = name
+        self.is_running = is_running
+        self.lines: list[tuple[int, bytes]] = []  # Time (ns) and text of each line
+        self.log_queries: list[dict] = []  # Parameters of every logs request
+        self._followers: list[asyncio.Queue] = []  # New lines of the open follow streams, None when they end
+        self._subscribers: list[asyncio.Queue] = []  # New events of the open event streams
+        self._loop = asyncio.new_event_loop()
+        Thread(target=self._loop.run_forever, daemon=True).start()
+        self._server = self._run(asyncio.start_unix_server(self._handle, str(socket_path)))
+
+    @property
+    def num_subscribers(self): return len(self._subscribers)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout=5.)
+
+    def close(self):
+        async def close():
+            self._server.close()
+            handlers = asyncio.all_tasks() - {asyncio.current_task()}
+            for handler in handlers:
+                handler.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+        self._run(close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def add_lines(self, *texts: str):
+        async def add():
+            for text in texts:
+                line = max(time_ns(), self.lines[-1][0] + 1000 if self.lines else 0), text.encode('utf-8')
+                self.lines.append(line)
+                for queue in self._followers:
+                    queue.put_nowait(line)
+        self._run(add())
+
+    def emit_event(self, action: str, name: str = NotImplemented):
+        name = self.name if name is NotImplemented else name
+        event = {'Type': 'container', 'Action': action, 'id': self.CID, 'timeNano': time_ns(),
+                 'Actor': {'ID': self.CID, 'Attributes': {'name': name, 'com.docker.compose.service': name}}}
+
+        async def emit():
+            if name == self.name:
+                self.is_running = action == 'start'
+            for queue in self._subscribers:
+                queue.put_nowait(event)
+        self._run(emit())
+
+    def end_log_streams(self):
+        async def end():
+            for queue in self._followers:
+                queue.put_nowait(None)
+        self._run(end())
+
+    @staticmethod
+    def _frame(line: tuple[int, bytes]):
+        seconds, nanoseconds = divmod(line[0], 10 ** 9)
+        timestamp = dt.datetime.fromtimestamp(seconds, dt.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        payload = f'{timestamp}.{nanoseconds:09d}Z '.encode('ascii') + line[1] + b'\n'
+        return b'\x01\x00\x00\x00' + len(payload).to_bytes(4, 'big') + payload
+
+    @staticmethod
+    def _since(value: str):
+        seconds, _, fraction = value.partition('.')
+        return int(seconds) * 10 ** 9 + int(fraction.ljust(9, '0')[:9])
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        route, _, query = (await reader.readuntil(b'\r\n\r\n')).split()[1].decode('ascii').partition('?')
+        parameters = {key: values[0] for key, values in parse_qs(query).items()}
+
+        def write_chunk(data: bytes):
+            writer.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+        if route == '/containers/json':
+            body = [{'Id': self.CID, 'Names': [f'/{self.name}'], 'State': 'running' if self.is_running else 'exited',
+                     'Labels': {'com.docker.compose.service': self.name}}]
+        elif route == f'/containers/{self.CID}/json':
+            body = {'Config': {'Tty': False}, 'State': {'Running': self.is_running}}
+        else:
+            body = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\n\r\n%b' % (len(data), data))
+        else:
+            writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n')
+            if route == f'/containers/{self.CID}/logs':
+                self.log_queries.append(parameters)
+                lines = self.lines
+                if 'since' in parameters:
+                    lines = [line for line in lines if line[0] >= self._since(parameters['since'])]
+                if parameters.get('tail', 'all') != 'all':
+                    lines = lines[len(lines) - int(parameters['tail']):]
+                if len(lines) > 0:
+                    write_chunk(b''.join(map(self._frame, lines)))
+                if parameters.get('follow') == '1' and self.is_running:
+                    self._followers.append(queue := asyncio.Queue())
+                    await writer.drain()
+                    while (line := await queue.get()) is not None:
+                        write_chunk(self._frame(line))
+                        await writer.drain()
+                    self._followers.remove(queue)
+            elif route == '/events':
+                self._subscribers.append(queue := asyncio.Queue())
+                await writer.drain()
+                while True:
+                    data = json.dumps(await queue.get()).encode('utf-8') + b'\n'
+                    write_chunk(data[:10])  # Events split across chunks, as they may be
+                    write_chunk(data[10:])
+                    await writer.drain()
+            write_chunk(b'')
+        await writer.drain()
+        writer.close()
+
+
+@pytest.fixture
+def socket_directory():
+    directory = tempfile.mkdtemp(prefix='engine')  # Not the much longer tmp_path, unix socket paths are limited
+    yield Path(directory)
+    shutil.rmtree(directory)
+
+
+def _wait_until(condition, timeout: float = 5.):
+    deadline = perf_counter() + timeout
+    while not condition():
+        assert perf_counter() < deadline, "Timed out."
+        sleep(.01)
+
+
+def _texts(container: Container):
+    store = container.log_store
+    return [text.decode('utf-8') for text in store.columns(store.first_index, store.end_index)[2]]
+
+
+def _collect(engine: FakeEngine):
+    ingestor = LogIngestor(DockerAPI(str(engine.socket_path)))
+    ingestor.start()
+    _wait_until(lambda: engine.num_subscribers > 0)
+    engine.emit_event('die', 'another-service')  # The events are watched from then on
+    _wait_until(lambda: ingestor._is_watching_events)
+    container = Container('', engine.name)
+    ingestor.emit_discovery([container]).result(timeout=5.)
+    container.start_collecting_logs(ingestor)
+    return ingestor, container
+
+
+def test_restarted_container_resumes_after_its_stop(socket_directory):
+    engine = FakeEngine(socket_directory / 'docker.sock', 'web', is_running=True)
+    engine.add_lines('one', 'two')
+    ingestor, container = _collect(engine)
+    try:
+        _wait_until(lambda: len(engine.log_queries) == 1)
+        engine.add_lines('three')
+        _wait_until(lambda: _texts(container) == ['one', 'two', 'three'])
+        engine.emit_event('die')
+        _wait_until(lambda: not container.is_running)
+        engine.end_log_streams()
+        engine.add_lines('four')  # Between the die and the start events
+        engine.emit_event('start')
+        _wait_until(lambda: len(engine.log_queries) == 2)
+        engine.add_lines('five')
+        _wait_until(lambda: len(_texts(container)) >= 6)
+        sleep(.1)  # Duplicates would arrive meanwhile
+        assert _texts(container) == ['one', 'two', 'three', 'stopped', 'four', 'five']
+        assert 'since' in engine.log_queries[1] and 'tail' not in engine.log_queries[1]
+    finally:
+        container.stop_collecting_logs()
+        ingestor.stop()
+        engine.close()
+
+
+def test_container_stopped_when_discovered_resumes_after_its_newest_line(socket_directory):
+    engine = FakeEngine(socket_directory / 'docker.sock', 'web', is_running=False)
+    engine.add_lines('one', 'two', 'three')
+    ingestor, container = _collect(engine)
+    try:
+        _wait_until(lambda: _texts(container) == ['one', 'two', 'three'])
+        engine.add_lines('four')
+        engine.emit_event('start')
+        _wait_until(lambda: len(engine.log_queries) == 2)
+        engine.add_lines('five')
+        _wait_until(lambda: len(_texts(container)) >= 5)
+        sleep(.1)
+        assert _texts(container) == ['one', 'two', 'three', 'four', 'five']
+        since = FakeEngine._since(engine.log_queries[1]['since'])
+        assert 'tail' not in engine.log_queries[1] and abs(since - engine.lines[2][0]) < 10 ** 3
+    finally:
+        container.stop_collecting_logs()
+        ingestor.stop()
+        engine.close()
@@ -0,0 +1,134 @@
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from browse_containers import STREAM, DockerAPI, LogStreamParser
+
+NEW_YEAR = 1735689600.  # 2025-01-01T00:00:00Z
+
+
+def _frame(stream: int, payload: bytes):
+    return bytes([stream, 0, 0, 0]) + len(payload).to_bytes(4, 'big') + payload
+
+
+def _feed(parser: LogStreamParser, chunks: list[bytes]):
+    timestamps, lines, streams = [], [], []
+    for batch in [*map(parser.feed, chunks), parser.flush()]:
+        for column, values in zip((timestamps, lines, streams), batch):
+            column.extend(values)
+    return timestamps, lines, streams
+
+
+# - Recorded from a container without TTY: two lines on stdout, one on stderr and one on stdout that Docker split into
+#   two frames (with a timestamp each) as it was too long for one
+RECORDED_FRAMES = b''.join([
+    _frame(STREAM.STDOUT, b'2025-01-01T00:00:00.250000000Z GET / 200\n'
+                          b'2025-01-01T00:00:01.000000000Z GET /health 200\n'),
+    _frame(STREAM.STDERR, b'2025-01-01T00:00:01.500000000Z [error] upstream timed out\n'),
+    _frame(STREAM.STDOUT, b'2025-01-01T00:00:02.000000000Z ' + b'x' * 100),
+    _frame(STREAM.STDOUT, b'2025-01-01T00:00:02.000000100Z ' + b'y' * 50 + b'\n'),
+])
+EXPECTED_LINES = ([NEW_YEAR + .25, NEW_YEAR + 1., NEW_YEAR + 1.5, NEW_YEAR + 2.],
+                  [b'GET / 200', b'GET /health 200', b'[error] upstream timed out', b'x' * 100 + b'y' * 50],
+                  [STREAM.STDOUT, STREAM.STDOUT, STREAM.STDERR, STREAM.STDOUT])
+
+
+def _assert_lines(actual: tuple[list, list, list], expected: tuple[list, list, list]):
+    assert actual[0] == pytest.approx(expected[0], abs=1e-6) and actual[1:] == expected[1:]
+
+
+def test_frames_are_split_into_lines():
+    _assert_lines(_feed(LogStreamParser(), [RECORDED_FRAMES]), EXPECTED_LINES)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 8, 13, 64])
+def test_headers_and_payloads_split_across_chunks(chunk_size: int):
+    chunks = [RECORDED_FRAMES[i:i + chunk_size] for i in range(0, len(RECORDED_FRAMES), chunk_size)]
+    _assert_lines(_feed(LogStreamParser(), chunks), EXPECTED_LINES)
+
+
+def test_long_line_split_across_frames_of_several_chunks():
+    frames = b''.join(_frame(STREAM.STDOUT, b'2025-01-01T00:00:03.%09dZ ' % i + bytes([ord('a') + i]) * 16)
+                      for i in range(4))
+    frames += _frame(STREAM.STDOUT, b'2025-01-01T00:00:03.000000004Z end\n')
+    timestamps, lines, streams = _feed(LogStreamParser(), [frames[:30], frames[30:100], frames[100:]])
+    assert lines == [b'a' * 16 + b'b' * 16 + b'c' * 16 + b'd' * 16 + b'end'] and streams == [STREAM.STDOUT]
+    assert timestamps == pytest.approx([NEW_YEAR + 3.], abs=1e-6)
+
+
+def test_incomplete_last_line_is_flushed():
+    timestamps, lines, streams = _feed(LogStreamParser(), [_frame(STREAM.STDERR, b'2025-01-01T00:00:04Z last')])
+    assert lines == [b'last'] and streams == [STREAM.STDERR] and timestamps == pytest.approx([NEW_YEAR + 4.])
+
+
+def test_tty_stream_has_no_frames():
+    stream = (b'2025-01-01T00:00:00.250000000Z \x1b[32mready\x1b[0m\r\n'
+              b'2025-01-01T00:00:01.000000000Z prompt> ')
+    chunks = [stream[:20], stream[20:34], stream[34:]]  # Split within a timestamp and an escape code
+    timestamps, lines, streams = _feed(LogStreamParser(is_multiplexed=False), chunks)
+    assert lines == [b'\x1b[32mready\x1b[0m\r', b'prompt> '] and streams == [STREAM.STDOUT] * 2
+    assert timestamps == pytest.approx([NEW_YEAR + .25, NEW_YEAR + 1.], abs=1e-6)
+
+
+@pytest.fixture
+def replay_socket():
+    """A unix socket answering any request with the response given, sent in the given pieces."""
+    directory = tempfile.mkdtemp(prefix='replay')  # Not the much longer tmp_path, unix socket paths are limited
+    socket_path = str(Path(directory) / 'docker.sock')
+
+    def serve(pieces: list[bytes]):
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            await reader.readuntil(b'\r\n\r\n')
+            for piece in pieces:
+                writer.write(piece)
+                await writer.drain()
+                await asyncio.sleep(0)  # Separate reads on the client
+            writer.close()
+        return asyncio.start_unix_server(handle, socket_path)
+
+    yield socket_path, serve
+    shutil.rmtree(directory)
+
+
+def _stream(replay_socket, pieces: list[bytes]):
+    socket_path, serve = replay_socket
+
+    async def read():
+        async with await serve(pieces):
+            return [chunk async for chunk in DockerAPI(socket_path).stream('/containers/c0ffee/logs')]
+    return asyncio.run(read())
+
+
+def test_chunked_response_is_decoded(replay_socket):
+    body = RECORDED_FRAMES
+    response = (b'HTTP/1.1 200 OK\r\nContent-Type: application/vnd.docker.multiplexed-stream\r\n'
+                b'Transfer-Encoding: chunked\r\n\r\n'
+                b'%x\r\n%b\r\n' % (50, body[:50]) + b'%x;name=value\r\n%b\r\n' % (len(body) - 50, body[50:])
+                + b'0\r\n\r\n')
+    # - Split within the status line, a chunk size, a chunk and the CRLF after it
+    pieces = [response[:7], response[7:120], response[120:121], response[121:200], response[200:]]
+    chunks = _stream(replay_socket, pieces)
+    assert b''.join(chunks) == body
+    _assert_lines(_feed(LogStreamParser(), chunks), EXPECTED_LINES)
+
+
+def test_response_with_content_length(replay_socket):
+    body = RECORDED_FRAMES
+    response = b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%b' % (len(body), body)
+    assert b''.join(_stream(replay_socket, [response[:60], response[60:]])) == body
+
+
+def test_response_read_until_closed(replay_socket):
+    body = b'2025-01-01T00:00:00.250000000Z GET / 200\r\n'  # TTY stream, without length or chunks
+    response = b'HTTP/1.0 200 OK\r\nContent-Type: application/vnd.docker.raw-stream\r\n\r\n' + body
+    assert b''.join(_stream(replay_socket, [response[:80], response[80:]])) == body
+
+
+def test_error_response_raises(replay_socket):
+    body = b'{"message":"No such container: c0ffee"}'
+    response = b'HTTP/1.1 404 Not Found\r\nContent-Length: %d\r\n\r\n%b' % (len(body), body)
+    with pytest.raises(RuntimeError, match='No such container'):
+        _stream(replay_socket, [response])
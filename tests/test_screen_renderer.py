@@ -0,0 +1,16 @@
+import os
+
+import browse_containers
+from browse_containers import ANSICODES, ScreenRenderer
+
+
+def test_full_rows_are_not_cleared_to_their_end(capsysbinary, monkeypatch):
+    monkeypatch.setattr(browse_containers, '_TERMINAL_SIZE', os.terminal_size((10, 5)))
+    renderer = ScreenRenderer()
+    renderer.render(['', '', ''], 0)
+    capsysbinary.readouterr()
+    full_row = ANSICODES.RED_FG + 'x' * 10 + ANSICODES.RESET
+    renderer.render([full_row, 'short', ''], 0)
+    output = capsysbinary.readouterr().out.decode('utf-8')
+    assert f'\033[1;1H{full_row}\033[2;1H' in output
+    assert '\033[2;1Hshort\033[K' in output
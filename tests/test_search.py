@@ -0,0 +1,26 @@
+from browse_containers import SEVERITY, STREAM, LogStore, SearchIndex, _find_spans
+
+LINES = [b'\xc3\x84nderung gespeichert', b'\xc3\x84NDERUNG GESPEICHERT', b'\xc3\xa4nderung gespeichert']  # Ä, Ä, ä
+
+
+def _index(num_lines: int):
+    store = LogStore(64 * 1024 ** 2)
+    lines = [LINES[i % len(LINES)] for i in range(num_lines)]
+    store.extend([0.] * num_lines, [SEVERITY.NONE] * num_lines, lines, [STREAM.STDOUT] * num_lines)
+    index = SearchIndex(store)
+    index.update()
+    return store, index
+
+
+def test_query_and_texts_ignore_the_same_case():
+    # - Enough lines for indexed blocks, so the trigrams of the query must be those of the texts as well
+    store, index = _index(3 * SearchIndex.BLOCK_SIZE + 10)
+    start, end = store.first_index, store.end_index
+    capitals = [i for i in range(end) if i % len(LINES) < 2]
+    assert index.search('ÄNDERUNG', start, end) == capitals and index.search('Änderung', start, end) == capitals
+    assert index.search('änderung GESPEICHERT', start, end) == list(range(2, end, 3))
+
+
+def test_spans_ignore_the_case_of_ascii_letters_only():
+    assert _find_spans('İstanbul, ISTANBUL', 'stanBUL') == [(1, 8), (11, 18)]
+    assert _find_spans('Änderung, änderung', 'ÄNDERUNG') == [(0, 8)]